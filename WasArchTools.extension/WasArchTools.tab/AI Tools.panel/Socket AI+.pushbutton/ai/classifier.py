@@ -2,4 +2,260 @@
 """
 Модуль для классификации сложности задач на основе данных.
 Используется в Socket AI+ для определения типа и сложности архитектурных задач.
+
+Сложность помещения оценивается по геометрическим признакам контуров
+границы (RoomGeometry), без растровых снимков и ML-библиотек: число
+вершин, доля вогнутых углов, вытянутость, доля дуг и число ниш.
+Признаки всех выделенных помещений считаются за один проход
+(classify_rooms), оценка — взвешенная сумма признаков от 0 до 1.
 """
+from array import array
+
+from core.geometry import ARC
+
+# Признаки помещения в порядке столбцов ComplexityBatch
+FEATURES = ('vertices', 'concavity', 'aspect', 'arc_share', 'niches')
+
+# Порог оценки: помещения с оценкой не ниже считаются сложными
+COMPLEX_THRESHOLD = 0.5
+
+# Вклад признаков в оценку: (вес, предел вклада)
+VERTEX_WEIGHT = (0.05, 0.3)      # за каждую вершину сверх четырёх
+CONCAVITY_WEIGHT = (3.0, 0.6)    # доля вогнутых углов внешнего контура
+ASPECT_WEIGHT = (0.1, 0.2)       # за каждую единицу вытянутости сверх 3
+ARC_WEIGHT = (2.0, 0.6)          # доля длины дуг в периметре
+NICHE_WEIGHT = (0.25, 0.5)       # за каждую нишу или выступ
+
+BASE_VERTICES = 4
+BASE_ASPECT = 3.0
+
+# Веса и базовые значения в порядке FEATURES
+DEFAULT_WEIGHTS = (VERTEX_WEIGHT, CONCAVITY_WEIGHT, ASPECT_WEIGHT,
+                   ARC_WEIGHT, NICHE_WEIGHT)
+BASELINES = (BASE_VERTICES, 0.0, BASE_ASPECT, 0.0, 0.0)
+
+# Имя модели в хранилище (ai/model_store.py): массив weights из пар
+# (вес, предел) в порядке FEATURES, порог — в meta['threshold']
+MODEL_NAME = 'classifier'
+
+# Ниша — участок между двумя соседними вогнутыми углами длиной
+# не больше NICHE_MAX_LENGTH (глубина + ширина + глубина), футы
+NICHE_MAX_LENGTH = 8.0
+
+# Углы с |синусом поворота| меньше порога считаются прямым продолжением
+TURN_TOLERANCE = 1e-3
+
+
+class ComplexityBatch(object):
+    """
+    Признаки и оценки пакета помещений в виде параллельных массивов.
+    """
+    __slots__ = ('room_id', 'vertices', 'concavity', 'aspect', 'arc_share',
+                 'niches', 'score', 'threshold', 'weights')
+
+    def __init__(self, threshold=COMPLEX_THRESHOLD, weights=DEFAULT_WEIGHTS):
+        self.room_id = array('q')
+        self.vertices = array('l')
+        self.concavity = array('d')
+        self.aspect = array('d')
+        self.arc_share = array('d')
+        self.niches = array('l')
+        self.score = array('d')
+        self.threshold = threshold
+        self.weights = weights
+
+    def __len__(self):
+        return len(self.room_id)
+
+    def append(self, room_id, features):
+        vertices, concavity, aspect, arc_share, niches = features
+        self.room_id.append(room_id)
+        self.vertices.append(vertices)
+        self.concavity.append(concavity)
+        self.aspect.append(aspect)
+        self.arc_share.append(arc_share)
+        self.niches.append(niches)
+        self.score.append(complexity_score(features, self.weights))
+
+    def is_complex(self, i):
+        return self.score[i] >= self.threshold
+
+    def complex_ids(self):
+        """Id помещений, признанных сложными."""
+        return [self.room_id[i] for i in range(len(self))
+                if self.score[i] >= self.threshold]
+
+    def values(self, i):
+        """Признаки помещения i в порядке FEATURES."""
+        return (self.vertices[i], self.concavity[i], self.aspect[i],
+                self.arc_share[i], self.niches[i])
+
+    def features(self, i):
+        """Признаки помещения i в виде словаря (для отчётов)."""
+        return {
+            'vertices': self.vertices[i],
+            'concavity': self.concavity[i],
+            'aspect': self.aspect[i],
+            'arc_share': self.arc_share[i],
+            'niches': self.niches[i],
+            'score': self.score[i],
+        }
+
+
+def _contribution(value, weight):
+    factor, limit = weight
+    if value <= 0.0:
+        return 0.0
+    return min(limit, value * factor)
+
+
+def complexity_score(features, weights=DEFAULT_WEIGHTS):
+    """
+    Оценка сложности по признакам в порядке FEATURES.
+    :param weights: пары (вес, предел вклада) в порядке FEATURES
+    :return: число от 0 (прямоугольник) до 1
+    """
+    score = 0.0
+    for value, base, weight in zip(features, BASELINES, weights):
+        score += _contribution(value - base, weight)
+    return min(1.0, score)
+
+
+def load_model(store=None):
+    """
+    Веса и порог из хранилища моделей; если модель не сохранена —
+    значения по умолчанию.
+    :return: кортеж (weights, threshold)
+    """
+    from ai.model_store import get_model_store
+    model = (store or get_model_store()).load(MODEL_NAME)
+    if model is None:
+        return DEFAULT_WEIGHTS, COMPLEX_THRESHOLD
+    flat = model['weights']
+    weights = tuple((flat[2 * i], flat[2 * i + 1])
+                    for i in range(len(FEATURES)))
+    return weights, model.meta.get('threshold', COMPLEX_THRESHOLD)
+
+
+def save_model(weights=DEFAULT_WEIGHTS, threshold=COMPLEX_THRESHOLD,
+               store=None):
+    """Сохраняет веса и порог в хранилище моделей."""
+    from ai.model_store import get_model_store
+    flat = array('d', [value for pair in weights for value in pair])
+    return (store or get_model_store()).save(
+        MODEL_NAME, {'weights': flat}, {'threshold': threshold})
+
+
+def _loop_ends(loop_starts, count):
+    ends = list(loop_starts[1:])
+    ends.append(count)
+    return ends
+
+
+def room_features(segments, loop_starts):
+    """
+    Признаки помещения по контурам границы.
+    Вогнутость, вытянутость, дуги и ниши считаются по внешнему контуру,
+    число вершин — по всем контурам (колонны внутри тоже усложняют
+    расстановку).
+    :param segments: SegmentArrays помещения
+    :param loop_starts: индексы первых сегментов контуров
+    :return: кортеж в порядке FEATURES
+    """
+    count = len(segments)
+    if not loop_starts or not count:
+        return (0, 0.0, 0.0, 0.0, 0)
+    start = loop_starts[0]
+    end = _loop_ends(loop_starts, count)[0]
+    kind = segments.kind
+    x0 = segments.x0
+    y0 = segments.y0
+    x1 = segments.x1
+    y1 = segments.y1
+    lengths = segments.length
+    point_at = segments.point_at
+
+    # Площадь (по хордам), габариты и длина дуг внешнего контура
+    area = 0.0
+    arc_length = 0.0
+    perimeter = 0.0
+    min_x = max_x = x0[start]
+    min_y = max_y = y0[start]
+    for i in range(start, end):
+        area += x0[i] * y1[i] - x1[i] * y0[i]
+        perimeter += lengths[i]
+        if kind[i] == ARC:
+            arc_length += lengths[i]
+        if x0[i] < min_x:
+            min_x = x0[i]
+        elif x0[i] > max_x:
+            max_x = x0[i]
+        if y0[i] < min_y:
+            min_y = y0[i]
+        elif y0[i] > max_y:
+            max_y = y0[i]
+    orientation = 1.0 if area > 0.0 else -1.0
+
+    # Повороты в вершинах: касательная в конце сегмента и в начале
+    # следующего (для дуг тоже); вершина j — начало сегмента j
+    turns = []
+    previous = end - 1
+    _, _, nx, ny = point_at(previous, lengths[previous])
+    for i in range(start, end):
+        tx_in, ty_in = -ny, nx
+        _, _, nx_start, ny_start = point_at(i, 0.0)
+        cross = tx_in * nx_start + ty_in * ny_start
+        if cross * orientation > TURN_TOLERANCE:
+            turns.append(1)
+        elif cross * orientation < -TURN_TOLERANCE:
+            turns.append(-1)
+        else:
+            turns.append(0)
+        _, _, nx, ny = point_at(i, lengths[i])
+
+    corners = sum(1 for turn in turns if turn)
+    reflex = [j for j, turn in enumerate(turns) if turn < 0]
+    concavity = len(reflex) / float(corners) if corners else 0.0
+
+    niches = 0
+    size = end - start
+    if len(reflex) > 1:
+        for a, b in zip(reflex, reflex[1:] + reflex[:1]):
+            span = (b - a) % size
+            run = 0.0
+            for k in range(span):
+                run += lengths[start + (a + k) % size]
+                if run > NICHE_MAX_LENGTH:
+                    break
+            if run <= NICHE_MAX_LENGTH:
+                niches += 1
+
+    width = max_x - min_x
+    depth = max_y - min_y
+    short_side = min(width, depth)
+    aspect = max(width, depth) / short_side if short_side > 0.0 else 0.0
+    arc_share = arc_length / perimeter if perimeter > 0.0 else 0.0
+    return (corners + count - size, concavity, aspect, arc_share, niches)
+
+
+def classify_rooms(geometries, threshold=COMPLEX_THRESHOLD,
+                   weights=DEFAULT_WEIGHTS):
+    """
+    Оценивает сложность всех помещений одним вызовом.
+    :param geometries: список RoomGeometry
+    :param threshold, weights: см. load_model
+    :return: ComplexityBatch (в порядке geometries)
+    """
+    batch = ComplexityBatch(threshold, weights)
+    append = batch.append
+    for geometry in geometries:
+        append(geometry.room_id,
+               room_features(geometry.segments, geometry.loop_starts))
+    return batch
+
+
+def is_complex_room(geometry, threshold=COMPLEX_THRESHOLD,
+                    weights=DEFAULT_WEIGHTS):
+    """Признак сложности одного помещения."""
+    features = room_features(geometry.segments, geometry.loop_starts)
+    return complexity_score(features, weights) >= threshold
@@ -2,4 +2,447 @@
 """
 Модуль для сбора и логирования данных, используемых в обучении и работе ИИ.
 Используется для отслеживания пользовательских действий и параметров задач.
+
+Правки пользователя (исходная и исправленная точка розетки, тип помещения,
+признаки стены) упаковываются в двоичные записи фиксированного размера
+и копятся в буфере. Заполненный буфер передаётся фоновому потоку, который
+сжимает его в блок и дописывает в конец текущего сегмента журнала.
+Сегменты ротируются по размеру, старые удаляются. Вызов log_correction
+никогда не ждёт поток записи. Если очередь записи заполнена, пачка
+сбрасывается вызывающим потоком в отдельный файл (spill-*.seg, после
+освобождения блокировки) и учитывается в счётчике spilled; поток записи
+переносит такие файлы в сегменты, когда очередь пустеет, а
+read_corrections читает их и до переноса. Пачка теряется (счётчик
+dropped), только если и сброс на диск не удался.
+Вместо облака используется каталог (DirectorySink); другой приёмник
+достаточно снабдить методом write(block).
 """
+import errno
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+import queue
+from collections import namedtuple
+
+# Признаки стены в записи (float32): длина стены, внутренняя нормаль,
+# расстояние от начала стены до исходной точки
+WALL_FEATURES = ('length', 'normal_x', 'normal_y', 'distance')
+
+# Запись: время, Id помещения, Id стены, код типа помещения,
+# исходная точка (x, y, z), исправленная точка (x, y, z), признаки стены
+RECORD = struct.Struct('<dqqH6d{0}f'.format(len(WALL_FEATURES)))
+
+# Заголовок блока: сигнатура, версия, число записей, длина сжатых данных
+BLOCK_MAGIC = b'SAIC'
+BLOCK_VERSION = 1
+BLOCK_HEADER = struct.Struct('<4sHII')
+
+# Записей в одной пачке и пачек в очереди записи: при 1024 записях
+# по ~100 байт буфер логгера ограничен примерно 1 МБ
+DEFAULT_BATCH_SIZE = 1024
+DEFAULT_MAX_PENDING = 8
+
+
+# Ротация: размер сегмента и число хранимых сегментов
+DEFAULT_SEGMENT_BYTES = 4 * 1024 * 1024
+DEFAULT_MAX_SEGMENTS = 16
+
+SEGMENT_PREFIX = 'corrections-'
+SEGMENT_SUFFIX = '.seg'
+# Пачки, не поместившиеся в очередь: spill-<pid>-<номер>.seg
+SPILL_PREFIX = 'spill-'
+# Ошибки упаковки и записи одной пачки
+WRITE_ERRORS = (IOError, OSError, zlib.error, struct.error, ValueError,
+                TypeError, UnicodeError)
+
+COMPRESS_LEVEL = 6
+
+Correction = namedtuple('Correction', (
+    'timestamp', 'room_id', 'wall_id', 'room_type', 'original',
+    'corrected', 'features',
+))
+
+
+def default_log_dir():
+    """Каталог журнала правок в профиле пользователя."""
+    base = os.environ.get('APPDATA') or tempfile.gettempdir()
+    return os.path.join(base, 'WasArchTools', 'SocketAI', 'corrections')
+
+
+def wall_features(segments, index, x, y):
+    """
+    Признаки стены для записи правки.
+    :param segments: SegmentArrays помещения
+    :param index: индекс сегмента стены
+    :param x, y: исходная точка розетки
+    :return: кортеж значений в порядке WALL_FEATURES
+    """
+    from core.geometry import ARC
+    length = segments.length[index]
+    if segments.kind[index] == ARC:
+        _, _, nx, ny = segments.point_at(index, length * 0.5)
+        return (length, nx, ny, 0.0)
+    x0 = segments.x0[index]
+    y0 = segments.y0[index]
+    dx = segments.x1[index] - x0
+    dy = segments.y1[index] - y0
+    if not length:
+        return (0.0, 0.0, 0.0, 0.0)
+    distance = ((x - x0) * dx + (y - y0) * dy) / length
+    return (length, dy / length, -dx / length, distance)
+
+
+def _segment_number(name):
+    if not (name.startswith(SEGMENT_PREFIX) and
+            name.endswith(SEGMENT_SUFFIX)):
+        return None
+    digits = name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]
+    return int(digits) if digits.isdigit() else None
+
+
+def list_segments(path):
+    """Файлы сегментов каталога path по возрастанию номера."""
+    if not os.path.isdir(path):
+        return []
+    numbered = []
+    for name in os.listdir(path):
+        number = _segment_number(name)
+        if number is not None:
+            numbered.append((number, os.path.join(path, name)))
+    numbered.sort()
+    return [segment for _, segment in numbered]
+
+
+def list_spills(path, pid=None):
+    """
+    Файлы сброшенных пачек каталога path по имени.
+    :param pid: только файлы процесса pid
+    """
+    if not os.path.isdir(path):
+        return []
+    prefix = SPILL_PREFIX
+    if pid is not None:
+        prefix += '{0}-'.format(pid)
+    return [os.path.join(path, name) for name in sorted(os.listdir(path))
+            if name.startswith(prefix) and name.endswith(SEGMENT_SUFFIX)]
+
+
+class DirectorySink(object):
+    """
+    Локальный приёмник блоков: дописывает блоки в файлы сегментов,
+    открывает новый сегмент при превышении segment_bytes и удаляет
+    самые старые, оставляя не более max_segments.
+    """
+
+    def __init__(self, path=None, segment_bytes=DEFAULT_SEGMENT_BYTES,
+                 max_segments=DEFAULT_MAX_SEGMENTS):
+        self.path = path or default_log_dir()
+        self.segment_bytes = segment_bytes
+        self.max_segments = max(1, max_segments)
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        segments = list_segments(self.path)
+        if segments:
+            last = os.path.basename(segments[-1])
+            self._number = _segment_number(last)
+        else:
+            self._number = 1
+
+    def _segment_path(self, number):
+        return os.path.join(self.path, '{0}{1:06d}{2}'.format(
+            SEGMENT_PREFIX, number, SEGMENT_SUFFIX))
+
+    def _rotate(self):
+        self._number += 1
+        segments = list_segments(self.path)
+        for old in segments[:max(0, len(segments) + 1 - self.max_segments)]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+    def write(self, block):
+        path = self._segment_path(self._number)
+        if (os.path.exists(path) and
+                os.path.getsize(path) + len(block) > self.segment_bytes):
+            self._rotate()
+            path = self._segment_path(self._number)
+        with open(path, 'ab') as f:
+            f.write(block)
+
+
+def encode_block(type_names, payload, count):
+    """
+    Сжатый блок: заголовок, затем zlib от словаря типов помещений
+    (строки UTF-8 через перевод строки) и упакованных записей.
+    """
+    names = u'\n'.join(type_names).encode('utf-8')
+    body = zlib.compress(
+        struct.pack('<I', len(names)) + names + bytes(payload),
+        COMPRESS_LEVEL)
+    return BLOCK_HEADER.pack(
+        BLOCK_MAGIC, BLOCK_VERSION, count, len(body)) + body
+
+
+def decode_blocks(data):
+    """
+    Разбирает блоки сегмента. Неполный блок в конце (запись прервана)
+    пропускается.
+    :return: генератор Correction
+    """
+    offset = 0
+    header_size = BLOCK_HEADER.size
+    while offset + header_size <= len(data):
+        magic, version, count, size = BLOCK_HEADER.unpack_from(data, offset)
+        offset += header_size
+        if magic != BLOCK_MAGIC or version != BLOCK_VERSION:
+            raise ValueError(
+                "Повреждённый блок журнала правок: {0}".format(offset))
+        if offset + size > len(data):
+            return
+        body = zlib.decompress(data[offset:offset + size])
+        offset += size
+        names_size = struct.unpack_from('<I', body, 0)[0]
+        names = body[4:4 + names_size].decode('utf-8').split(u'\n')
+        position = 4 + names_size
+        for _ in range(count):
+            values = RECORD.unpack_from(body, position)
+            position += RECORD.size
+            yield Correction(
+                values[0], values[1], values[2], names[values[3]],
+                values[4:7], values[7:10], values[10:],
+            )
+
+
+def read_corrections(path=None):
+    """
+    Читает все правки из каталога журнала: сегменты от старых к новым,
+    затем ещё не перенесённые сброшенные пачки.
+    :return: генератор Correction
+    """
+    path = path or default_log_dir()
+    for segment in list_segments(path) + list_spills(path):
+        try:
+            with open(segment, 'rb') as f:
+                data = f.read()
+        except (IOError, OSError) as err:
+            # Поток записи мог перенести или ротировать файл после list
+            if err.errno == errno.ENOENT:
+                continue
+            raise
+        for correction in decode_blocks(data):
+            yield correction
+
+
+class DataLogger(object):
+    """
+    Пакетный журнал правок пользователя.
+    Записи упаковываются в bytearray текущей пачки; полная пачка уходит
+    в ограниченную очередь фонового потока записи, а при полной очереди
+    сбрасывается в файл каталога spill_path.
+    """
+
+    def __init__(self, sink=None, batch_size=DEFAULT_BATCH_SIZE,
+                 max_pending=DEFAULT_MAX_PENDING, spill_path=None,
+                 enabled=True):
+        self.sink = sink
+        self.batch_size = max(1, batch_size)
+        # По умолчанию — каталог DirectorySink или журнала правок
+        self.spill_path = spill_path
+        self.enabled = enabled
+        self.logged = 0
+        self.spilled = 0
+        self.dropped = 0
+        self.errors = 0
+        self._queue = queue.Queue(max(1, max_pending))
+        self._lock = threading.Lock()
+        self._buffer = bytearray()
+        self._count = 0
+        self._types = []
+        self._type_codes = {}
+        self._thread = None
+        self._spills = 0
+
+    def _start(self):
+        if self.sink is None:
+            self.sink = DirectorySink()
+        self._thread = threading.Thread(
+            target=self._run, name='SocketAI data logger')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            try:
+                self.sink.write(encode_block(*item))
+            except WRITE_ERRORS:
+                # Ошибка одной пачки не останавливает поток записи
+                with self._lock:
+                    self.errors += 1
+                    self.dropped += item[2]
+            if self._queue.empty():
+                self._merge_spills()
+
+    def _spill_dir(self):
+        return (self.spill_path or getattr(self.sink, 'path', None) or
+                default_log_dir())
+
+    def _spill(self, item, number):
+        """
+        Записывает пачку, не поместившуюся в очередь, в отдельный файл.
+        Вызывается вне self._lock: другие вызовы log_correction не ждут.
+        """
+        path = self._spill_dir()
+        target = os.path.join(path, '{0}{1}-{2:06d}{3}'.format(
+            SPILL_PREFIX, os.getpid(), number, SEGMENT_SUFFIX))
+        try:
+            if not os.path.isdir(path):
+                os.makedirs(path)
+            block = encode_block(*item)
+            # Файл появляется под именем .seg только целиком
+            with open(target + '.tmp', 'wb') as f:
+                f.write(block)
+            os.rename(target + '.tmp', target)
+        except WRITE_ERRORS:
+            with self._lock:
+                self.dropped += item[2]
+            return
+        with self._lock:
+            self.spilled += item[2]
+
+    def _merge_spills(self):
+        """Переносит сброшенные пачки этого процесса в сегменты."""
+        for spill in list_spills(self._spill_dir(), os.getpid()):
+            try:
+                with open(spill, 'rb') as f:
+                    data = f.read()
+                self.sink.write(data)
+                os.remove(spill)
+            except (IOError, OSError):
+                self.errors += 1
+                return
+
+    def _type_code(self, room_type):
+        code = self._type_codes.get(room_type)
+        if code is None:
+            code = len(self._types)
+            self._types.append(room_type)
+            self._type_codes[room_type] = code
+        return code
+
+    def log_correction(self, room_type, original, corrected,
+                       features=(), room_id=-1, wall_id=-1):
+        """
+        Добавляет правку в текущую пачку.
+        :param room_type: тип помещения (ключ правил)
+        :param original: исходная точка (x, y, z) или XYZ
+        :param corrected: исправленная точка (x, y, z) или XYZ
+        :param features: признаки стены в порядке WALL_FEATURES
+            (см. wall_features); недостающие заполняются нулями
+        """
+        if not self.enabled:
+            return
+        ox, oy, oz = _coords(original)
+        cx, cy, cz = _coords(corrected)
+        values = tuple(features)[:len(WALL_FEATURES)]
+        values += (0.0,) * (len(WALL_FEATURES) - len(values))
+        overflow = None
+        with self._lock:
+            self._buffer += RECORD.pack(
+                time.time(), room_id, wall_id, self._type_code(room_type),
+                ox, oy, oz, cx, cy, cz, *values)
+            self._count += 1
+            self.logged += 1
+            if self._count >= self.batch_size:
+                overflow = self._hand_off()
+        if overflow is not None:
+            self._spill(*overflow)
+
+    def _hand_off(self):
+        """
+        Передаёт текущую пачку потоку записи (под self._lock), не ожидая
+        места в очереди.
+        :return: (пачка, номер файла) для _spill, если очередь заполнена
+        """
+        if not self._count:
+            return None
+        if self._thread is None:
+            self._start()
+        item = (list(self._types), self._buffer, self._count)
+        self._buffer = bytearray()
+        self._count = 0
+        self._types = []
+        self._type_codes = {}
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._spills += 1
+            return item, self._spills
+        return None
+
+    def flush(self):
+        """Отдаёт неполную пачку на запись, не дожидаясь её окончания."""
+        with self._lock:
+            overflow = self._hand_off()
+        if overflow is not None:
+            self._spill(*overflow)
+
+    def close(self, timeout=5.0):
+        """
+        Записывает остаток и останавливает поток записи, ожидая его
+        не дольше timeout секунд на каждый шаг. Пачки, которые не успели
+        записаться, остаются в очереди и учитываются как потерянные.
+        """
+        self.flush()
+        thread = self._thread
+        if thread is None:
+            return
+        self._thread = None
+        if thread.is_alive():
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            thread.join(timeout)
+        if thread.is_alive():
+            return
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                with self._lock:
+                    self.dropped += item[2]
+
+    def summary(self):
+        """Строка итога для журнала запуска."""
+        line = u"Правок записано: {0}".format(self.logged - self.dropped)
+        if self.spilled:
+            line += u", из них через файлы сброса: {0}".format(self.spilled)
+        if self.dropped:
+            line += u", потеряно: {0}".format(self.dropped)
+        if self.errors:
+            line += u", ошибок записи блоков: {0}".format(self.errors)
+        return line
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+def _coords(point):
+    if hasattr(point, 'X'):
+        return point.X, point.Y, point.Z
+    if len(point) == 2:
+        return point[0], point[1], 0.0
+    return point[0], point[1], point[2]
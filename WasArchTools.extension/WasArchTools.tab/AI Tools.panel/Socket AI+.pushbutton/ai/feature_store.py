@@ -0,0 +1,360 @@
+# -*- coding: utf-8 -*-
+"""
+Хранилище признаков помещений между запусками.
+Для каждого помещения по его границе, применённым правилам и
+препятствиям рядом считается устойчивый ключ (SHA-1). По ключу хранятся
+признаки сложности, многоугольник границы и последний план расстановки.
+Если помещение и всё, что влияет на расстановку, не изменилось, план
+берётся из хранилища без пересчёта — в том числе на другой машине, если
+каталог хранилища общий (переменная окружения SOCKETAI_FEATURE_STORE).
+
+Каждое сохранение дописывает новые записи отдельным сегментом
+(features.store.<id>.seg) — столбцы массивов в формате
+ai/model_store.py; индекс (ключи и правила строк) лежит в заголовке.
+Существующие файлы не перезаписываются: одновременные сохранения
+нескольких машин не теряют записи, а открытые другими процессами
+отображения не мешают записи. Когда сегментов становится больше
+MAX_SEGMENTS, они сливаются в один.
+"""
+import hashlib
+import json
+import os
+import struct
+import time
+import uuid
+from array import array
+
+from ai.classifier import FEATURES
+from ai.model_store import MappedModel, default_model_dir, write_model
+from core.collisions import CORNER, DOOR, SINK, TV, WINDOW
+from core.intervals import DEFAULT_MAX_OFFSET
+from core.plan import PLAN_VERSION, PlacementPlan
+
+# Версия алгоритма планирования: при изменении все ключи устаревают
+FEATURE_VERSION = 1
+
+# Переменная окружения с каталогом общего хранилища
+STORE_ENVVAR = 'SOCKETAI_FEATURE_STORE'
+STORE_FILE = 'features.store'
+# Сегменты хранилища: <файл хранилища>.<id>.seg
+SEGMENT_SUFFIX = '.seg'
+# Когда сегментов больше, они сливаются в один
+MAX_SEGMENTS = 16
+
+# Хранится не больше MAX_ENTRIES помещений (старые вытесняются)
+MAX_ENTRIES = 50000
+
+# Точность координат в ключе, футы
+KEY_DIGITS = 6
+
+ALL_OBSTACLES = DOOR | CORNER | SINK | TV | WINDOW
+
+# Столбцы плана в файле
+PLAN_COLUMNS = (
+    ('room_id', 'q'), ('wall_id', 'q'), ('level_id', 'q'), ('x', 'd'),
+    ('y', 'd'), ('z', 'd'), ('angle', 'd'), ('flag', 'b'),
+)
+
+
+def default_store_path():
+    """Файл хранилища: общий каталог из окружения или профиль."""
+    base = os.environ.get(STORE_ENVVAR) or default_model_dir()
+    return os.path.join(base, STORE_FILE)
+
+
+def segment_paths(path):
+    """
+    Файлы хранилища path: сам файл (от прежних версий), если есть,
+    и его сегменты в том же каталоге.
+    """
+    folder = os.path.dirname(path)
+    if not os.path.isdir(folder or '.'):
+        return []
+    prefix = os.path.basename(path) + '.'
+    paths = [os.path.join(folder, name)
+             for name in sorted(os.listdir(folder or '.'))
+             if name.startswith(prefix) and name.endswith(SEGMENT_SUFFIX)]
+    if os.path.exists(path):
+        paths.insert(0, path)
+    return paths
+
+
+def _rounded(value):
+    return round(value, KEY_DIGITS) + 0.0
+
+
+def room_key(geometry, rule_name, rules, index=None):
+    """
+    Ключ помещения: SHA-1 от сегментов границы (с Id стен), уровней стен,
+    имени и значений правил и препятствий уровня, влияющих на расстановку.
+    :param geometry: RoomGeometry
+    :param rules: правила помещения
+    :param index: ClearanceIndex уровня или None
+    :return: строка из 40 шестнадцатеричных цифр
+    """
+    digest = hashlib.sha1()
+    header = json.dumps(
+        [FEATURE_VERSION, geometry.room_id, geometry.level_id,
+         list(geometry.loop_starts), rule_name, sorted(rules.items()),
+         sorted(geometry.wall_levels.items())],
+        ensure_ascii=True, separators=(',', ':'))
+    digest.update(header.encode('ascii'))
+    segments = geometry.segments
+    pack = struct.Struct('<bq8d').pack
+    for i in range(len(segments)):
+        digest.update(pack(
+            segments.kind[i], segments.tags[i],
+            _rounded(segments.x0[i]), _rounded(segments.y0[i]),
+            _rounded(segments.x1[i]), _rounded(segments.y1[i]),
+            _rounded(segments.cx[i]), _rounded(segments.cy[i]),
+            _rounded(segments.radius[i]), _rounded(segments.sweep[i]),
+        ))
+    polygon = geometry.polygon
+    if index is not None and polygon is not None:
+        reach = DEFAULT_MAX_OFFSET + max(
+            [value for value in rules.values()
+             if isinstance(value, (int, float))] + [0.0])
+        boxes = sorted(
+            (box[0],) + tuple(_rounded(value) for value in box[1:])
+            for box in index.boxes(
+                polygon.min_x - reach, polygon.min_y - reach,
+                polygon.max_x + reach, polygon.max_y + reach,
+                ALL_OBSTACLES))
+        box_pack = struct.Struct('<b4d').pack
+        for box in boxes:
+            digest.update(box_pack(*box))
+    return digest.hexdigest()
+
+
+def boundary_polygon(geometry):
+    """
+    Многоугольник границы по хордам сегментов.
+    :return: кортеж (xs, ys, loop_starts)
+    """
+    segments = geometry.segments
+    return (array('d', segments.x0), array('d', segments.y0),
+            array('l', geometry.loop_starts))
+
+
+class RoomEntry(object):
+    """Запись хранилища: признаки, многоугольник и план помещения."""
+    __slots__ = ('rule_name', 'features', 'polygon', 'plan')
+
+    def __init__(self, rule_name, features, polygon, plan):
+        self.rule_name = rule_name
+        self.features = features
+        self.polygon = polygon
+        self.plan = plan
+
+
+class FeatureStore(object):
+    """
+    Хранилище признаков помещений. Сегменты читаются при первом
+    обращении (через mmap), новые записи копятся в памяти до save.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_store_path()
+        self.hits = 0
+        self.misses = 0
+        self._models = []
+        self._rows = None
+        self._pending = {}
+
+    def _load(self):
+        if self._rows is not None:
+            return
+        self._models = []
+        for path in segment_paths(self.path):
+            try:
+                model = MappedModel(path)
+            except (IOError, OSError, ValueError):
+                # Сегмент удалён слиянием в другом процессе или повреждён
+                continue
+            if model.meta.get('version') != FEATURE_VERSION:
+                model.close()
+                continue
+            self._models.append(model)
+        # Записи более новых сегментов заменяют записи старых
+        self._models.sort(key=lambda model: model.meta.get('saved', 0.0))
+        self._rows = {}
+        for model in self._models:
+            for row, key in enumerate(model.meta.get('keys', ())):
+                self._rows[key] = (model, row)
+
+    def __contains__(self, key):
+        self._load()
+        return key in self._pending or key in self._rows
+
+    def get(self, key):
+        """
+        Запись по ключу.
+        :return: RoomEntry или None
+        """
+        entry = self._pending.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        self._load()
+        found = self._rows.get(key)
+        if found is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._read(*found)
+
+    def get_plan(self, key):
+        """План помещения по ключу или None."""
+        entry = self.get(key)
+        return entry.plan if entry is not None else None
+
+    def put(self, key, geometry, rule_name, features, plan):
+        """
+        Добавляет запись (на диск попадает при save).
+        :param features: признаки в порядке FEATURES
+        :param plan: PlacementPlan только этого помещения
+        """
+        self._pending[key] = RoomEntry(
+            rule_name, tuple(features), boundary_polygon(geometry), plan)
+
+    def _read(self, model, row):
+        width = len(FEATURES)
+        features = tuple(model['features'][row * width:(row + 1) * width])
+        start, end = model['poly_offset'][row:row + 2]
+        xs = array('d', model['poly_x'][start:end])
+        ys = array('d', model['poly_y'][start:end])
+        start, end = model['loop_offset'][row:row + 2]
+        loops = array('l', model['loop_start'][start:end])
+        rule_name = model.meta['rules'][row]
+        start, end = model['plan_offset'][row:row + 2]
+        data = {'version': PLAN_VERSION, 'rule_names': [rule_name],
+                'rule': [0] * (end - start)}
+        for name, _ in PLAN_COLUMNS:
+            data[name] = model[name][start:end]
+        plan = PlacementPlan.from_dict(data)
+        return RoomEntry(rule_name, features, (xs, ys, loops), plan)
+
+    def _stored_entries(self):
+        """Последние версии сохранённых записей, от старых к новым."""
+        self._load()
+        for model in self._models:
+            for row, key in enumerate(model.meta.get('keys', ())):
+                if self._rows[key] == (model, row):
+                    yield key, self._read(model, row)
+
+    def save(self):
+        """
+        Дописывает новые записи отдельным сегментом. Файлы других
+        процессов и машин не перезаписываются, поэтому одновременные
+        сохранения в общий каталог не теряют записи друг друга. Когда
+        сегментов больше MAX_SEGMENTS, они сливаются (compact).
+        :return: путь к сегменту или None, если сохранять нечего
+        """
+        if not self._pending:
+            return None
+        self.close()
+        path = self._write_segment(self._pending.items(), time.time())
+        self._pending = {}
+        if len(segment_paths(self.path)) > MAX_SEGMENTS:
+            self.compact()
+        return path
+
+    def compact(self):
+        """
+        Сливает сохранённые сегменты в один (последние MAX_ENTRIES
+        записей) и удаляет слитые. Новый сегмент получает время самого
+        нового из слитых, поэтому сегменты, сохранённые во время слияния,
+        остаются новее. Сегмент, который не удалось удалить (в Windows —
+        открытый другим процессом), сливается снова при следующем вызове.
+        :return: путь к новому сегменту или None
+        """
+        self.close()
+        self._load()
+        try:
+            if len(self._models) < 2:
+                return None
+            entries = list(self._stored_entries())[-MAX_ENTRIES:]
+            saved = max(model.meta.get('saved', 0.0)
+                        for model in self._models)
+            merged = [model.path for model in self._models]
+        finally:
+            self.close()
+        path = self._write_segment(entries, saved)
+        for old in merged:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+        return path
+
+    def _write_segment(self, entries, saved):
+        """Записывает записи в новый сегмент. :return: путь"""
+        arrays = {
+            'features': array('d'), 'poly_offset': array('q', [0]),
+            'poly_x': array('d'), 'poly_y': array('d'),
+            'loop_offset': array('q', [0]), 'loop_start': array('l'),
+            'plan_offset': array('q', [0]),
+        }
+        for name, typecode in PLAN_COLUMNS:
+            arrays[name] = array(typecode)
+        keys = []
+        rules = []
+        for key, entry in entries:
+            keys.append(key)
+            rules.append(entry.rule_name)
+            arrays['features'].extend(entry.features)
+            xs, ys, loops = entry.polygon
+            arrays['poly_x'].extend(xs)
+            arrays['poly_y'].extend(ys)
+            arrays['poly_offset'].append(len(arrays['poly_x']))
+            arrays['loop_start'].extend(loops)
+            arrays['loop_offset'].append(len(arrays['loop_start']))
+            for name, _ in PLAN_COLUMNS:
+                arrays[name].extend(getattr(entry.plan, name))
+            arrays['plan_offset'].append(len(arrays['room_id']))
+        folder = os.path.dirname(self.path)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+        # Имя уникально, поэтому os.replace в write_model не заменяет
+        # чужой файл
+        path = '{0}.{1}{2}'.format(self.path, uuid.uuid4().hex,
+                                   SEGMENT_SUFFIX)
+        write_model(path, arrays, {
+            'version': FEATURE_VERSION, 'keys': keys, 'rules': rules,
+            'saved': saved,
+        })
+        return path
+
+    def close(self):
+        """
+        Закрывает отображения сегментов; следующее обращение читает
+        сегменты заново (с записями других процессов).
+        """
+        for model in self._models:
+            model.close()
+        self._models = []
+        self._rows = None
+
+
+def split_by_room(plan):
+    """
+    Делит план на планы отдельных помещений.
+    :return: {Id помещения: PlacementPlan}
+    """
+    rows = {}
+    for i, room_id in enumerate(plan.room_id):
+        rows.setdefault(room_id, []).append(i)
+    return dict((room_id, plan.select(indices))
+                for room_id, indices in rows.items())
+
+
+_stores = {}
+
+
+def get_feature_store(path=None):
+    """Хранилище признаков (одно на файл в пределах запуска)."""
+    path = path or default_store_path()
+    store = _stores.get(path)
+    if store is None:
+        store = _stores[path] = FeatureStore(path)
+    return store
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Хранилище весов моделей Socket AI+ (классификатор, персонализатор).
+Модель — один файл: заголовок JSON с описанием массивов и сами массивы
+подряд, выровненные по 8 байт. Файл открывается через mmap, а массивы
+отдаются как memoryview прямо поверх отображения, без чтения и разбора.
+Модель загружается при первом обращении и остаётся в хранилище сессии,
+поэтому повторные нажатия кнопки берут её из памяти.
+"""
+import json
+import os
+import struct
+import tempfile
+from array import array
+
+from core.session import get_session_store
+
+MODEL_MAGIC = b'SAIM'
+MODEL_VERSION = 1
+# Сигнатура, версия, длина заголовка JSON
+MODEL_HEADER = struct.Struct('<4sII')
+ALIGNMENT = 8
+MODEL_SUFFIX = '.model'
+
+# Имя хранилища сессии для отображённых моделей
+STORE_NAME = 'models'
+
+
+def default_model_dir():
+    """Каталог моделей в профиле пользователя."""
+    base = os.environ.get('APPDATA') or tempfile.gettempdir()
+    return os.path.join(base, 'WasArchTools', 'SocketAI', 'models')
+
+
+def _padding(offset):
+    return (-offset) % ALIGNMENT
+
+
+def write_model(path, arrays, meta=None):
+    """
+    Записывает массивы в файл модели. Файл заменяется атомарно.
+    :param arrays: {имя: array.array}
+    :param meta: словарь со встроенными типами (сохраняется в JSON)
+    """
+    names = sorted(arrays)
+    entries = {}
+    offset = 0
+    for name in names:
+        values = arrays[name]
+        entries[name] = [values.typecode, offset, len(values)]
+        offset += values.itemsize * len(values)
+        offset += _padding(offset)
+    header = json.dumps({'arrays': entries, 'meta': meta or {}},
+                        ensure_ascii=False).encode('utf-8')
+    start = MODEL_HEADER.size + len(header)
+    start += _padding(start)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(MODEL_HEADER.pack(MODEL_MAGIC, MODEL_VERSION, len(header)))
+        f.write(header)
+        f.write(b'\0' * (start - MODEL_HEADER.size - len(header)))
+        for name in names:
+            data = arrays[name].tobytes()
+            f.write(data)
+            f.write(b'\0' * _padding(len(data)))
+    os.replace(temp_path, path)
+
+
+class MappedModel(object):
+    """
+    Модель, отображённая в память. Массивы берутся по имени
+    (model['weights']) и живут, пока модель не закрыта.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = os.path.getmtime(path)
+        self._file = open(path, 'rb')
+        self._buffer = _map_file(self._file)
+        self._views = {}
+        magic, version, header_size = MODEL_HEADER.unpack_from(
+            self._buffer, 0)
+        if magic != MODEL_MAGIC or version != MODEL_VERSION:
+            self.close()
+            raise ValueError(
+                "Неподдерживаемый файл модели: {0}".format(path))
+        start = MODEL_HEADER.size
+        header = json.loads(
+            bytes(self._buffer[start:start + header_size]).decode('utf-8'))
+        self.meta = header['meta']
+        self.entries = header['arrays']
+        start += header_size
+        self._data_start = start + _padding(start)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __getitem__(self, name):
+        view = self._views.get(name)
+        if view is None:
+            typecode, offset, count = self.entries[name]
+            start = self._data_start + offset
+            size = array(typecode).itemsize * count
+            view = memoryview(self._buffer)[start:start + size]
+            view = view.cast(typecode)
+            self._views[name] = view
+        return view
+
+    def get(self, name, default=None):
+        if name not in self.entries:
+            return default
+        return self[name]
+
+    def close(self):
+        """Освобождает отображение; полученные массивы становятся
+        недействительными."""
+        for view in self._views.values():
+            view.release()
+        self._views = {}
+        close = getattr(self._buffer, 'close', None)
+        if close is not None:
+            try:
+                close()
+            except BufferError:
+                # Массив ещё используется: отображение закроет сборщик
+                pass
+        self._file.close()
+
+
+def _map_file(f):
+    """
+    Отображает файл в память. Если mmap недоступен (или файл пустой),
+    файл читается целиком.
+    """
+    try:
+        import mmap
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (ImportError, ValueError, OSError, EnvironmentError):
+        f.seek(0)
+        return f.read()
+
+
+class ModelStore(object):
+    """
+    Каталог моделей с ленивой загрузкой. Отображённые модели кэшируются
+    в хранилище сессии и перечитываются только при изменении файла.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_model_dir()
+        self._cache = get_session_store(STORE_NAME)
+
+    def model_path(self, name):
+        return os.path.join(self.path, name + MODEL_SUFFIX)
+
+    def load(self, name):
+        """
+        Модель по имени или None, если файла нет.
+        :return: MappedModel
+        """
+        path = self.model_path(name)
+        model = self._cache.get(path)
+        if model is not None:
+            if (os.path.exists(path) and
+                    os.path.getmtime(path) == model.mtime):
+                return model
+            self.evict(name)
+        if not os.path.exists(path):
+            return None
+        model = MappedModel(path)
+        self._cache[path] = model
+        return model
+
+    def save(self, name, arrays, meta=None):
+        """Сохраняет модель; открытое отображение прежней версии
+        закрывается (на Windows иначе файл не заменить)."""
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        self.evict(name)
+        path = self.model_path(name)
+        write_model(path, arrays, meta)
+        return path
+
+    def evict(self, name):
+        model = self._cache.pop(self.model_path(name), None)
+        if model is not None:
+            model.close()
+
+
+_default_store = None
+
+
+def get_model_store():
+    """Хранилище моделей в каталоге по умолчанию."""
+    global _default_store
+    if _default_store is None:
+        _default_store = ModelStore()
+    return _default_store
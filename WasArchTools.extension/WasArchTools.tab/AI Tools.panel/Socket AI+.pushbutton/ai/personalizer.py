@@ -2,4 +2,630 @@
 """
 Модуль персонализации работы ИИ под конкретного пользователя.
 Позволяет адаптировать рекомендации и поведение системы.
+
+Персонализатор учится на правках из журнала (ai/data_logger.py) сразу,
+без облака и еженедельного переобучения. Смещение правки переводится
+в систему координат стены (вдоль стены, по нормали, по высоте) и
+используется двумя способами:
+- линейная модель на тип помещения, обновляемая одним шагом
+  стохастического градиентного спуска на каждую правку;
+- k-d дерево по признакам стены на тип помещения: рекомендация для
+  новой точки — взвешенное среднее смещений ближайших прошлых правок.
+Обновление и запрос занимают микросекунды, поэтому рекомендации можно
+получать прямо во время планирования: personalize_plan сдвигает точки
+готового плана вдоль стен на рекомендованные смещения и проверяет их
+заново правилами планировщика.
 """
+import heapq
+import time
+from array import array
+from math import log, sqrt
+
+from ai.data_logger import (Correction, WALL_FEATURES, read_corrections,
+                            wall_features)
+from core.session import get_session_store
+
+# Признаки для поиска соседей: положение на стене (0..1), длина стены
+# (в масштабе LENGTH_SCALE), внутренняя нормаль, высота исходной точки
+KNN_FEATURES = ('position', 'length', 'normal_x', 'normal_y', 'height')
+LENGTH_SCALE = 10.0
+
+# Смещение правки: вдоль стены, по нормали, по высоте
+OFFSETS = ('along', 'normal', 'height')
+
+DEFAULT_NEIGHBOURS = 5
+# Соседи дальше этого расстояния в пространстве признаков не учитываются
+MAX_NEIGHBOUR_DISTANCE = 0.5
+
+# Шаг градиентного спуска и ограничение на размер шага по ошибке
+LEARNING_RATE = 0.05
+MAX_ERROR = 5.0
+
+# Дерево перестраивается сбалансированным, когда его глубина превышает
+# REBALANCE_FACTOR * log2(n); хранится не больше MAX_POINTS правок
+REBALANCE_FACTOR = 3.0
+MIN_REBALANCE_SIZE = 64
+MAX_POINTS = 20000
+
+# Имя хранилища сессии и имя модели в ai/model_store.py
+STORE_NAME = 'personalizer'
+MODEL_NAME = 'personalizer'
+
+# Сдвиг размещённой розетки меньше этого (футы) правкой не считается
+CORRECTION_TOLERANCE = 0.01
+
+
+def knn_vector(features, z=0.0):
+    """
+    Вектор признаков для поиска соседей.
+    :param features: признаки стены в порядке WALL_FEATURES
+    :param z: высота исходной точки над уровнем
+    """
+    values = dict(zip(WALL_FEATURES, features))
+    length = values.get('length', 0.0)
+    distance = values.get('distance', 0.0)
+    position = distance / length if length else 0.0
+    return (position, length / LENGTH_SCALE, values.get('normal_x', 0.0),
+            values.get('normal_y', 0.0), z)
+
+
+def local_offset(original, corrected, features):
+    """
+    Смещение правки в системе координат стены.
+    :return: кортеж (вдоль стены, по нормали, по высоте)
+    """
+    values = dict(zip(WALL_FEATURES, features))
+    nx = values.get('normal_x', 0.0)
+    ny = values.get('normal_y', 0.0)
+    dx = corrected[0] - original[0]
+    dy = corrected[1] - original[1]
+    # Направление обхода стены: нормаль повёрнута на +90°
+    tx, ty = -ny, nx
+    return (dx * tx + dy * ty, dx * nx + dy * ny,
+            corrected[2] - original[2])
+
+
+def apply_offset(point, features, offset):
+    """Точка point, смещённая на offset в системе координат стены."""
+    values = dict(zip(WALL_FEATURES, features))
+    nx = values.get('normal_x', 0.0)
+    ny = values.get('normal_y', 0.0)
+    along, normal, height = offset
+    return (point[0] - ny * along + nx * normal,
+            point[1] + nx * along + ny * normal,
+            point[2] + height)
+
+
+class KDTree(object):
+    """
+    Инкрементное k-d дерево в параллельных списках.
+    Узел i: точка points[i], значение values[i], потомки left[i]/right[i]
+    (-1 — нет потомка), ось разбиения axis[i]. Признаки вроде нормали
+    стены часто почти постоянны, поэтому ось выбирается не по глубине,
+    а по наибольшему разбросу: при перестройке — среди точек поддерева,
+    при вставке — между новой точкой и её родителем.
+    """
+    __slots__ = ('dim', 'points', 'values', 'left', 'right', 'axis', 'root',
+                 'depth')
+
+    def __init__(self, dim):
+        self.dim = dim
+        self.points = []
+        self.values = []
+        self.left = []
+        self.right = []
+        self.axis = []
+        self.root = -1
+        self.depth = 0
+
+    def __len__(self):
+        return len(self.points)
+
+    def insert(self, point, value):
+        index = len(self.points)
+        self.points.append(point)
+        self.values.append(value)
+        self.left.append(-1)
+        self.right.append(-1)
+        if self.root < 0:
+            self.axis.append(0)
+            self.root = index
+            self.depth = 1
+            return
+        node = self.root
+        depth = 1
+        while True:
+            axis = self.axis[node]
+            depth += 1
+            if point[axis] < self.points[node][axis]:
+                child = self.left[node]
+                if child < 0:
+                    self.left[node] = index
+                    break
+            else:
+                child = self.right[node]
+                if child < 0:
+                    self.right[node] = index
+                    break
+            node = child
+        self.axis.append(_split_axis(point, self.points[node]))
+        if depth > self.depth:
+            self.depth = depth
+        size = len(self.points)
+        if (size >= MIN_REBALANCE_SIZE and
+                self.depth > REBALANCE_FACTOR * log(size, 2)):
+            self.rebuild()
+
+    def rebuild(self, keep=None):
+        """
+        Перестраивает дерево сбалансированным (разбиение по медиане).
+        :param keep: оставить только keep последних точек
+        """
+        items = list(zip(self.points, self.values))
+        if keep is not None:
+            items = items[-keep:]
+        self.points = []
+        self.values = []
+        self.left = []
+        self.right = []
+        self.axis = []
+        self.root = -1
+        self.depth = 0
+        if not items:
+            return
+        # Обход без рекурсии: (элементы, родитель, сторона, глубина)
+        stack = [(items, -1, 0, 0)]
+        while stack:
+            chunk, parent, side, depth = stack.pop()
+            axis = _widest_axis(chunk, self.dim)
+            chunk = sorted(chunk, key=lambda item: item[0][axis])
+            middle = len(chunk) // 2
+            point, value = chunk[middle]
+            index = len(self.points)
+            self.points.append(point)
+            self.values.append(value)
+            self.left.append(-1)
+            self.right.append(-1)
+            self.axis.append(axis)
+            if parent < 0:
+                self.root = index
+            elif side < 0:
+                self.left[parent] = index
+            else:
+                self.right[parent] = index
+            if depth + 1 > self.depth:
+                self.depth = depth + 1
+            if middle:
+                stack.append((chunk[:middle], index, -1, depth + 1))
+            if middle + 1 < len(chunk):
+                stack.append((chunk[middle + 1:], index, 1, depth + 1))
+
+    def nearest(self, point, k, max_distance=None):
+        """
+        k ближайших узлов.
+        :return: список пар (расстояние, значение) по возрастанию
+        """
+        if self.root < 0 or k <= 0:
+            return []
+        limit = float('inf') if max_distance is None else max_distance ** 2
+        best = []
+        points = self.points
+        dim = self.dim
+        stack = [(self.root, 0.0)]
+        while stack:
+            node, bound = stack.pop()
+            if bound > limit or (len(best) == k and bound > -best[0][0]):
+                continue
+            other = points[node]
+            distance = 0.0
+            for a in range(dim):
+                delta = point[a] - other[a]
+                distance += delta * delta
+            if distance <= limit:
+                if len(best) < k:
+                    heapq.heappush(best, (-distance, node))
+                elif distance < -best[0][0]:
+                    heapq.heapreplace(best, (-distance, node))
+            axis = self.axis[node]
+            delta = point[axis] - other[axis]
+            near, far = ((self.left[node], self.right[node]) if delta < 0
+                         else (self.right[node], self.left[node]))
+            if far >= 0:
+                stack.append((far, delta * delta))
+            if near >= 0:
+                stack.append((near, bound))
+        best.sort(reverse=True)
+        return [(sqrt(-distance), self.values[node])
+                for distance, node in best]
+
+
+def _split_axis(point, parent):
+    """Ось, по которой точка сильнее всего отличается от родителя."""
+    best_axis = 0
+    best_delta = -1.0
+    for axis, (a, b) in enumerate(zip(point, parent)):
+        delta = abs(a - b)
+        if delta > best_delta:
+            best_axis = axis
+            best_delta = delta
+    return best_axis
+
+
+def _widest_axis(items, dim):
+    """Ось с наибольшим разбросом координат точек items."""
+    best_axis = 0
+    best_spread = -1.0
+    for axis in range(dim):
+        values = [item[0][axis] for item in items]
+        spread = max(values) - min(values)
+        if spread > best_spread:
+            best_axis = axis
+            best_spread = spread
+    return best_axis
+
+
+class OnlineRegressor(object):
+    """
+    Линейная модель смещения по признакам KNN_FEATURES (со свободным
+    членом), по одному набору весов на каждую компоненту OFFSETS.
+    """
+    __slots__ = ('weights', 'updates')
+
+    def __init__(self):
+        size = len(KNN_FEATURES) + 1
+        self.weights = [[0.0] * size for _ in OFFSETS]
+        self.updates = 0
+
+    def predict(self, vector):
+        inputs = (1.0,) + tuple(vector)
+        return tuple(sum(w * x for w, x in zip(weights, inputs))
+                     for weights in self.weights)
+
+    def update(self, vector, target, rate=LEARNING_RATE):
+        inputs = (1.0,) + tuple(vector)
+        for weights, value in zip(self.weights, target):
+            error = sum(w * x for w, x in zip(weights, inputs)) - value
+            error = max(-MAX_ERROR, min(MAX_ERROR, error))
+            for j, x in enumerate(inputs):
+                weights[j] -= rate * error * x
+        self.updates += 1
+
+
+class Personalizer(object):
+    """
+    Рекомендации смещений розеток по прошлым правкам пользователя.
+    Модель и дерево соседей ведутся отдельно для каждого типа помещения.
+    """
+
+    def __init__(self, neighbours=DEFAULT_NEIGHBOURS,
+                 max_distance=MAX_NEIGHBOUR_DISTANCE):
+        self.neighbours = neighbours
+        self.max_distance = max_distance
+        self.models = {}
+        self.trees = {}
+        # Время последней учтённой правки журнала
+        self.last_timestamp = 0.0
+
+    def __len__(self):
+        return sum(len(tree) for tree in self.trees.values())
+
+    def update(self, room_type, original, corrected, features):
+        """
+        Учитывает одну правку.
+        :param original, corrected: точки (x, y, z)
+        :param features: признаки стены в порядке WALL_FEATURES
+        """
+        vector = knn_vector(features, original[2])
+        offset = local_offset(original, corrected, features)
+        model = self.models.get(room_type)
+        if model is None:
+            model = self.models[room_type] = OnlineRegressor()
+        model.update(vector, offset)
+        tree = self.trees.get(room_type)
+        if tree is None:
+            tree = self.trees[room_type] = KDTree(len(KNN_FEATURES))
+        tree.insert(vector, offset)
+        if len(tree) > MAX_POINTS:
+            tree.rebuild(MAX_POINTS // 2)
+
+    def observe(self, correction):
+        """Учитывает запись Correction из журнала правок."""
+        self.update(correction.room_type, correction.original,
+                    correction.corrected, correction.features)
+        if correction.timestamp > self.last_timestamp:
+            self.last_timestamp = correction.timestamp
+
+    def to_arrays(self):
+        """
+        Состояние для хранилища моделей: плоские массивы на каждый тип
+        помещения (ключи «тип/массив») и meta.
+        :return: кортеж (arrays, meta)
+        """
+        arrays = {}
+        roots = {}
+        updates = {}
+        for room_type, model in self.models.items():
+            tree = self.trees[room_type]
+            prefix = room_type + '/'
+            arrays[prefix + 'weights'] = array(
+                'd', [w for weights in model.weights for w in weights])
+            arrays[prefix + 'points'] = array(
+                'd', [x for point in tree.points for x in point])
+            arrays[prefix + 'values'] = array(
+                'd', [x for value in tree.values for x in value])
+            arrays[prefix + 'left'] = array('l', tree.left)
+            arrays[prefix + 'right'] = array('l', tree.right)
+            arrays[prefix + 'axis'] = array('b', tree.axis)
+            roots[room_type] = [tree.root, tree.depth]
+            updates[room_type] = model.updates
+        meta = {
+            'types': sorted(self.models),
+            'roots': roots,
+            'updates': updates,
+            'last_timestamp': self.last_timestamp,
+        }
+        return arrays, meta
+
+    @classmethod
+    def from_model(cls, model):
+        """Восстанавливает персонализатор из MappedModel."""
+        personalizer = cls()
+        meta = model.meta
+        personalizer.last_timestamp = meta.get('last_timestamp', 0.0)
+        dim = len(KNN_FEATURES)
+        width = len(OFFSETS)
+        for room_type in meta['types']:
+            prefix = room_type + '/'
+            regressor = OnlineRegressor()
+            flat = model[prefix + 'weights']
+            size = len(KNN_FEATURES) + 1
+            regressor.weights = [list(flat[j * size:(j + 1) * size])
+                                 for j in range(width)]
+            regressor.updates = meta['updates'][room_type]
+            tree = KDTree(dim)
+            points = model[prefix + 'points']
+            values = model[prefix + 'values']
+            tree.points = [tuple(points[i:i + dim])
+                           for i in range(0, len(points), dim)]
+            tree.values = [tuple(values[i:i + width])
+                           for i in range(0, len(values), width)]
+            tree.left = list(model[prefix + 'left'])
+            tree.right = list(model[prefix + 'right'])
+            tree.axis = list(model[prefix + 'axis'])
+            tree.root, tree.depth = meta['roots'][room_type]
+            personalizer.models[room_type] = regressor
+            personalizer.trees[room_type] = tree
+        return personalizer
+
+    def suggest(self, room_type, point, features):
+        """
+        Рекомендуемое смещение точки в системе координат стены.
+        Если рядом есть прошлые правки — их взвешенное по расстоянию
+        среднее, иначе предсказание линейной модели.
+        :return: кортеж (вдоль, по нормали, по высоте) или None,
+            если для типа помещения правок ещё нет
+        """
+        model = self.models.get(room_type)
+        if model is None:
+            return None
+        vector = knn_vector(features, point[2])
+        neighbours = self.trees[room_type].nearest(
+            vector, self.neighbours, self.max_distance)
+        if not neighbours:
+            return model.predict(vector)
+        total = 0.0
+        sums = [0.0] * len(OFFSETS)
+        for distance, offset in neighbours:
+            weight = 1.0 / (distance + 1e-3)
+            total += weight
+            for j, value in enumerate(offset):
+                sums[j] += weight * value
+        return tuple(value / total for value in sums)
+
+    def suggest_many(self, items):
+        """
+        Рекомендации для списка запросов (как InferenceClient.suggest_many).
+        :param items: список (room_type, point, features)
+        :return: список смещений или None
+        """
+        return [self.suggest(room_type, point, features)
+                for room_type, point, features in items]
+
+    def suggest_point(self, room_type, point, features):
+        """Рекомендуемая точка (x, y, z) или None."""
+        offset = self.suggest(room_type, point, features)
+        if offset is None:
+            return None
+        return apply_offset(point, features, offset)
+
+
+def _nearest_segment(segments, indices, x, y):
+    """Сегмент из indices, ближайший к точке (x, y)."""
+    from core.intervals import segment_param
+    best = indices[0]
+    best_distance = None
+    for index in indices:
+        along = segment_param(segments, index, x, y)
+        px, py, _, _ = segments.point_at(index, along)
+        distance = (px - x) ** 2 + (py - y) ** 2
+        if best_distance is None or distance < best_distance:
+            best = index
+            best_distance = distance
+    return best
+
+
+def plan_requests(plan, geometries):
+    """
+    Запросы рекомендаций для строк плана.
+    :param plan: PlacementPlan
+    :param geometries: RoomGeometry помещений плана
+    :return: кортеж (номера строк, список (тип помещения, точка,
+        признаки), индексы сегментов стен строк)
+    """
+    rooms = dict((geometry.room_id, geometry) for geometry in geometries)
+    walls = {}
+    rows = []
+    items = []
+    seg_indices = []
+    for i in range(len(plan)):
+        geometry = rooms.get(plan.room_id[i])
+        if geometry is None:
+            continue
+        key = (plan.room_id[i], plan.wall_id[i])
+        indices = walls.get(key)
+        if indices is None:
+            tags = geometry.segments.tags
+            indices = walls[key] = [
+                index for index in geometry.wall_segments
+                if tags[index] == plan.wall_id[i]]
+        if not indices:
+            continue
+        x = plan.x[i]
+        y = plan.y[i]
+        index = _nearest_segment(geometry.segments, indices, x, y)
+        rows.append(i)
+        seg_indices.append(index)
+        items.append((plan.rule_names[plan.rule[i]], (x, y, plan.z[i]),
+                      wall_features(geometry.segments, index, x, y)))
+    return rows, items, seg_indices
+
+
+def personalize_plan(plan, geometries, suggest_many, engine, indexes=None,
+                     fallbacks=None):
+    """
+    Сдвигает точки плана на рекомендованные смещения (на месте).
+    Смещение по нормали отбрасывается: точка сдвигается вдоль своего
+    сегмента стены и по высоте, угол пересчитывается по сегменту.
+    Сдвинутая точка проверяется planner.check_moved_points (проёмы,
+    углы, конец стены, помещение, расстояния до препятствий); не
+    прошедшие проверку строки остаются без изменений.
+    :param plan: PlacementPlan
+    :param geometries: RoomGeometry помещений плана
+    :param suggest_many: Personalizer.suggest_many или
+        InferenceClient.suggest_many
+    :param engine: RuleEngine (правила помещений по именам правил плана)
+    :param indexes: {Id уровня: ClearanceIndex}
+    :param fallbacks: {Id помещения: fallback(x, y)} для точек у границы
+    :return: число сдвинутых строк
+    """
+    from core.intervals import segment_param
+    from core.planner import check_moved_points
+    rows, items, seg_indices = plan_requests(plan, geometries)
+    if not rows:
+        return 0
+    indexes = indexes or {}
+    fallbacks = fallbacks or {}
+    rooms = dict((geometry.room_id, geometry) for geometry in geometries)
+    # {Id помещения: (строки, сегменты, расстояния, высоты)}
+    moves = {}
+    for i, item, index, offset in zip(rows, items, seg_indices,
+                                      suggest_many(items)):
+        if not offset:
+            continue
+        _, point, _ = item
+        geometry = rooms[plan.room_id[i]]
+        along = segment_param(geometry.segments, index, point[0], point[1])
+        move = moves.get(plan.room_id[i])
+        if move is None:
+            move = moves[plan.room_id[i]] = ([], array('l'), array('d'), [])
+        move[0].append(i)
+        move[1].append(index)
+        move[2].append(along + offset[0])
+        move[3].append(point[2] + offset[2])
+    moved = 0
+    for room_id, (room_rows, indices, distances, heights) in moves.items():
+        geometry = rooms[room_id]
+        rules = engine.get_room_rules(plan.rule_names[plan.rule[room_rows[0]]])
+        batch, flags = check_moved_points(
+            geometry, rules, indices, distances,
+            indexes.get(geometry.level_id), fallbacks.get(room_id))
+        for k, flag in enumerate(flags):
+            if flag is None:
+                continue
+            i = room_rows[k]
+            plan.x[i] = batch.x[k]
+            plan.y[i] = batch.y[k]
+            plan.z[i] = heights[k]
+            plan.angle[i] = batch.angle[k]
+            plan.flag[i] = flag
+            moved += 1
+    return moved
+
+
+def plan_corrections(plan, geometries, positions,
+                     tolerance=CORRECTION_TOLERANCE):
+    """
+    Правки пользователя по размещённому плану: строки, розетки которых
+    сдвинуты дальше tolerance по любой оси.
+    :param plan: PlacementPlan размещённых розеток
+    :param geometries: RoomGeometry помещений плана
+    :param positions: {строка плана: (x, y, z)} — текущие точки розеток
+    :return: список Correction
+    """
+    rows, items, _ = plan_requests(plan, geometries)
+    now = time.time()
+    corrections = []
+    for i, (room_type, original, features) in zip(rows, items):
+        corrected = positions.get(i)
+        if corrected is None:
+            continue
+        if max(abs(a - b) for a, b in zip(original, corrected)) <= tolerance:
+            continue
+        corrections.append(Correction(
+            now, plan.room_id[i], plan.wall_id[i], room_type, original,
+            tuple(corrected), features))
+    return corrections
+
+
+def observe_corrections(corrections, path=None):
+    """
+    Учитывает новые правки в персонализаторе сессии, если он уже
+    загружен; иначе они будут прочитаны из журнала при загрузке.
+    :param path: каталог журнала правок (как у get_personalizer)
+    """
+    personalizer = get_session_store(STORE_NAME).get(path or '')
+    if personalizer is None:
+        return
+    for correction in corrections:
+        personalizer.observe(correction)
+
+
+def load_personalizer(path=None, models=None):
+    """
+    Персонализатор из сохранённой модели, дообученный на правках
+    журнала, сделанных после её сохранения. Без модели журнал
+    читается целиком.
+    :param path: каталог журнала правок
+    :param models: ModelStore (по умолчанию каталог моделей пользователя)
+    """
+    from ai.model_store import get_model_store
+    model = (models or get_model_store()).load(MODEL_NAME)
+    if model is not None:
+        personalizer = Personalizer.from_model(model)
+    else:
+        personalizer = Personalizer()
+    since = personalizer.last_timestamp
+    for correction in read_corrections(path):
+        if correction.timestamp > since:
+            personalizer.observe(correction)
+    return personalizer
+
+
+def save_personalizer(personalizer, models=None):
+    """Сохраняет состояние в хранилище моделей. :return: путь"""
+    from ai.model_store import get_model_store
+    arrays, meta = personalizer.to_arrays()
+    return (models or get_model_store()).save(MODEL_NAME, arrays, meta)
+
+
+def get_personalizer(path=None):
+    """
+    Персонализатор сессии: модель и журнал читаются один раз, дальше
+    модель дообучается через observe/update.
+    """
+    store = get_session_store(STORE_NAME)
+    key = path or ''
+    personalizer = store.get(key)
+    if personalizer is None:
+        personalizer = store[key] = load_personalizer(path)
+    return personalizer
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+Растровые снимки помещений для моделей ИИ (generate_room_image из плана).
+Пакет помещений рисуется одним вызовом в заранее выделенный буфер
+формы (помещения, каналы, высота, ширина) байтами 0/255:
+- канал INTERIOR — заливка помещения по правилу чёт-нечет (построчно);
+- канал WALLS — сегменты границы, лежащие на стенах;
+- канал DOORS — двери и окна;
+- канал FIXTURES — мойки и телевизоры.
+Помещение вписывается в кадр с сохранением пропорций; масштаб и
+начало координат каждого снимка хранятся в буфере, чтобы переводить
+пиксели обратно в координаты модели. Снимки пишутся на место в общий
+буфер, отдельные массивы пикселей не создаются. Остаются мелкие
+временные объекты: список рёбер на помещение, точки вдоль стен и срезы
+memoryview заливки (без копирования байтов).
+
+Пока ни конвейер script.py, ни модели ai/ снимки не используют: модуль
+подготовлен для будущей модели по изображениям помещений.
+"""
+from array import array
+from math import ceil, floor
+
+from core.collisions import DOOR, SINK, TV, WINDOW
+
+# Каналы снимка
+INTERIOR = 0
+WALLS = 1
+DOORS = 2
+FIXTURES = 3
+CHANNELS = 4
+
+DEFAULT_SIZE = 64
+# Поле вокруг помещения, пиксели
+DEFAULT_PADDING = 2
+FILL = 255
+
+# Препятствия для каналов DOORS и FIXTURES
+CHANNEL_KINDS = ((DOORS, DOOR | WINDOW), (FIXTURES, SINK | TV))
+
+
+class SnapshotBuffer(object):
+    """
+    Буфер снимков: bytearray на capacity помещений и параметры
+    преобразования каждого снимка (x = origin_x + col / scale,
+    y = origin_y - row / scale для центра пикселя).
+    """
+    __slots__ = ('capacity', 'size', 'channels', 'data', 'scale',
+                 'origin_x', 'origin_y', 'room_id', 'count', '_blank',
+                 '_ones')
+
+    def __init__(self, capacity, size=DEFAULT_SIZE, channels=CHANNELS):
+        self.capacity = capacity
+        self.size = size
+        self.channels = channels
+        self.data = bytearray(capacity * channels * size * size)
+        self.scale = array('d', [0.0]) * capacity
+        self.origin_x = array('d', [0.0]) * capacity
+        self.origin_y = array('d', [0.0]) * capacity
+        self.room_id = array('q', [-1]) * capacity
+        self.count = 0
+        self._blank = bytes(channels * size * size)
+        # Срез memoryview не копирует байты
+        self._ones = memoryview(bytes(bytearray([FILL]) * size))
+
+    @property
+    def room_bytes(self):
+        return self.channels * self.size * self.size
+
+    def offset(self, i, channel=0, row=0, col=0):
+        """Смещение пикселя в data."""
+        size = self.size
+        return ((i * self.channels + channel) * size + row) * size + col
+
+    def view(self, i):
+        """memoryview снимка i: каналы подряд, строки по size байт."""
+        start = i * self.room_bytes
+        return memoryview(self.data)[start:start + self.room_bytes]
+
+    def pixel(self, i, channel, row, col):
+        return self.data[self.offset(i, channel, row, col)]
+
+    def to_model(self, i, row, col):
+        """Координаты модели центра пикселя (row, col) снимка i."""
+        scale = self.scale[i]
+        return (self.origin_x[i] + (col + 0.5) / scale,
+                self.origin_y[i] - (row + 0.5) / scale)
+
+
+def _fit(buffer, i, polygon, padding):
+    """Масштаб и начало координат, вписывающие помещение в кадр."""
+    inner = buffer.size - 2 * padding
+    width = polygon.max_x - polygon.min_x
+    depth = polygon.max_y - polygon.min_y
+    extent = max(width, depth) or 1.0
+    scale = inner / extent
+    # Центрирование по короткой стороне
+    buffer.scale[i] = scale
+    buffer.origin_x[i] = (polygon.min_x - padding / scale -
+                          (extent - width) * 0.5)
+    buffer.origin_y[i] = (polygon.max_y + padding / scale +
+                          (extent - depth) * 0.5)
+    return scale
+
+
+def _fill_interior(buffer, i, polygon):
+    """Построчная заливка чёт-нечет по рёбрам многоугольника."""
+    size = buffer.size
+    data = buffer.data
+    ones = buffer._ones
+    scale = buffer.scale[i]
+    ox = buffer.origin_x[i]
+    oy = buffer.origin_y[i]
+    # Рёбра в пикселях: (строка a, столбец a, строка b, столбец b)
+    edges = [((oy - ay) * scale, (ax - ox) * scale,
+              (oy - by) * scale, (bx - ox) * scale)
+             for ax, ay, bx, by in zip(polygon.ax, polygon.ay,
+                                       polygon.bx, polygon.by)]
+    base = buffer.offset(i, INTERIOR)
+    crossings = []
+    for row in range(size):
+        y = row + 0.5
+        del crossings[:]
+        for ra, ca, rb, cb in edges:
+            if (ra > y) != (rb > y):
+                crossings.append(ca + (y - ra) * (cb - ca) / (rb - ra))
+        if len(crossings) < 2:
+            continue
+        crossings.sort()
+        row_start = base + row * size
+        for k in range(0, len(crossings) - 1, 2):
+            # Пиксели с центрами между пересечениями
+            first = max(0, int(ceil(crossings[k] - 0.5)))
+            last = min(size - 1, int(floor(crossings[k + 1] - 0.5)))
+            if last >= first:
+                data[row_start + first:row_start + last + 1] = \
+                    ones[:last - first + 1]
+
+
+def _draw_walls(buffer, i, segments, wall_segments):
+    """Сегменты стен: точки вдоль сегмента с шагом в полпикселя."""
+    size = buffer.size
+    data = buffer.data
+    scale = buffer.scale[i]
+    ox = buffer.origin_x[i]
+    oy = buffer.origin_y[i]
+    base = buffer.offset(i, WALLS)
+    step = 0.5 / scale
+    point_at = segments.point_at
+    for index in wall_segments:
+        length = segments.length[index]
+        for k in range(int(length / step) + 1):
+            x, y, _, _ = point_at(index, k * step)
+            col = int((x - ox) * scale)
+            row = int((oy - y) * scale)
+            if 0 <= row < size and 0 <= col < size:
+                data[base + row * size + col] = FILL
+
+
+def _fill_boxes(buffer, i, channel, boxes):
+    """Габариты препятствий — закрашенные прямоугольники."""
+    size = buffer.size
+    data = buffer.data
+    ones = buffer._ones
+    scale = buffer.scale[i]
+    ox = buffer.origin_x[i]
+    oy = buffer.origin_y[i]
+    base = buffer.offset(i, channel)
+    for _, min_x, min_y, max_x, max_y in boxes:
+        first_col = max(0, int((min_x - ox) * scale))
+        last_col = min(size - 1, int((max_x - ox) * scale))
+        first_row = max(0, int((oy - max_y) * scale))
+        last_row = min(size - 1, int((oy - min_y) * scale))
+        if last_col < first_col:
+            continue
+        width = last_col - first_col + 1
+        for row in range(first_row, last_row + 1):
+            start = base + row * size + first_col
+            data[start:start + width] = ones[:width]
+
+
+def rasterize_rooms(geometries, buffer, indexes=None, start=0,
+                    padding=DEFAULT_PADDING):
+    """
+    Рисует снимки помещений в буфер.
+    :param geometries: список RoomGeometry
+    :param buffer: SnapshotBuffer
+    :param indexes: {Id уровня: ClearanceIndex} для каналов дверей
+        и оборудования
+    :param start: номер первого снимка в буфере
+    :return: число нарисованных снимков (не больше свободного места)
+    """
+    indexes = indexes or {}
+    room_bytes = buffer.room_bytes
+    count = min(len(geometries), buffer.capacity - start)
+    for k in range(count):
+        geometry = geometries[k]
+        i = start + k
+        offset = i * room_bytes
+        buffer.data[offset:offset + room_bytes] = buffer._blank
+        buffer.room_id[i] = geometry.room_id
+        polygon = geometry.polygon
+        if polygon is None or not len(polygon):
+            buffer.scale[i] = 0.0
+            continue
+        scale = _fit(buffer, i, polygon, padding)
+        _fill_interior(buffer, i, polygon)
+        _draw_walls(buffer, i, geometry.segments, geometry.wall_segments)
+        index = indexes.get(geometry.level_id)
+        if index is None:
+            continue
+        margin = padding / scale
+        for channel, kinds in CHANNEL_KINDS:
+            _fill_boxes(buffer, i, channel, index.boxes(
+                polygon.min_x - margin, polygon.min_y - margin,
+                polygon.max_x + margin, polygon.max_y + margin, kinds))
+    buffer.count = max(buffer.count, start + count)
+    return count
+
+
+def generate_room_image(geometry, index=None, size=DEFAULT_SIZE):
+    """Снимок одного помещения. :return: SnapshotBuffer на один снимок"""
+    buffer = SnapshotBuffer(1, size)
+    indexes = {geometry.level_id: index} if index is not None else None
+    rasterize_rooms([geometry], buffer, indexes)
+    return buffer
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+Локальный сервис моделей Socket AI+ (замена облачного бэкенда из плана).
+Запускается отдельным процессом CPython 3.7+ на машине пользователя:
+
+    python ai/service.py --port 8765
+
+Несколько сессий Revit подключаются к одному сервису по TCP на
+127.0.0.1 (см. ai/service_client.py) и пользуются одними и теми же
+моделями: веса загружаются один раз, правки всех сессий сразу
+учитываются персонализатором.
+
+Протокол — строки JSON: запрос {"id", "op", "args"}, ответ
+{"id", "result"} или {"id", "error"}. Запросы каждой операции
+собираются в пачки: пачка обрабатывается, когда набралось max_batch
+запросов или с первого запроса прошло max_delay секунд, так что
+задержка ответа ограничена сверху.
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+
+BUNDLE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BUNDLE_DIR not in sys.path:
+    sys.path.insert(0, BUNDLE_DIR)
+
+from ai.classifier import complexity_score, load_model  # noqa: E402
+from ai.model_store import ModelStore  # noqa: E402
+from ai.personalizer import load_personalizer, save_personalizer  # noqa
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Пачка: не больше MAX_BATCH запросов и не дольше MAX_DELAY секунд
+# ожидания с момента первого запроса
+DEFAULT_MAX_BATCH = 256
+DEFAULT_MAX_DELAY = 0.005
+
+# Персонализатор сохраняется после стольких новых правок
+SAVE_EVERY = 500
+
+# Предел длины строки запроса
+MAX_LINE = 1024 * 1024
+
+
+class MicroBatcher(object):
+    """
+    Очередь запросов одной операции. handler(list args) -> list results
+    вызывается для пачки целиком.
+    """
+
+    def __init__(self, name, handler, max_batch=DEFAULT_MAX_BATCH,
+                 max_delay=DEFAULT_MAX_DELAY):
+        self.name = name
+        self.handler = handler
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.queue = None
+        self.batches = 0
+        self.requests = 0
+        self.max_latency = 0.0
+
+    async def submit(self, args):
+        future = asyncio.get_event_loop().create_future()
+        await self.queue.put((time.perf_counter(), args, future))
+        return await future
+
+    def start(self):
+        """Запускает обработчик очереди в текущем цикле событий."""
+        self.queue = asyncio.Queue()
+        return asyncio.ensure_future(self.run())
+
+    async def run(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            items = [await self.queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(items) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(
+                        await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self._process(items)
+
+    def _process(self, items):
+        try:
+            results = self.handler([args for _, args, _ in items])
+        except Exception as e:  # ошибка модели возвращается клиентам
+            results = [e] * len(items)
+        now = time.perf_counter()
+        self.batches += 1
+        self.requests += len(items)
+        for (started, _, future), result in zip(items, results):
+            self.max_latency = max(self.max_latency, now - started)
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+class InferenceService(object):
+    """
+    Модели сервиса и обработчики пачек.
+    Операции: classify (признаки помещений -> оценки сложности),
+    suggest (рекомендации смещений), observe (учёт правок), stats.
+    """
+
+    def __init__(self, models=None, corrections_path=None,
+                 max_batch=DEFAULT_MAX_BATCH, max_delay=DEFAULT_MAX_DELAY):
+        self.models = models or ModelStore()
+        self.weights, self.threshold = load_model(self.models)
+        self.personalizer = load_personalizer(corrections_path, self.models)
+        self.unsaved = 0
+        self.batchers = dict(
+            (name, MicroBatcher(name, handler, max_batch, max_delay))
+            for name, handler in (
+                ('classify', self.classify),
+                ('suggest', self.suggest),
+                ('observe', self.observe),
+            ))
+
+    def classify(self, batch):
+        """args: {'features': [[...], ...]} -> [[оценка, сложное?], ...]"""
+        results = []
+        for args in batch:
+            scores = []
+            for features in args['features']:
+                score = complexity_score(features, self.weights)
+                scores.append([score, score >= self.threshold])
+            results.append(scores)
+        return results
+
+    def suggest(self, batch):
+        """args: {'room_type', 'point', 'features'} -> смещение или None"""
+        suggest = self.personalizer.suggest
+        return [suggest(args['room_type'], args['point'], args['features'])
+                for args in batch]
+
+    def observe(self, batch):
+        """args: {'room_type', 'original', 'corrected', 'features'}"""
+        update = self.personalizer.update
+        for args in batch:
+            update(args['room_type'], args['original'], args['corrected'],
+                   args['features'])
+        self.unsaved += len(batch)
+        if self.unsaved >= SAVE_EVERY:
+            self.save()
+        return [True] * len(batch)
+
+    def stats(self):
+        return dict(
+            (name, {
+                'requests': batcher.requests,
+                'batches': batcher.batches,
+                'max_latency': batcher.max_latency,
+            })
+            for name, batcher in self.batchers.items())
+
+    def save(self):
+        if self.unsaved:
+            save_personalizer(self.personalizer, self.models)
+            self.unsaved = 0
+
+    async def dispatch(self, request):
+        op = request.get('op')
+        if op == 'stats':
+            return self.stats()
+        batcher = self.batchers.get(op)
+        if batcher is None:
+            raise ValueError("Неизвестная операция: {0}".format(op))
+        return await batcher.submit(request.get('args') or {})
+
+    async def handle_client(self, reader, writer):
+        """
+        Соединение одной сессии. Запросы обрабатываются параллельно,
+        ответы пишутся по мере готовности (клиент сопоставляет их по id).
+        """
+        lock = asyncio.Lock()
+        pending = set()
+
+        async def answer(request):
+            response = {'id': request.get('id')}
+            try:
+                response['result'] = await self.dispatch(request)
+            except Exception as e:
+                response['error'] = u'{0}'.format(e)
+            data = json.dumps(response, ensure_ascii=False) + '\n'
+            async with lock:
+                writer.write(data.encode('utf-8'))
+                await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    continue
+                task = asyncio.ensure_future(answer(request))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.wait(pending)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        workers = [batcher.start() for batcher in self.batchers.values()]
+        server = await asyncio.start_server(
+            self.handle_client, host, port, limit=MAX_LINE)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            self.save()
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH)
+    parser.add_argument('--max-delay', type=float, default=DEFAULT_MAX_DELAY,
+                        help=u'предел ожидания пачки, с')
+    parser.add_argument('--models', help=u'каталог моделей')
+    parser.add_argument('--corrections', help=u'каталог журнала правок')
+    args = parser.parse_args(argv)
+    service = InferenceService(
+        ModelStore(args.models) if args.models else None, args.corrections,
+        args.max_batch, args.max_delay)
+    # SIGTERM завершает сервис так же, как Ctrl+C: с сохранением модели
+    signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
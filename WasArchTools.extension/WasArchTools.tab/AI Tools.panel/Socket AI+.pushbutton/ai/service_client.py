@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Клиент локального сервиса моделей (ai/service.py) для скриптов pyRevit.
+Использует только socket и json, поэтому работает и в IronPython.
+Запросы отправляются пачкой в одном соединении, ответы сопоставляются
+по id. Если сервис не запущен, вызывающий код получает
+ServiceUnavailable и считает модели локально.
+"""
+import json
+import os
+import socket
+
+DEFAULT_ADDRESS = '127.0.0.1:8765'
+# Переменная окружения с адресом сервиса (хост:порт)
+ADDRESS_ENVVAR = 'SOCKETAI_SERVICE'
+
+DEFAULT_TIMEOUT = 2.0
+CONNECT_TIMEOUT = 0.2
+
+
+class ServiceUnavailable(Exception):
+    """Сервис не запущен или не ответил вовремя."""
+
+
+class ServiceError(Exception):
+    """Сервис вернул ошибку для запроса."""
+
+
+def service_address():
+    """Адрес сервиса из окружения: кортеж (хост, порт)."""
+    value = os.environ.get(ADDRESS_ENVVAR) or DEFAULT_ADDRESS
+    host, _, port = value.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+class InferenceClient(object):
+    """Соединение с сервисом моделей."""
+
+    def __init__(self, address=None, timeout=DEFAULT_TIMEOUT):
+        self.address = address or service_address()
+        self.timeout = timeout
+        self._socket = None
+        self._buffer = b''
+        self._next_id = 0
+
+    def connect(self):
+        if self._socket is not None:
+            return
+        try:
+            sock = socket.create_connection(self.address, CONNECT_TIMEOUT)
+        except (socket.error, OSError) as e:
+            raise ServiceUnavailable(u'{0}'.format(e))
+        sock.settimeout(self.timeout)
+        self._socket = sock
+
+    def close(self):
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            finally:
+                self._socket = None
+                self._buffer = b''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def _read_line(self):
+        while b'\n' not in self._buffer:
+            chunk = self._socket.recv(65536)
+            if not chunk:
+                raise ServiceUnavailable(u'Сервис закрыл соединение')
+            self._buffer += chunk
+        line, self._buffer = self._buffer.split(b'\n', 1)
+        return json.loads(line.decode('utf-8'))
+
+    def call_many(self, op, args_list):
+        """
+        Отправляет запросы одной операции за один проход: сначала все
+        запросы, затем чтение ответов.
+        :return: список результатов в порядке args_list
+        """
+        if not args_list:
+            return []
+        self.connect()
+        ids = []
+        lines = []
+        for args in args_list:
+            self._next_id += 1
+            ids.append(self._next_id)
+            lines.append(json.dumps(
+                {'id': self._next_id, 'op': op, 'args': args}))
+        results = {}
+        try:
+            self._socket.sendall(
+                (u'\n'.join(lines) + u'\n').encode('utf-8'))
+            while len(results) < len(ids):
+                response = self._read_line()
+                results[response.get('id')] = response
+        except (socket.error, OSError, ValueError) as e:
+            self.close()
+            raise ServiceUnavailable(u'{0}'.format(e))
+        output = []
+        for request_id in ids:
+            response = results[request_id]
+            if 'error' in response:
+                raise ServiceError(response['error'])
+            output.append(response.get('result'))
+        return output
+
+    def call(self, op, args=None):
+        return self.call_many(op, [args or {}])[0]
+
+    def classify(self, features_list):
+        """
+        Оценки сложности по признакам помещений (порядок FEATURES).
+        :return: список пар [оценка, сложное?]
+        """
+        return self.call('classify', {'features': [
+            list(features) for features in features_list]})
+
+    def suggest_many(self, items):
+        """
+        Рекомендации смещений.
+        :param items: список (room_type, point, features)
+        :return: список смещений (вдоль, по нормали, по высоте) или None
+        """
+        return self.call_many('suggest', [
+            {'room_type': room_type, 'point': list(point),
+             'features': list(features)}
+            for room_type, point, features in items])
+
+    def observe(self, room_type, original, corrected, features):
+        """Передаёт правку персонализатору сервиса."""
+        return self.call('observe', {
+            'room_type': room_type, 'original': list(original),
+            'corrected': list(corrected), 'features': list(features)})
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+Заменитель подмножества Revit API для запуска Socket AI+ вне Revit.
+Покрывает то, что используют script.py и модули core: XYZ, Line, Arc,
+ElementId, BoundarySegment, Wall, Room, Document. install() регистрирует
+модуль как Autodesk.Revit.DB, чтобы отложенные импорты в core работали
+без изменений.
+"""
+import sys
+import types
+from math import cos, sin, sqrt
+
+
+class XYZ(object):
+    __slots__ = ('X', 'Y', 'Z')
+
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.X = x
+        self.Y = y
+        self.Z = z
+
+    def __repr__(self):
+        return "XYZ({0:.4f}, {1:.4f}, {2:.4f})".format(self.X, self.Y, self.Z)
+
+
+XYZ.BasisZ = XYZ(0.0, 0.0, 1.0)
+
+
+class ElementId(object):
+    __slots__ = ('IntegerValue',)
+
+    def __init__(self, value):
+        self.IntegerValue = int(value)
+
+    @property
+    def Value(self):
+        return self.IntegerValue
+
+    def __eq__(self, other):
+        return getattr(other, 'IntegerValue', None) == self.IntegerValue
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.IntegerValue)
+
+
+ElementId.InvalidElementId = ElementId(-1)
+
+
+class Curve(object):
+    """Общая часть Line и Arc: параметризация по нормированному параметру."""
+
+    def GetEndPoint(self, index):
+        return self.Evaluate(float(index), True)
+
+    def Tessellate(self):
+        count = max(2, int(self.Length) + 1)
+        return [self.Evaluate(i / float(count), True)
+                for i in range(count + 1)]
+
+
+class Line(Curve):
+    def __init__(self, p0, p1, bound=True):
+        self._p0 = p0
+        self._p1 = p1
+        self.IsBound = bound
+
+    @classmethod
+    def CreateBound(cls, p0, p1):
+        return cls(p0, p1)
+
+    @classmethod
+    def CreateUnbound(cls, origin, direction):
+        return cls(origin, XYZ(origin.X + direction.X, origin.Y + direction.Y,
+                               origin.Z + direction.Z), bound=False)
+
+    @property
+    def Length(self):
+        return sqrt((self._p1.X - self._p0.X) ** 2 +
+                    (self._p1.Y - self._p0.Y) ** 2 +
+                    (self._p1.Z - self._p0.Z) ** 2)
+
+    @property
+    def Direction(self):
+        length = self.Length or 1.0
+        return XYZ((self._p1.X - self._p0.X) / length,
+                   (self._p1.Y - self._p0.Y) / length,
+                   (self._p1.Z - self._p0.Z) / length)
+
+    def Evaluate(self, parameter, normalized=True):
+        t = parameter if normalized else parameter / (self.Length or 1.0)
+        return XYZ(self._p0.X + (self._p1.X - self._p0.X) * t,
+                   self._p0.Y + (self._p1.Y - self._p0.Y) * t,
+                   self._p0.Z + (self._p1.Z - self._p0.Z) * t)
+
+
+class Arc(Curve):
+    """Дуга в плоскости XY; sweep > 0 — против часовой стрелки."""
+
+    def __init__(self, center, radius, start_angle, sweep):
+        self.Center = center
+        self.Radius = radius
+        self._start = start_angle
+        self._sweep = sweep
+        self.Normal = XYZ(0.0, 0.0, 1.0 if sweep > 0 else -1.0)
+        self.IsBound = True
+
+    @classmethod
+    def Create(cls, center, radius, start_angle, end_angle):
+        return cls(center, radius, start_angle, end_angle - start_angle)
+
+    @property
+    def Length(self):
+        return abs(self._sweep) * self.Radius
+
+    def Evaluate(self, parameter, normalized=True):
+        t = parameter if normalized else parameter / (self.Length or 1.0)
+        angle = self._start + self._sweep * t
+        return XYZ(self.Center.X + self.Radius * cos(angle),
+                   self.Center.Y + self.Radius * sin(angle),
+                   self.Center.Z)
+
+
+class BoundingBoxXYZ(object):
+    def __init__(self, min_point, max_point):
+        self.Min = min_point
+        self.Max = max_point
+
+
+class LocationCurve(object):
+    def __init__(self, curve):
+        self.Curve = curve
+
+
+class Element(object):
+    def __init__(self, element_id, name=u''):
+        self.Id = ElementId(element_id)
+        self.Name = name
+        self.Document = None
+        self.IsValidObject = True
+
+
+class Level(Element):
+    def __init__(self, element_id, elevation=0.0):
+        Element.__init__(self, element_id, u'Level {0}'.format(element_id))
+        self.Elevation = elevation
+
+
+class Wall(Element):
+    def __init__(self, element_id, curve, level_id, interior_side=1.0):
+        Element.__init__(self, element_id, u'Wall')
+        self.Location = LocationCurve(curve)
+        self.LevelId = ElementId(level_id)
+        direction = curve.Evaluate(1.0, True)
+        start = curve.Evaluate(0.0, True)
+        dx = direction.X - start.X
+        dy = direction.Y - start.Y
+        length = sqrt(dx * dx + dy * dy) or 1.0
+        self.Orientation = XYZ(interior_side * -dy / length,
+                               interior_side * dx / length, 0.0)
+
+
+class BoundarySegment(object):
+    __slots__ = ('ElementId', '_curve')
+
+    def __init__(self, element_id, curve):
+        self.ElementId = element_id
+        self._curve = curve
+
+    def GetCurve(self):
+        return self._curve
+
+
+class SpatialElementBoundaryOptions(object):
+    pass
+
+
+class SpatialElement(Element):
+    pass
+
+
+class Room(SpatialElement):
+    """
+    Помещение: контуры задаются списками (Id стены или -1, кривая).
+    Площадь и периметр считаются по ломаной из концов кривых.
+    """
+
+    def __init__(self, element_id, name, level_id, loops):
+        SpatialElement.__init__(self, element_id, name)
+        self.LevelId = ElementId(level_id)
+        self._loops = loops
+        self._vertices = [
+            [(c.GetEndPoint(0).X, c.GetEndPoint(0).Y) for _, c in loop]
+            for loop in loops
+        ]
+        self.Perimeter = sum(c.Length for loop in loops for _, c in loop)
+        self.Area = abs(sum(_signed_area(v) for v in self._vertices))
+        xs = [x for loop in self._vertices for x, _ in loop]
+        ys = [y for loop in self._vertices for _, y in loop]
+        self._bbox = BoundingBoxXYZ(XYZ(min(xs), min(ys), 0.0),
+                                    XYZ(max(xs), max(ys), 10.0))
+
+    def get_BoundingBox(self, view):
+        return self._bbox
+
+    def GetBoundarySegments(self, options):
+        return [[BoundarySegment(ElementId(tag), curve)
+                 for tag, curve in loop] for loop in self._loops]
+
+    def IsPointInRoom(self, point):
+        inside = False
+        for loop in self._vertices:
+            for (ax, ay), (bx, by) in zip(loop, loop[1:] + loop[:1]):
+                if (ay > point.Y) != (by > point.Y):
+                    cross = ax + (point.Y - ay) * (bx - ax) / (by - ay)
+                    if point.X < cross:
+                        inside = not inside
+        return inside
+
+
+def _signed_area(vertices):
+    area = 0.0
+    for (ax, ay), (bx, by) in zip(vertices, vertices[1:] + vertices[:1]):
+        area += ax * by - bx * ay
+    return area * 0.5
+
+
+class Document(object):
+    """Документ: словарь элементов по целочисленному Id."""
+
+    def __init__(self, title=u'Synthetic'):
+        self.Title = title
+        self.PathName = u''
+        self._elements = {}
+
+    def add(self, element):
+        element.Document = self
+        self._elements[element.Id.IntegerValue] = element
+        return element
+
+    def GetElement(self, element_id):
+        return self._elements.get(element_id.IntegerValue)
+
+    @property
+    def element_count(self):
+        return len(self._elements)
+
+
+def install():
+    """
+    Регистрирует модуль как Autodesk.Revit.DB (если настоящий Revit API
+    недоступен). :return: модуль Autodesk.Revit.DB
+    """
+    existing = sys.modules.get('Autodesk.Revit.DB')
+    if existing is not None:
+        return existing
+    module = sys.modules[__name__]
+    autodesk = types.ModuleType('Autodesk')
+    revit = types.ModuleType('Autodesk.Revit')
+    autodesk.Revit = revit
+    revit.DB = module
+    sys.modules['Autodesk'] = autodesk
+    sys.modules['Autodesk.Revit'] = revit
+    sys.modules['Autodesk.Revit.DB'] = module
+    return module
+
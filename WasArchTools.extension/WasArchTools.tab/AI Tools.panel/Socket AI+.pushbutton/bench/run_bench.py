@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк конвейера Socket AI+ на синтетических этажах.
+Запускается обычным Python без Revit:
+
+    python bench/run_bench.py --rooms 10 100 1000 10000
+
+Для каждого этапа (извлечение геометрии, правила, сложность помещений,
+индекс препятствий, планирование, сохранение плана) выводятся
+помещений/с, точек/с и пиковая память.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BUNDLE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BUNDLE_DIR not in sys.path:
+    sys.path.insert(0, BUNDLE_DIR)
+
+from bench import fake_revit  # noqa: E402
+from bench.synthetic import generate_floor  # noqa: E402
+
+fake_revit.install()
+
+from ai.classifier import classify_rooms  # noqa: E402
+from core.collisions import DOOR, ClearanceIndex, add_room_corners  # noqa
+from core.plan import PlacementPlan  # noqa: E402
+from core.planner import plan_rooms, plan_rooms_parallel  # noqa: E402
+from core.room_cache import RoomGeometryCache  # noqa: E402
+from core.rules_engine import RuleEngine  # noqa: E402
+
+DEFAULT_SIZES = (10, 100, 1000)
+
+
+class StageResult(object):
+    __slots__ = ('stage', 'rooms', 'points', 'seconds', 'peak_bytes')
+
+    def __init__(self, stage, rooms, points, seconds, peak_bytes):
+        self.stage = stage
+        self.rooms = rooms
+        self.points = points
+        self.seconds = seconds
+        self.peak_bytes = peak_bytes
+
+    @property
+    def rooms_per_second(self):
+        return self.rooms / self.seconds if self.seconds else 0.0
+
+    @property
+    def points_per_second(self):
+        return self.points / self.seconds if self.seconds else 0.0
+
+    def to_dict(self):
+        return {
+            'stage': self.stage,
+            'rooms': self.rooms,
+            'points': self.points,
+            'seconds': self.seconds,
+            'rooms_per_second': self.rooms_per_second,
+            'points_per_second': self.points_per_second,
+            'peak_bytes': self.peak_bytes,
+        }
+
+
+def _measure(stage, rooms, func, repeat, memory):
+    """
+    Лучшее время из repeat запусков и пиковая память отдельного запуска
+    под tracemalloc (чтобы трассировка не искажала время).
+    func() возвращает число обработанных объектов (сегментов,
+    препятствий или точек плана).
+    """
+    best = None
+    points = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        points = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    peak = 0
+    if memory:
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return StageResult(stage, rooms, points, best, peak)
+
+
+def bench_floor(room_count, seed=0, repeat=3, memory=True):
+    """
+    Прогоняет все этапы конвейера на одном синтетическом этаже.
+    :return: список StageResult
+    """
+    floor = generate_floor(room_count, seed)
+    rooms = floor.rooms
+    engine = RuleEngine()
+    warm_cache = RoomGeometryCache(store={})
+    geometries = [warm_cache.get(room) for room in rooms]
+    state = {}
+
+    def extract_cold():
+        cache = RoomGeometryCache(store={})
+        return sum(len(cache.get(room).segments) for room in rooms)
+
+    def extract_warm():
+        return sum(len(warm_cache.get(room).segments) for room in rooms)
+
+    def resolve_rules():
+        engine.compiled._memo.clear()
+        for room in rooms:
+            engine.get_room_rules(room.Name)
+        return 0
+
+    def classify():
+        return len(classify_rooms(geometries).complex_ids())
+
+    def build_index():
+        index = ClearanceIndex()
+        for geometry in geometries:
+            add_room_corners(index, geometry.segments, geometry.loop_starts)
+        for box in floor.doors:
+            index.add(DOOR, *box)
+        state['indexes'] = {floor.level_id: index}
+        return len(index)
+
+    build_index()
+    fallbacks = dict(
+        (room.Id.IntegerValue, _fallback(room, fake_revit)) for room in rooms
+    )
+
+    def plan_serial():
+        state['plan'] = plan_rooms(
+            geometries, engine, state['indexes'], fallbacks)
+        return len(state['plan'])
+
+    def plan_parallel():
+        return len(plan_rooms_parallel(geometries, engine, state['indexes']))
+
+    def plan_io():
+        path = os.path.join(tempfile.gettempdir(), 'socketai_bench_plan.json')
+        state['plan'].save(path)
+        return len(PlacementPlan.load(path))
+
+    stages = (
+        ('extract_cold', extract_cold),
+        ('extract_warm', extract_warm),
+        ('rules', resolve_rules),
+        ('classify', classify),
+        ('clearance_index', build_index),
+        ('plan_serial', plan_serial),
+        ('plan_parallel', plan_parallel),
+        ('plan_io', plan_io),
+    )
+    return [_measure(name, room_count, func, repeat, memory)
+            for name, func in stages]
+
+
+def _fallback(room, db):
+    def is_in_room(x, y):
+        return room.IsPointInRoom(db.XYZ(x, y, 0.0))
+    return is_in_room
+
+
+def format_results(room_count, results):
+    lines = [
+        u"Помещений: {0}".format(room_count),
+        u"{0:<16}{1:>10}{2:>12}{3:>14}{4:>14}{5:>12}".format(
+            u'этап', u'сек', u'объектов', u'помещ./с', u'объект./с',
+            u'пик, КиБ'),
+    ]
+    for result in results:
+        lines.append(u"{0:<16}{1:>10.4f}{2:>12}{3:>14.0f}{4:>14.0f}"
+                     u"{5:>12.0f}".format(
+                         result.stage, result.seconds, result.points,
+                         result.rooms_per_second, result.points_per_second,
+                         result.peak_bytes / 1024.0))
+    return u"\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rooms', type=int, nargs='+',
+                        default=list(DEFAULT_SIZES))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true',
+                        help=u'не измерять пиковую память')
+    parser.add_argument('--output', help=u'сохранить результаты в JSON')
+    args = parser.parse_args(argv)
+    report = {}
+    for room_count in args.rooms:
+        results = bench_floor(
+            room_count, args.seed, args.repeat, not args.no_memory)
+        print(format_results(room_count, results))
+        print()
+        report[str(room_count)] = [r.to_dict() for r in results]
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
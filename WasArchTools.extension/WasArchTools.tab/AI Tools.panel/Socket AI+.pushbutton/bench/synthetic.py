@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Генератор синтетических этажей для бенчмарков Socket AI+.
+Помещения раскладываются по сетке; среди них есть прямоугольные,
+Г-образные и с дуговой стеной. Контуры обходятся по часовой стрелке,
+как границы помещений Revit, с которыми работает core.geometry.
+Генерация детерминирована при одинаковом seed.
+"""
+import random
+from math import ceil, pi, sqrt
+
+from bench import fake_revit as db
+
+# Базовые имена помещений (сопоставляются с rules.json через _aliases)
+ROOM_NAMES = (u'Кухня', u'Спальня', u'Гостиная', u'Коридор', u'Санузел')
+
+# Доли нестандартных помещений
+L_SHAPE_SHARE = 0.2
+ARC_SHARE = 0.1
+
+# Зазор между помещениями (толщина стены), футы
+WALL_GAP = 0.5
+
+# Ширина двери, футы
+DOOR_WIDTH = 3.0
+
+
+class SyntheticFloor(object):
+    """Этаж: документ, помещения и габариты дверей для индекса препятствий."""
+
+    def __init__(self, doc, rooms, doors, level_id):
+        self.doc = doc
+        self.rooms = rooms
+        self.doors = doors
+        self.level_id = level_id
+
+
+def _outline(rng, width, depth):
+    """
+    Кривые контура помещения в локальных координатах (по часовой стрелке).
+    :return: список кривых
+    """
+    kind = rng.random()
+    if kind < ARC_SHARE:
+        radius = width / 2.0
+        return [
+            db.Line(db.XYZ(0, 0), db.XYZ(0, depth)),
+            db.Arc(db.XYZ(radius, depth), radius, pi, -pi),
+            db.Line(db.XYZ(width, depth), db.XYZ(width, 0)),
+            db.Line(db.XYZ(width, 0), db.XYZ(0, 0)),
+        ]
+    if kind < ARC_SHARE + L_SHAPE_SHARE:
+        notch_x = width * rng.uniform(0.4, 0.7)
+        notch_y = depth * rng.uniform(0.4, 0.7)
+        points = [(0, 0), (0, depth), (notch_x, depth), (notch_x, notch_y),
+                  (width, notch_y), (width, 0)]
+    else:
+        points = [(0, 0), (0, depth), (width, depth), (width, 0)]
+    return [db.Line(db.XYZ(*a), db.XYZ(*b))
+            for a, b in zip(points, points[1:] + points[:1])]
+
+
+def _moved(curve, dx, dy):
+    if isinstance(curve, db.Arc):
+        center = db.XYZ(curve.Center.X + dx, curve.Center.Y + dy)
+        return db.Arc(center, curve.Radius, curve._start, curve._sweep)
+    p0 = curve.GetEndPoint(0)
+    p1 = curve.GetEndPoint(1)
+    return db.Line(db.XYZ(p0.X + dx, p0.Y + dy), db.XYZ(p1.X + dx, p1.Y + dy))
+
+
+def generate_floor(room_count, seed=0, level_id=1):
+    """
+    Генерирует этаж из room_count помещений.
+    :param room_count: число помещений (10 ... 10 000)
+    :param seed: зерно генератора
+    :param level_id: Id уровня
+    :return: SyntheticFloor
+    """
+    rng = random.Random(seed)
+    doc = db.Document(u'Synthetic {0}'.format(room_count))
+    doc.add(db.Level(level_id))
+    next_id = [level_id + 1]
+
+    def new_id():
+        next_id[0] += 1
+        return next_id[0]
+
+    columns = int(ceil(sqrt(room_count)))
+    cell = 20.0 + WALL_GAP
+    rooms = []
+    doors = []
+    for number in range(room_count):
+        width = rng.uniform(8.0, 20.0)
+        depth = rng.uniform(8.0, 14.0)
+        ox = (number % columns) * cell
+        oy = (number // columns) * (cell + 10.0)
+        loop = []
+        for curve in _outline(rng, width, depth):
+            wall = doc.add(db.Wall(new_id(), _moved(curve, ox, oy), level_id))
+            loop.append((wall.Id.IntegerValue, wall.Location.Curve))
+        name = u'{0} {1}.{2:02d}'.format(
+            ROOM_NAMES[number % len(ROOM_NAMES)], number // 100, number % 100)
+        rooms.append(doc.add(db.Room(new_id(), name, level_id, [loop])))
+        # Дверь в нижней стене
+        door_x = ox + rng.uniform(1.0, max(1.0, width - DOOR_WIDTH - 1.0))
+        doors.append((door_x, oy - WALL_GAP, door_x + DOOR_WIDTH,
+                      oy + WALL_GAP))
+    return SyntheticFloor(doc, rooms, doors, level_id)
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Проекция проёмов на дуги с раствором больше 180°:
+
+    python -m unittest bench.test_arc_projection
+"""
+import os
+import sys
+import unittest
+from math import cos, pi, radians, sin
+
+BUNDLE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BUNDLE_DIR not in sys.path:
+    sys.path.insert(0, BUNDLE_DIR)
+
+from core.geometry import SegmentArrays  # noqa: E402
+from core.intervals import project_box  # noqa: E402
+
+RADIUS = 5.0
+HALF = 0.2
+
+
+def _box_at(degrees):
+    x = RADIUS * cos(radians(degrees))
+    y = RADIUS * sin(radians(degrees))
+    return x - HALF, y - HALF, x + HALF, y + HALF
+
+
+class ArcProjectionTest(unittest.TestCase):
+
+    def _project(self, sweep, degrees, margin=0.0):
+        segments = SegmentArrays()
+        segments.add_arc(0.0, 0.0, RADIUS, 0.0, sweep)
+        return project_box(segments, 0, *_box_at(degrees), margin=margin)
+
+    def _check(self, sweep, degrees, expected):
+        start, end = self._project(sweep, degrees)
+        # Габарит шире точки: середина проекции совпадает приближённо
+        self.assertAlmostEqual((start + end) * 0.5, expected, delta=0.05)
+
+    def test_ccw_arc_past_half_turn(self):
+        self._check(radians(270), 250, radians(250) * RADIUS)
+
+    def test_cw_arc_past_half_turn(self):
+        self._check(-radians(270), -250, radians(250) * RADIUS)
+
+    def test_box_before_start(self):
+        # Проём перед началом дуги задевает её только отступом
+        start, end = self._project(radians(270), -5, margin=1.0)
+        self.assertLess(start, 0.0)
+        self.assertAlmostEqual(end, 1.0 - radians(5) * RADIUS, delta=0.25)
+
+    def test_box_outside_arc(self):
+        segments = SegmentArrays()
+        segments.add_arc(0.0, 0.0, RADIUS, 0.0, pi)
+        self.assertIsNone(project_box(segments, 0, *_box_at(240)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Проверка ClearanceIndex при одновременных запросах из нескольких потоков
+(пул потоков plan_rooms_parallel передаёт всем задачам общие индексы):
+
+    python -m unittest bench.test_clearance_threads
+"""
+import os
+import random
+import sys
+import threading
+import unittest
+
+BUNDLE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BUNDLE_DIR not in sys.path:
+    sys.path.insert(0, BUNDLE_DIR)
+
+from core.collisions import (  # noqa: E402
+    CORNER, DOOR, SINK, ClearanceIndex,
+)
+
+THREADS = 8
+ROUNDS = 20
+KINDS = DOOR | CORNER | SINK
+
+
+def _make_index(seed=1):
+    rnd = random.Random(seed)
+    index = ClearanceIndex(cell_size=1.0)
+    for _ in range(400):
+        x = rnd.uniform(0.0, 60.0)
+        y = rnd.uniform(0.0, 60.0)
+        # Крупные габариты попадают в несколько ячеек
+        index.add(rnd.choice((DOOR, CORNER, SINK)), x, y,
+                  x + rnd.uniform(0.0, 3.0), y + rnd.uniform(0.0, 3.0))
+    return index
+
+
+def _make_points(seed):
+    rnd = random.Random(seed)
+    xs = [rnd.uniform(0.0, 60.0) for _ in range(300)]
+    ys = [rnd.uniform(0.0, 60.0) for _ in range(300)]
+    return xs, ys
+
+
+class ClearanceIndexThreadsTest(unittest.TestCase):
+
+    def setUp(self):
+        self._interval = sys.getswitchinterval()
+        # Частое переключение потоков повышает шанс гонки и в CPython
+        sys.setswitchinterval(1e-6)
+
+    def tearDown(self):
+        sys.setswitchinterval(self._interval)
+
+    def _run_threads(self, work):
+        errors = []
+
+        def target(number):
+            try:
+                work(number)
+            except AssertionError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=target, args=(number,))
+                   for number in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+
+    def test_check_matches_serial(self):
+        distances = {DOOR: 1.5, CORNER: 0.8, SINK: 2.5}
+        serial = _make_index()
+        expected = [list(serial.check(xs, ys, distances))
+                    for xs, ys in map(_make_points, range(THREADS))]
+        shared = _make_index()
+
+        def work(number):
+            xs, ys = _make_points(number)
+            for _ in range(ROUNDS):
+                self.assertEqual(list(shared.check(xs, ys, distances)),
+                                 expected[number])
+
+        self._run_threads(work)
+
+    def test_boxes_matches_serial(self):
+        serial = _make_index()
+        windows = [(x, x, x + 15.0, x + 15.0)
+                   for x in range(0, 8 * THREADS, 8)]
+        expected = [sorted(serial.boxes(*(window + (KINDS,))))
+                    for window in windows]
+        shared = _make_index()
+
+        def work(number):
+            window = windows[number]
+            for _ in range(ROUNDS):
+                self.assertEqual(sorted(shared.boxes(*(window + (KINDS,)))),
+                                 expected[number])
+
+        self._run_threads(work)
+
+
+if __name__ == '__main__':
+    unittest.main()
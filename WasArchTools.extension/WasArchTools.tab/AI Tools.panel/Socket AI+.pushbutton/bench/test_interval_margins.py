@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Точки, которые core/intervals.py ставит ровно на отступ от угла или
+проёма, не должны отбрасываться ClearanceIndex.check из-за ошибки
+округления (13.7 - 13.5 = 0.1999...):
+
+    python -m unittest bench.test_interval_margins
+"""
+import os
+import sys
+import unittest
+
+BUNDLE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BUNDLE_DIR not in sys.path:
+    sys.path.insert(0, BUNDLE_DIR)
+
+from core.collisions import (  # noqa: E402
+    CORNER, DOOR, ClearanceIndex, add_room_corners,
+)
+from core.geometry import SegmentArrays, batch_points_at  # noqa: E402
+from core.intervals import plan_segment_distances  # noqa: E402
+
+WIDTH = 13.7
+HEIGHT = 10.3
+CORNER_MARGIN = 0.2
+DOOR_MARGIN = 0.3
+STEP = 0.3
+
+
+def _room():
+    """Прямоугольное помещение, обход по часовой (нормали внутрь)."""
+    segments = SegmentArrays()
+    corners = ((0.0, 0.0), (0.0, HEIGHT), (WIDTH, HEIGHT), (WIDTH, 0.0))
+    for (x0, y0), (x1, y1) in zip(corners, corners[1:] + corners[:1]):
+        segments.add_line(x0, y0, x1, y1)
+    index = ClearanceIndex(cell_size=1.0)
+    add_room_corners(index, segments, [0])
+    return segments, index
+
+
+class IntervalMarginsTest(unittest.TestCase):
+
+    def test_point_on_corner_margin_is_kept(self):
+        _, index = _room()
+        mask = index.check([13.5, WIDTH], [0.0, 10.1],
+                           {CORNER: CORNER_MARGIN})
+        self.assertEqual(list(mask), [0, 0])
+
+    def test_point_inside_margin_is_rejected(self):
+        _, index = _room()
+        mask = index.check([13.51], [0.0], {CORNER: CORNER_MARGIN})
+        self.assertEqual(list(mask), [CORNER])
+
+    def test_generated_points_pass_check(self):
+        segments, index = _room()
+        door = (5.0, -0.1, 5.9, 0.1)
+        index.add(DOOR, *door)
+        seg_indices, distances = plan_segment_distances(
+            segments, range(len(segments)), STEP, [door + (DOOR_MARGIN,)],
+            corner_margin=CORNER_MARGIN)
+        batch = batch_points_at(segments, seg_indices, distances)
+        mask = index.check(batch.x, batch.y,
+                           {CORNER: CORNER_MARGIN, DOOR: DOOR_MARGIN})
+        rejected = [(batch.x[i], batch.y[i])
+                    for i, code in enumerate(mask) if code]
+        self.assertEqual(rejected, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
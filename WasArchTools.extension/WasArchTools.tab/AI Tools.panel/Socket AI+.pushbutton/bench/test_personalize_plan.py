@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Сдвиг плана по рекомендациям персонализатора: точки остаются на стенах
+и проходят проверки планировщика, остальные строки не меняются:
+
+    python -m unittest bench.test_personalize_plan
+"""
+import os
+import sys
+import unittest
+
+BUNDLE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BUNDLE_DIR not in sys.path:
+    sys.path.insert(0, BUNDLE_DIR)
+
+from bench import fake_revit  # noqa: E402
+from bench.synthetic import generate_floor  # noqa: E402
+
+fake_revit.install()
+
+from ai.personalizer import (  # noqa: E402
+    Personalizer, apply_offset, personalize_plan, plan_corrections,
+    plan_requests,
+)
+from core.collisions import (  # noqa: E402
+    DOOR, ClearanceIndex, add_room_corners, clearance_distances,
+)
+from core.intervals import segment_param  # noqa: E402
+from core.planner import plan_rooms  # noqa: E402
+from core.room_cache import RoomGeometryCache  # noqa: E402
+from core.rules_engine import RuleEngine  # noqa: E402
+
+
+def _fallback(room):
+    def is_in_room(x, y):
+        return room.IsPointInRoom(fake_revit.XYZ(x, y, 0.0))
+    return is_in_room
+
+
+class PersonalizePlanTest(unittest.TestCase):
+
+    def setUp(self):
+        floor = generate_floor(30, 4)
+        cache = RoomGeometryCache(store={})
+        self.geometries = [cache.get(room) for room in floor.rooms]
+        self.engine = RuleEngine()
+        index = ClearanceIndex()
+        for geometry in self.geometries:
+            add_room_corners(index, geometry.segments, geometry.loop_starts)
+        for box in floor.doors:
+            index.add(DOOR, *box)
+        self.index = index
+        self.indexes = {floor.level_id: index}
+        self.fallbacks = dict(
+            (room.Id.IntegerValue, _fallback(room)) for room in floor.rooms)
+        self.plan = plan_rooms(
+            self.geometries, self.engine, self.indexes, self.fallbacks)
+
+    def _personalize(self, offset):
+        _, items, _ = plan_requests(self.plan, self.geometries)
+        personalizer = Personalizer()
+        for room_type, point, features in items:
+            personalizer.update(room_type, point,
+                                apply_offset(point, features, offset),
+                                features)
+        return personalize_plan(
+            self.plan, self.geometries, personalizer.suggest_many,
+            self.engine, self.indexes, self.fallbacks)
+
+    def test_moved_points_stay_on_walls_and_pass_checks(self):
+        before = list(zip(self.plan.x, self.plan.y))
+        # Смещение по нормали (0.5) увело бы точки со стены
+        moved = self._personalize((0.4, 0.5, 0.1))
+        self.assertGreater(moved, 0)
+        self.assertLess(moved, len(self.plan))
+        rows, _, seg_indices = plan_requests(self.plan, self.geometries)
+        rooms = dict((g.room_id, g) for g in self.geometries)
+        changed = 0
+        for i, index in zip(rows, seg_indices):
+            x, y = self.plan.x[i], self.plan.y[i]
+            segments = rooms[self.plan.room_id[i]].segments
+            px, py, _, _ = segments.point_at(
+                index, segment_param(segments, index, x, y))
+            self.assertAlmostEqual(px, x, places=6)
+            self.assertAlmostEqual(py, y, places=6)
+            changed += (x, y) != before[i]
+        self.assertEqual(changed, moved)
+        for code, rule_name in enumerate(self.plan.rule_names):
+            rows = [i for i in range(len(self.plan))
+                    if self.plan.rule[i] == code]
+            distances = clearance_distances(
+                self.engine.get_room_rules(rule_name))
+            mask = self.index.check([self.plan.x[i] for i in rows],
+                                    [self.plan.y[i] for i in rows],
+                                    distances)
+            self.assertEqual([code for code in mask if code], [])
+
+    def test_offset_past_wall_end_is_reverted(self):
+        before = (list(self.plan.x), list(self.plan.y), list(self.plan.z))
+        self.assertEqual(self._personalize((1000.0, 0.0, 0.0)), 0)
+        self.assertEqual(
+            (list(self.plan.x), list(self.plan.y), list(self.plan.z)),
+            before)
+
+    def test_only_moved_sockets_become_corrections(self):
+        positions = dict(
+            (i, (self.plan.x[i], self.plan.y[i], self.plan.z[i]))
+            for i in range(len(self.plan)))
+        x, y, z = positions[5]
+        positions[5] = (x, y, z + 0.005)
+        x, y, z = positions[3]
+        positions[3] = (x, y, z + 0.5)
+        del positions[7]
+        corrections = plan_corrections(self.plan, self.geometries, positions)
+        self.assertEqual(len(corrections), 1)
+        correction = corrections[0]
+        self.assertEqual(correction.room_id, self.plan.room_id[3])
+        self.assertEqual(correction.wall_id, self.plan.wall_id[3])
+        self.assertEqual(correction.original, (x, y, z))
+        self.assertEqual(correction.corrected, (x, y, z + 0.5))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Сопоставление имён помещений с типами по разделу _aliases: побеждает
+подстрока, стоящая в _aliases раньше, а не встреченная в имени первой:
+
+    python -m unittest bench.test_room_aliases
+"""
+import os
+import sys
+import unittest
+from collections import OrderedDict
+
+BUNDLE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BUNDLE_DIR not in sys.path:
+    sys.path.insert(0, BUNDLE_DIR)
+
+from core.rules_engine import CompiledRules  # noqa: E402
+
+
+def _rules(aliases):
+    raw = OrderedDict((
+        ('default', {'step': 3.0}),
+        ('kitchen', {}),
+        ('living_room', {}),
+        ('wet', {}),
+    ))
+    raw['_aliases'] = OrderedDict(aliases)
+    return CompiledRules(raw)
+
+
+class RoomAliasesTest(unittest.TestCase):
+
+    def test_priority_wins_over_position(self):
+        rules = _rules((('kitchen', [u'кухн']),
+                        ('living_room', [u'гостин'])))
+        self.assertEqual(rules.resolve(u'Гостиная-кухня'), 'kitchen')
+        self.assertEqual(rules.resolve(u'Кухня-гостиная'), 'kitchen')
+
+    def test_overlapping_aliases(self):
+        # «комн» начинается внутри «ванная комн...» позже, чем «ванн»,
+        # но стоит в _aliases раньше
+        rules = _rules((('living_room', [u'комн']), ('wet', [u'ванн'])))
+        self.assertEqual(rules.resolve(u'Ванная комната'), 'living_room')
+        rules = _rules((('wet', [u'ая к']), ('kitchen', [u'ванная'])))
+        self.assertEqual(rules.resolve(u'Ванная кухня'), 'wet')
+
+    def test_no_alias_gives_default(self):
+        rules = _rules((('kitchen', [u'кухн']),))
+        self.assertEqual(rules.resolve(u'Кладовая'), 'default')
+        self.assertEqual(rules.resolve(u'Kitchen'), 'kitchen')
+
+
+if __name__ == '__main__':
+    unittest.main()
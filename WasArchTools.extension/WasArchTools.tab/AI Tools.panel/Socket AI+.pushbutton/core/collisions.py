@@ -2,4 +2,308 @@
 """
 Модуль для проверки коллизий между элементами архитектурной модели.
 Используется для автоматического поиска пересечений и конфликтов.
+
+Препятствия уровня (двери, углы, мойки, телевизоры) хранятся в виде
+габаритов (AABB) в равномерной сетке ClearanceIndex. Пакетный запрос
+«что находится ближе d к этим N точкам» просматривает только ячейки
+вокруг каждой точки, поэтому правила min_distance_from_* проверяются
+на целом этаже без попарного перебора.
+
+Индекс общий для потоков plan_rooms_parallel: метки просмотренных
+препятствий (чтобы не проверять препятствие из нескольких ячеек дважды)
+у каждого потока свои.
 """
+import threading
+from array import array
+from math import floor
+
+from core.geometry import DISTANCE_TOLERANCE
+
+# Виды препятствий (битовые флаги)
+DOOR = 1
+CORNER = 2
+SINK = 4
+TV = 8
+WINDOW = 16
+
+# Правило rules.json, задающее минимальное расстояние до препятствия
+OBSTACLE_RULES = (
+    (DOOR, 'min_distance_from_door'),
+    (CORNER, 'min_distance_from_corner'),
+    (SINK, 'min_distance_from_sink'),
+    (TV, 'min_distance_from_tv'),
+    (WINDOW, 'min_distance_from_window'),
+)
+
+# Размер ячейки сетки по умолчанию (в единицах Revit)
+DEFAULT_CELL_SIZE = 2.0
+
+# Поворот границы, начиная с которого вершина считается углом (cos угла)
+CORNER_COS = 0.99
+
+# Ключевые слова в имени семейства/типа для распознавания препятствий
+SINK_KEYWORDS = (u'мойк', u'раковин', u'sink')
+TV_KEYWORDS = (u'телевиз', u'tv')
+
+
+def clearance_distances(rules):
+    """
+    Расстояния до препятствий по правилам помещения.
+    :param rules: словарь правил
+    :return: {вид препятствия: расстояние} только для заданных правил
+    """
+    distances = {}
+    for kind, key in OBSTACLE_RULES:
+        value = rules.get(key)
+        if value:
+            distances[kind] = float(value)
+    return distances
+
+
+class ClearanceIndex(object):
+    """
+    Пространственный индекс препятствий одного уровня.
+    Каждое препятствие регистрируется во всех ячейках, которые
+    пересекает его габарит; сетка строится при первом запросе.
+    Запросы check и boxes можно выполнять из нескольких потоков.
+    """
+
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE):
+        self.cell_size = float(cell_size)
+        self.kind = array('b')
+        self.min_x = array('d')
+        self.min_y = array('d')
+        self.max_x = array('d')
+        self.max_y = array('d')
+        self._cells = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def __getstate__(self):
+        # Блокировка и данные потоков не передаются в пул процессов
+        state = self.__dict__.copy()
+        del state['_lock']
+        del state['_local']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def __len__(self):
+        return len(self.kind)
+
+    def add(self, kind, min_x, min_y, max_x, max_y):
+        """Добавляет препятствие с габаритом (min_x, min_y)-(max_x, max_y)."""
+        self.kind.append(kind)
+        self.min_x.append(min(min_x, max_x))
+        self.min_y.append(min(min_y, max_y))
+        self.max_x.append(max(min_x, max_x))
+        self.max_y.append(max(min_y, max_y))
+        self._cells = None
+
+    def add_point(self, kind, x, y):
+        """Добавляет точечное препятствие (например, угол помещения)."""
+        self.add(kind, x, y, x, y)
+
+    def _cell(self, value):
+        return int(floor(value / self.cell_size))
+
+    def _ensure_cells(self):
+        """Сетка ячеек (строится один раз, под блокировкой)."""
+        cells = self._cells
+        if cells is None:
+            with self._lock:
+                if self._cells is None:
+                    self._build()
+                cells = self._cells
+        return cells
+
+    def _stamps(self, cells):
+        """
+        Метки текущего потока: массив номеров запросов по препятствиям
+        и счётчик запросов. Пересоздаются при перестройке сетки.
+        """
+        local = self._local
+        if getattr(local, 'cells', None) is not cells:
+            local.cells = cells
+            local.stamp = array('l', [0]) * len(self.kind)
+            local.query = 0
+        return local
+
+    def _build(self):
+        cells = {}
+        cell = self._cell
+        for index in range(len(self.kind)):
+            for cx in range(cell(self.min_x[index]),
+                            cell(self.max_x[index]) + 1):
+                for cy in range(cell(self.min_y[index]),
+                                cell(self.max_y[index]) + 1):
+                    cells.setdefault((cx, cy), []).append(index)
+        self._cells = cells
+
+    def check(self, xs, ys, distances):
+        """
+        Пакетная проверка точек на нарушение расстояний.
+        :param xs: координаты X
+        :param ys: координаты Y
+        :param distances: {вид препятствия: минимальное расстояние},
+            см. clearance_distances
+        :return: array('b') — битовая маска нарушенных видов, 0 если точка
+            свободна; расстояние нарушено, если оно меньше заданного
+            больше чем на DISTANCE_TOLERANCE
+        """
+        result = array('b')
+        if not distances or not len(self.kind):
+            result.extend([0] * len(xs))
+            return result
+        cells = self._ensure_cells()
+        local = self._stamps(cells)
+        stamp = local.stamp
+        reach = max(distances.values())
+        squared = dict((k, max(d - DISTANCE_TOLERANCE, 0.0) ** 2)
+                       for k, d in distances.items())
+        cell = self._cell
+        kinds = self.kind
+        min_x, min_y = self.min_x, self.min_y
+        max_x, max_y = self.max_x, self.max_y
+        for px, py in zip(xs, ys):
+            local.query += 1
+            query = local.query
+            mask = 0
+            for cx in range(cell(px - reach), cell(px + reach) + 1):
+                for cy in range(cell(py - reach), cell(py + reach) + 1):
+                    for index in cells.get((cx, cy), ()):
+                        # Препятствие может лежать в нескольких ячейках
+                        if stamp[index] == query:
+                            continue
+                        stamp[index] = query
+                        kind = kinds[index]
+                        limit = squared.get(kind)
+                        if limit is None or mask & kind:
+                            continue
+                        dx = max(min_x[index] - px, 0.0, px - max_x[index])
+                        dy = max(min_y[index] - py, 0.0, py - max_y[index])
+                        if dx * dx + dy * dy < limit:
+                            mask |= kind
+            result.append(mask)
+        return result
+
+    def boxes(self, min_x, min_y, max_x, max_y, kinds):
+        """
+        Габариты препятствий видов kinds, пересекающих прямоугольник.
+        :return: список кортежей (вид, min_x, min_y, max_x, max_y)
+        """
+        found = []
+        if not len(self.kind):
+            return found
+        cells = self._ensure_cells()
+        local = self._stamps(cells)
+        stamp = local.stamp
+        local.query += 1
+        query = local.query
+        cell = self._cell
+        for cx in range(cell(min_x), cell(max_x) + 1):
+            for cy in range(cell(min_y), cell(max_y) + 1):
+                for index in cells.get((cx, cy), ()):
+                    if stamp[index] == query:
+                        continue
+                    stamp[index] = query
+                    kind = self.kind[index]
+                    if not kinds & kind:
+                        continue
+                    if (self.min_x[index] > max_x or
+                            self.max_x[index] < min_x or
+                            self.min_y[index] > max_y or
+                            self.max_y[index] < min_y):
+                        continue
+                    found.append((
+                        kind, self.min_x[index], self.min_y[index],
+                        self.max_x[index], self.max_y[index],
+                    ))
+        return found
+
+    def within(self, xs, ys, distance,
+               kinds=DOOR | CORNER | SINK | TV | WINDOW):
+        """
+        Есть ли препятствие указанных видов ближе distance к каждой точке.
+        :return: array('b') из 0/1
+        """
+        distances = dict(
+            (kind, distance) for kind, _ in OBSTACLE_RULES if kinds & kind
+        )
+        return array('b', [1 if m else 0 for m in
+                           self.check(xs, ys, distances)])
+
+
+def add_room_corners(index, segments, loop_starts):
+    """
+    Добавляет в индекс углы контуров помещения — вершины, где
+    направление границы поворачивает.
+    :param index: ClearanceIndex
+    :param segments: SegmentArrays помещения
+    :param loop_starts: индексы первых сегментов контуров
+    :return: количество добавленных углов
+    """
+    bounds = list(loop_starts) + [len(segments)]
+    added = 0
+    for start, stop in zip(bounds, bounds[1:]):
+        if stop - start < 2:
+            continue
+        for current in range(start, stop):
+            previous = current - 1 if current > start else stop - 1
+            # Нормали сегментов в общей вершине
+            _, _, ax, ay = segments.point_at(
+                previous, segments.length[previous])
+            x, y, bx, by = segments.point_at(current, 0.0)
+            if ax * bx + ay * by < CORNER_COS:
+                index.add_point(CORNER, x, y)
+                added += 1
+    return added
+
+
+def _name_matches(element, keywords):
+    names = []
+    symbol = getattr(element, 'Symbol', None)
+    if symbol is not None:
+        names.append(getattr(symbol, 'FamilyName', u'') or u'')
+    names.append(getattr(element, 'Name', u'') or u'')
+    text = u' '.join(names).lower()
+    return any(keyword in text for keyword in keywords)
+
+
+def collect_level_obstacles(doc, level_id, index=None):
+    """
+    Собирает двери, окна, мойки и телевизоры уровня в ClearanceIndex.
+    :param doc: документ Revit
+    :param level_id: ElementId уровня
+    :param index: существующий индекс (например, с углами помещений)
+    :return: ClearanceIndex
+    """
+    from Autodesk.Revit.DB import (
+        BuiltInCategory, ElementLevelFilter, FilteredElementCollector,
+    )
+    if index is None:
+        index = ClearanceIndex()
+    sources = (
+        (BuiltInCategory.OST_Doors, DOOR, None),
+        (BuiltInCategory.OST_Windows, WINDOW, None),
+        (BuiltInCategory.OST_PlumbingFixtures, SINK, SINK_KEYWORDS),
+        (BuiltInCategory.OST_ElectricalEquipment, TV, TV_KEYWORDS),
+        (BuiltInCategory.OST_SpecialityEquipment, TV, TV_KEYWORDS),
+    )
+    for category, kind, keywords in sources:
+        elements = FilteredElementCollector(doc)\
+            .OfCategory(category)\
+            .WhereElementIsNotElementType()\
+            .WherePasses(ElementLevelFilter(level_id))
+        for element in elements:
+            if keywords and not _name_matches(element, keywords):
+                continue
+            bbox = element.get_BoundingBox(None)
+            if bbox is None:
+                continue
+            index.add(kind, bbox.Min.X, bbox.Min.Y, bbox.Max.X, bbox.Max.Y)
+    return index
+
@@ -2,9 +2,25 @@
 """
 Модуль для работы с геометрией архитектурных объектов.
 Содержит функции для анализа и преобразования геометрических данных.
+
+Пакетный API (SegmentArrays, PointBatch, batch_curve_points) работает
+с плоскими массивами координат и не обращается к Revit API: объекты XYZ
+создаются только на границе с Revit (segments_from_curves, batch_to_xyz).
 """
+from array import array
+from math import atan2, cos, pi, sin, sqrt
+
+# Типы сегментов в SegmentArrays
+LINE = 0
+ARC = 1
+
+# Сегменты короче этой длины (в единицах Revit) отбрасываются
+MIN_SEGMENT_LENGTH = 1e-6
+
+# Допуск сравнения расстояний с отступами: точка, которую интервалы
+# ставят ровно на отступ, проходит и проверку ClearanceIndex.check
+DISTANCE_TOLERANCE = 1e-6
 
-from Autodesk.Revit.DB import XYZ, Line
 
 def generate_wall_points(wall, step=0.5):
     """
@@ -13,6 +29,7 @@ def generate_wall_points(wall, step=0.5):
     :param step: Шаг между точками (в единицах Revit)
     :return: Список кортежей (XYZ, normal)
     """
+    from Autodesk.Revit.DB import XYZ
     curve = wall.Location.Curve
     length = curve.Length
     points = []
@@ -49,6 +66,7 @@ def generate_curve_points(curve, step=0.5):
     :param step: Шаг между точками (в единицах Revit)
     :return: Список кортежей (XYZ, normal)
     """
+    from Autodesk.Revit.DB import XYZ
     length = curve.Length
     points = []
     curve_type = type(curve).__name__
@@ -79,3 +97,261 @@ def generate_curve_points(curve, step=0.5):
             )
             print(msg)
     return points
+
+
+class SegmentArrays(object):
+    """
+    Набор сегментов стен (отрезки и дуги) в виде параллельных массивов.
+    Отрезок задаётся концами (x0, y0) - (x1, y1). Дуга задаётся центром,
+    радиусом, начальным углом и подписанным углом раствора sweep
+    (sweep > 0 — против часовой стрелки). Концы дуги тоже заполняются.
+    tags — произвольная целочисленная метка сегмента (например, Id стены),
+    -1 если метки нет.
+    """
+    __slots__ = (
+        'kind', 'x0', 'y0', 'x1', 'y1', 'cx', 'cy', 'radius',
+        'start_angle', 'sweep', 'length', 'tags',
+    )
+
+    def __init__(self):
+        self.kind = array('b')
+        self.x0 = array('d')
+        self.y0 = array('d')
+        self.x1 = array('d')
+        self.y1 = array('d')
+        self.cx = array('d')
+        self.cy = array('d')
+        self.radius = array('d')
+        self.start_angle = array('d')
+        self.sweep = array('d')
+        self.length = array('d')
+        self.tags = array('q')
+
+    def __len__(self):
+        return len(self.kind)
+
+    def add_line(self, x0, y0, x1, y1, tag=-1):
+        """
+        Добавляет отрезок.
+        :return: индекс сегмента или -1, если отрезок вырожден
+        """
+        length = sqrt((x1 - x0) ** 2 + (y1 - y0) ** 2)
+        if length < MIN_SEGMENT_LENGTH:
+            return -1
+        self.kind.append(LINE)
+        self.x0.append(x0)
+        self.y0.append(y0)
+        self.x1.append(x1)
+        self.y1.append(y1)
+        self.cx.append(0.0)
+        self.cy.append(0.0)
+        self.radius.append(0.0)
+        self.start_angle.append(0.0)
+        self.sweep.append(0.0)
+        self.length.append(length)
+        self.tags.append(tag)
+        return len(self.kind) - 1
+
+    def add_arc(self, cx, cy, radius, start_angle, sweep, tag=-1):
+        """
+        Добавляет дугу.
+        :return: индекс сегмента или -1, если дуга вырождена
+        """
+        length = abs(sweep) * radius
+        if length < MIN_SEGMENT_LENGTH:
+            return -1
+        end_angle = start_angle + sweep
+        self.kind.append(ARC)
+        self.x0.append(cx + radius * cos(start_angle))
+        self.y0.append(cy + radius * sin(start_angle))
+        self.x1.append(cx + radius * cos(end_angle))
+        self.y1.append(cy + radius * sin(end_angle))
+        self.cx.append(cx)
+        self.cy.append(cy)
+        self.radius.append(radius)
+        self.start_angle.append(start_angle)
+        self.sweep.append(sweep)
+        self.length.append(length)
+        self.tags.append(tag)
+        return len(self.kind) - 1
+
+    def point_at(self, index, distance):
+        """
+        Точка и нормаль на расстоянии distance от начала сегмента.
+        Нормаль направлена вправо от направления обхода — так же, как
+        в generate_curve_points (внутрь помещения).
+        :return: кортеж (x, y, nx, ny)
+        """
+        length = self.length[index]
+        if distance < 0.0:
+            distance = 0.0
+        elif distance > length:
+            distance = length
+        if self.kind[index] == LINE:
+            x0 = self.x0[index]
+            y0 = self.y0[index]
+            dx = (self.x1[index] - x0) / length
+            dy = (self.y1[index] - y0) / length
+            return x0 + dx * distance, y0 + dy * distance, dy, -dx
+        radius = self.radius[index]
+        sweep = self.sweep[index]
+        angle = self.start_angle[index] + sweep * (distance / length)
+        ca = cos(angle)
+        sa = sin(angle)
+        x = self.cx[index] + radius * ca
+        y = self.cy[index] + radius * sa
+        # Касательная по направлению обхода, нормаль — поворот на -90°
+        if sweep > 0:
+            return x, y, ca, sa
+        return x, y, -ca, -sa
+
+    def midpoint(self, index):
+        """Середина сегмента: кортеж (x, y)."""
+        x, y, _, _ = self.point_at(index, self.length[index] * 0.5)
+        return x, y
+
+
+class PointBatch(object):
+    """
+    Пакет точек расстановки в виде параллельных массивов:
+    индекс сегмента, расстояние вдоль сегмента, координаты, нормаль
+    и угол поворота экземпляра вокруг Z.
+    """
+    __slots__ = ('segment', 'distance', 'x', 'y', 'nx', 'ny', 'angle')
+
+    def __init__(self):
+        self.segment = array('l')
+        self.distance = array('d')
+        self.x = array('d')
+        self.y = array('d')
+        self.nx = array('d')
+        self.ny = array('d')
+        self.angle = array('d')
+
+    def __len__(self):
+        return len(self.segment)
+
+    def append(self, segment, distance, x, y, nx, ny):
+        self.segment.append(segment)
+        self.distance.append(distance)
+        self.x.append(x)
+        self.y.append(y)
+        self.nx.append(nx)
+        self.ny.append(ny)
+        self.angle.append(normal_to_angle(nx, ny))
+
+
+def normal_to_angle(nx, ny):
+    """
+    Угол поворота розетки вокруг Z по нормали к стене
+    (дополнительный поворот на 90 градусов, как при ручной расстановке).
+    """
+    return atan2(ny, nx) + pi / 2
+
+
+def batch_curve_points(segments, step, indices=None):
+    """
+    Генерирует точки с шагом step вдоль всех сегментов за один проход.
+    Семантика совпадает с generate_curve_points: точки в 0, step, 2*step...
+    до длины сегмента, но отрезки и дуги обрабатываются одинаково.
+    :param segments: SegmentArrays
+    :param step: Шаг между точками (в единицах Revit)
+    :param indices: индексы сегментов для обработки (по умолчанию все)
+    :return: PointBatch
+    """
+    batch = PointBatch()
+    if step <= 0:
+        return batch
+    if indices is None:
+        indices = range(len(segments))
+    lengths = segments.length
+    point_at = segments.point_at
+    append = batch.append
+    for index in indices:
+        length = lengths[index]
+        for i in range(int(length // step) + 1):
+            distance = min(i * step, length)
+            x, y, nx, ny = point_at(index, distance)
+            append(index, distance, x, y, nx, ny)
+    return batch
+
+
+def batch_points_at(segments, indices, distances):
+    """
+    Вычисляет точки по парам (индекс сегмента, расстояние вдоль сегмента).
+    :return: PointBatch
+    """
+    batch = PointBatch()
+    point_at = segments.point_at
+    append = batch.append
+    for index, distance in zip(indices, distances):
+        x, y, nx, ny = point_at(index, distance)
+        append(index, distance, x, y, nx, ny)
+    return batch
+
+
+def _arc_sweep(start_angle, end_angle, ccw):
+    """Подписанный угол раствора дуги от start_angle до end_angle."""
+    two_pi = 2 * pi
+    if ccw:
+        sweep = (end_angle - start_angle) % two_pi
+        return sweep or two_pi
+    sweep = (start_angle - end_angle) % two_pi
+    return -(sweep or two_pi)
+
+
+def add_curve(segments, curve, tag=-1):
+    """
+    Добавляет кривую Revit в SegmentArrays. Line и Arc переносятся
+    точно, прочие кривые — ломаной по Tessellate().
+    :return: количество добавленных сегментов
+    """
+    curve_type = type(curve).__name__
+    p0 = curve.GetEndPoint(0)
+    p1 = curve.GetEndPoint(1)
+    if curve_type == "Line":
+        return int(segments.add_line(p0.X, p0.Y, p1.X, p1.Y, tag) >= 0)
+    if curve_type == "Arc":
+        center = curve.Center
+        start_angle = atan2(p0.Y - center.Y, p0.X - center.X)
+        end_angle = atan2(p1.Y - center.Y, p1.X - center.X)
+        sweep = _arc_sweep(start_angle, end_angle, curve.Normal.Z > 0)
+        index = segments.add_arc(
+            center.X, center.Y, curve.Radius, start_angle, sweep, tag
+        )
+        return int(index >= 0)
+    added = 0
+    points = list(curve.Tessellate())
+    for a, b in zip(points, points[1:]):
+        if segments.add_line(a.X, a.Y, b.X, b.Y, tag) >= 0:
+            added += 1
+    return added
+
+
+def segments_from_curves(curves, tags=None):
+    """
+    Переносит кривые Revit в SegmentArrays (граница с Revit API).
+    :param curves: итерируемый набор Curve
+    :param tags: метки сегментов (например, Id стен) той же длины
+    :return: SegmentArrays
+    """
+    segments = SegmentArrays()
+    if tags is None:
+        for curve in curves:
+            add_curve(segments, curve)
+    else:
+        for curve, tag in zip(curves, tags):
+            add_curve(segments, curve, tag)
+    return segments
+
+
+def batch_to_xyz(batch, z=None):
+    """
+    Создаёт XYZ для точек пакета (граница с Revit API).
+    :param batch: PointBatch
+    :param z: высота точек; по умолчанию 0
+    :return: список XYZ
+    """
+    from Autodesk.Revit.DB import XYZ
+    z = 0.0 if z is None else z
+    return [XYZ(x, y, z) for x, y in zip(batch.x, batch.y)]
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+Одномерные интервалы вдоль сегментов стен.
+Зоны исключения (двери, окна, углы) один раз проецируются на диапазон
+[0, длина] сегмента и вычитаются из него. Розетки генерируются только
+в оставшихся свободных интервалах, поэтому стоимость обработки стены
+зависит от числа проёмов, а не от произведения точек на проёмы.
+"""
+from array import array
+from math import atan2, pi
+
+from core.geometry import ARC, DISTANCE_TOLERANCE, LINE
+
+# Максимальное расстояние от проёма до оси сегмента, при котором
+# проём считается лежащим на этой стене (в единицах Revit)
+DEFAULT_MAX_OFFSET = 1.0
+
+
+def merge_intervals(intervals):
+    """
+    Объединяет пересекающиеся интервалы.
+    :param intervals: итерируемый набор пар (start, end)
+    :return: отсортированный список непересекающихся пар
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_intervals(start, end, excluded):
+    """
+    Вычитает интервалы excluded из [start, end].
+    :return: список свободных пар (start, end)
+    """
+    free = []
+    cursor = start
+    for ex_start, ex_end in merge_intervals(excluded):
+        if ex_end <= cursor:
+            continue
+        if ex_start >= end:
+            break
+        if ex_start > cursor:
+            free.append((cursor, ex_start))
+        cursor = max(cursor, ex_end)
+    if cursor < end:
+        free.append((cursor, end))
+    return free
+
+
+def arc_param(segments, index, x, y):
+    """
+    Расстояние вдоль дуги от её начала до проекции точки (x, y),
+    отсчитанное по направлению обхода (знаку sweep). Углы вне дуги
+    относятся к ближайшему концу: до середины разрыва — после конца,
+    дальше — перед началом (отрицательные значения).
+    """
+    sweep = segments.sweep[index]
+    span = abs(sweep)
+    sign = 1.0 if sweep > 0 else -1.0
+    angle = atan2(y - segments.cy[index], x - segments.cx[index])
+    delta = (sign * (angle - segments.start_angle[index])) % (2 * pi)
+    if delta > (span + 2 * pi) * 0.5:
+        delta -= 2 * pi
+    return delta * segments.radius[index]
+
+
+def segment_param(segments, index, x, y):
+    """Расстояние вдоль сегмента до проекции точки (x, y) на его ось."""
+    if segments.kind[index] == ARC:
+        return arc_param(segments, index, x, y)
+    x0 = segments.x0[index]
+    y0 = segments.y0[index]
+    length = segments.length[index]
+    return ((x - x0) * (segments.x1[index] - x0) +
+            (y - y0) * (segments.y1[index] - y0)) / length
+
+
+def in_intervals(intervals, distance):
+    """Лежит ли distance в одном из интервалов (с DISTANCE_TOLERANCE)."""
+    for start, end in intervals:
+        if (start - DISTANCE_TOLERANCE <= distance <=
+                end + DISTANCE_TOLERANCE):
+            return True
+    return False
+
+
+def project_box(segments, index, min_x, min_y, max_x, max_y,
+                margin=0.0, max_offset=DEFAULT_MAX_OFFSET):
+    """
+    Проецирует габарит проёма на сегмент.
+    Проём учитывается, только если его габарит не дальше max_offset
+    от оси сегмента.
+    :return: пара (start, end) в расстояниях вдоль сегмента с учётом
+        отступа margin или None, если проём не лежит на сегменте
+    """
+    corners = (
+        (min_x, min_y), (min_x, max_y), (max_x, min_y), (max_x, max_y),
+    )
+    kind = segments.kind[index]
+    length = segments.length[index]
+    params = []
+    offsets = []
+    if kind == LINE:
+        x0 = segments.x0[index]
+        y0 = segments.y0[index]
+        dx = (segments.x1[index] - x0) / length
+        dy = (segments.y1[index] - y0) / length
+        for x, y in corners:
+            params.append((x - x0) * dx + (y - y0) * dy)
+            offsets.append((x - x0) * dy - (y - y0) * dx)
+    elif kind == ARC:
+        cx = segments.cx[index]
+        cy = segments.cy[index]
+        radius = segments.radius[index]
+        for x, y in corners:
+            params.append(arc_param(segments, index, x, y))
+            offsets.append(((x - cx) ** 2 + (y - cy) ** 2) ** 0.5 - radius)
+    else:
+        return None
+    # Габарит пересекает ось или лежит в пределах max_offset от неё
+    if min(offsets) > max_offset or max(offsets) < -max_offset:
+        return None
+    start = min(params) - margin
+    end = max(params) + margin
+    if end < 0.0 or start > length:
+        return None
+    return start, end
+
+
+def free_intervals(segments, index, openings=(), corner_margin=0.0,
+                   opening_margin=0.0, max_offset=DEFAULT_MAX_OFFSET):
+    """
+    Свободные интервалы сегмента после вычитания проёмов и зон у углов.
+    :param segments: SegmentArrays
+    :param index: индекс сегмента
+    :param openings: габариты проёмов (min_x, min_y, max_x, max_y) или
+        (min_x, min_y, max_x, max_y, отступ) со своим отступом
+    :param corner_margin: отступ от концов сегмента (углов)
+    :param opening_margin: отступ от проёмов без собственного отступа
+    :return: список пар (start, end)
+    """
+    length = segments.length[index]
+    excluded = []
+    if corner_margin > 0.0:
+        excluded.append((0.0, corner_margin))
+        excluded.append((length - corner_margin, length))
+    for box in openings:
+        margin = box[4] if len(box) > 4 else opening_margin
+        interval = project_box(
+            segments, index, box[0], box[1], box[2], box[3],
+            margin, max_offset,
+        )
+        if interval is not None:
+            excluded.append(interval)
+    return subtract_intervals(0.0, length, excluded)
+
+
+def interval_distances(intervals, step):
+    """
+    Расстояния точек с шагом step внутри свободных интервалов.
+    Первая точка каждого интервала — его начало, как у
+    batch_curve_points для целого сегмента; последняя может совпасть
+    с концом интервала с точностью DISTANCE_TOLERANCE.
+    :return: array('d') расстояний вдоль сегмента
+    """
+    distances = array('d')
+    if step <= 0:
+        return distances
+    for start, end in intervals:
+        count = int((end - start + DISTANCE_TOLERANCE) // step) + 1
+        for i in range(count):
+            distances.append(start + i * step)
+    return distances
+
+
+def plan_segment_distances(segments, indices, step, openings=(),
+                           corner_margin=0.0, opening_margin=0.0):
+    """
+    Пары (индекс сегмента, расстояние) для всех сегментов за один проход;
+    результат передаётся в geometry.batch_points_at.
+    :return: кортеж (array индексов, array расстояний)
+    """
+    seg_out = array('l')
+    dist_out = array('d')
+    for index in indices:
+        intervals = free_intervals(
+            segments, index, openings, corner_margin, opening_margin
+        )
+        distances = interval_distances(intervals, step)
+        seg_out.extend([index] * len(distances))
+        dist_out.extend(distances)
+    return seg_out, dist_out
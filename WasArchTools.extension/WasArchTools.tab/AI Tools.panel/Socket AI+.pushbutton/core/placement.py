@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Пакетное создание экземпляров семейства по плану расстановки.
+Для всего плана строятся FamilyInstanceCreationData с заранее
+вычисленным поворотом (Axis/RotateAngle), после чего экземпляры
+создаются пачками через NewFamilyInstances2 — без отдельных вызовов
+Location.Rotate. Каждая пачка выполняется в SubTransaction; при ошибке
+пачка откатывается и делится пополам, пока не останутся только
+проблемные строки плана.
+"""
+import time
+
+# Размеры пачек
+DEFAULT_BATCH_SIZE = 200
+MIN_BATCH_SIZE = 1
+MAX_BATCH_SIZE = 2000
+
+# Желаемая длительность одной пачки, сек: быстрее — пачка растёт
+TARGET_BATCH_SECONDS = 0.5
+
+
+class BulkResult(object):
+    """
+    Итог пакетного создания: Id созданных экземпляров, их строки плана
+    (created_rows[k] — строка экземпляра created_ids[k]) и строки
+    с ошибками.
+    """
+    __slots__ = ('created_ids', 'created_rows', 'failed_rows', 'errors',
+                 'batches')
+
+    def __init__(self):
+        self.created_ids = []
+        self.created_rows = []
+        self.failed_rows = []
+        self.errors = {}
+        self.batches = 0
+
+    @property
+    def created_count(self):
+        return len(self.created_ids)
+
+    @property
+    def failed_count(self):
+        return len(self.failed_rows)
+
+
+def build_creation_data(plan, symbol, resolve_element, result):
+    """
+    Строит FamilyInstanceCreationData для всех строк плана.
+    Строки, для которых не найдена стена или уровень, сразу попадают
+    в result.failed_rows.
+    :param resolve_element: resolve_element(int Id) -> Element
+    :return: список пар (строка плана, FamilyInstanceCreationData)
+    """
+    from Autodesk.Revit.DB import Line, XYZ
+    from Autodesk.Revit.DB.Creation import FamilyInstanceCreationData
+    from Autodesk.Revit.DB.Structure import StructuralType
+    non_structural = StructuralType.NonStructural
+    up = XYZ.BasisZ
+    items = []
+    for row in range(len(plan)):
+        host = resolve_element(plan.wall_id[row])
+        level = resolve_element(plan.level_id[row])
+        if host is None or level is None:
+            result.failed_rows.append(row)
+            result.errors[row] = u"Не найдена стена или уровень"
+            continue
+        point = XYZ(plan.x[row], plan.y[row], plan.z[row])
+        data = FamilyInstanceCreationData(
+            point, symbol, host, level, non_structural
+        )
+        data.Axis = Line.CreateUnbound(point, up)
+        data.RotateAngle = plan.angle[row]
+        items.append((row, data))
+    return items
+
+
+def _create_batch(doc, items):
+    """
+    Создаёт пачку в SubTransaction.
+    :return: список ElementId или None, если пачка откатилась
+    """
+    from Autodesk.Revit.DB import SubTransaction
+    from Autodesk.Revit.DB.Creation import FamilyInstanceCreationData
+    from System.Collections.Generic import List
+    data_list = List[FamilyInstanceCreationData]()
+    for _, data in items:
+        data_list.Add(data)
+    sub = SubTransaction(doc)
+    sub.Start()
+    try:
+        ids = doc.Create.NewFamilyInstances2(data_list)
+        sub.Commit()
+    except Exception as e:
+        if sub.HasStarted() and not sub.HasEnded():
+            sub.RollBack()
+        return None, e
+    return list(ids), None
+
+
+def _create_bisect(doc, items, result):
+    """
+    Создаёт пачку; при ошибке делит её пополам и повторяет только
+    половины, пока не найдёт отдельные строки с ошибками.
+    :return: True, если вся пачка создана без деления
+    """
+    result.batches += 1
+    ids, error = _create_batch(doc, items)
+    if ids is not None:
+        result.created_ids.extend(ids)
+        result.created_rows.extend(row for row, _ in items)
+        return True
+    if len(items) == 1:
+        row = items[0][0]
+        result.failed_rows.append(row)
+        result.errors[row] = u"{0}".format(error)
+        return False
+    middle = len(items) // 2
+    _create_bisect(doc, items[:middle], result)
+    _create_bisect(doc, items[middle:], result)
+    return False
+
+
+def create_instances(doc, plan, symbol, resolve_element,
+                     batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Создаёт экземпляры по плану пачками адаптивного размера.
+    Вызывается внутри открытой транзакции.
+    :param doc: документ Revit
+    :param plan: PlacementPlan
+    :param symbol: FamilySymbol
+    :param resolve_element: resolve_element(int Id) -> Element
+    :param batch_size: начальный размер пачки
+    :return: BulkResult
+    """
+    result = BulkResult()
+    items = build_creation_data(plan, symbol, resolve_element, result)
+    start = 0
+    while start < len(items):
+        batch = items[start:start + batch_size]
+        started = time.time()
+        succeeded = _create_bisect(doc, batch, result)
+        elapsed = time.time() - started
+        start += len(batch)
+        if not succeeded:
+            batch_size = max(MIN_BATCH_SIZE, batch_size // 2)
+        elif elapsed < TARGET_BATCH_SECONDS:
+            batch_size = min(MAX_BATCH_SIZE, batch_size * 2)
+    result.failed_rows.sort()
+    return result
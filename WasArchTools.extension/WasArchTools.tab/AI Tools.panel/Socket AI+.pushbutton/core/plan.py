@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+План расстановки розеток.
+Результат этапа планирования — компактный набор параллельных массивов
+(помещение, стена, уровень, точка, угол, применённое правило), который
+не ссылается на объекты Revit. План можно сохранить в JSON, загрузить
+и применить отдельно в одной короткой транзакции.
+"""
+import json
+import os
+import tempfile
+from array import array
+from math import cos, pi, sin
+
+# Формат файла плана
+PLAN_VERSION = 1
+
+# Флаги строк плана
+FLAG_OK = 0
+# Точку не удалось проверить многоугольником — нужен room.IsPointInRoom
+FLAG_UNCERTAIN = 1
+
+# Имя файла последнего плана во временной папке
+LAST_PLAN_NAME = 'socketai_last_plan.json'
+
+
+def default_plan_path():
+    """Путь к файлу последнего плана во временной папке."""
+    return os.path.join(tempfile.gettempdir(), LAST_PLAN_NAME)
+
+
+class PlacementPlan(object):
+    """
+    План расстановки: строка на каждую розетку.
+    Правила хранятся индексом в списке rule_names.
+    """
+    __slots__ = (
+        'room_id', 'wall_id', 'level_id', 'x', 'y', 'z', 'angle', 'rule',
+        'flag', 'rule_names', '_rule_index',
+    )
+
+    def __init__(self):
+        self.room_id = array('q')
+        self.wall_id = array('q')
+        self.level_id = array('q')
+        self.x = array('d')
+        self.y = array('d')
+        self.z = array('d')
+        self.angle = array('d')
+        self.rule = array('l')
+        self.flag = array('b')
+        self.rule_names = []
+        self._rule_index = {}
+
+    def __len__(self):
+        return len(self.room_id)
+
+    def _rule_code(self, rule_name):
+        code = self._rule_index.get(rule_name)
+        if code is None:
+            code = len(self.rule_names)
+            self.rule_names.append(rule_name)
+            self._rule_index[rule_name] = code
+        return code
+
+    def append(self, room_id, wall_id, level_id, x, y, z, angle,
+               rule_name, flag=FLAG_OK):
+        self.room_id.append(room_id)
+        self.wall_id.append(wall_id)
+        self.level_id.append(level_id)
+        self.x.append(x)
+        self.y.append(y)
+        self.z.append(z)
+        self.angle.append(angle)
+        self.rule.append(self._rule_code(rule_name))
+        self.flag.append(flag)
+
+    def row(self, i):
+        """Строка плана в виде словаря (для отладки и отчётов)."""
+        return {
+            'room_id': self.room_id[i],
+            'wall_id': self.wall_id[i],
+            'level_id': self.level_id[i],
+            'point': (self.x[i], self.y[i], self.z[i]),
+            'angle': self.angle[i],
+            'rule': self.rule_names[self.rule[i]],
+            'flag': self.flag[i],
+        }
+
+    def extend(self, other):
+        """Добавляет строки другого плана (правила перекодируются)."""
+        codes = [self._rule_code(name) for name in other.rule_names]
+        self.room_id.extend(other.room_id)
+        self.wall_id.extend(other.wall_id)
+        self.level_id.extend(other.level_id)
+        self.x.extend(other.x)
+        self.y.extend(other.y)
+        self.z.extend(other.z)
+        self.angle.extend(other.angle)
+        self.rule.extend(codes[code] for code in other.rule)
+        self.flag.extend(other.flag)
+        return self
+
+    def select(self, rows):
+        """Новый план из указанных строк."""
+        plan = PlacementPlan()
+        for i in rows:
+            plan.append(
+                self.room_id[i], self.wall_id[i], self.level_id[i],
+                self.x[i], self.y[i], self.z[i], self.angle[i],
+                self.rule_names[self.rule[i]], self.flag[i],
+            )
+        return plan
+
+    def resolve_uncertain(self, check, probe_offset):
+        """
+        Проверяет строки с FLAG_UNCERTAIN через check(room_id, x, y).
+        Проверочная точка смещается от грани стены внутрь помещения
+        на probe_offset (нормаль восстанавливается по углу поворота).
+        :return: новый план без отклонённых строк, все флаги FLAG_OK
+        """
+        rows = []
+        for i in range(len(self)):
+            if self.flag[i] == FLAG_UNCERTAIN:
+                normal_angle = self.angle[i] - pi / 2
+                px = self.x[i] + cos(normal_angle) * probe_offset
+                py = self.y[i] + sin(normal_angle) * probe_offset
+                if not check(self.room_id[i], px, py):
+                    continue
+            rows.append(i)
+        plan = self.select(rows)
+        plan.flag = array('b', [FLAG_OK]) * len(plan)
+        return plan
+
+    def to_dict(self):
+        return {
+            'version': PLAN_VERSION,
+            'rule_names': list(self.rule_names),
+            'room_id': list(self.room_id),
+            'wall_id': list(self.wall_id),
+            'level_id': list(self.level_id),
+            'x': list(self.x),
+            'y': list(self.y),
+            'z': list(self.z),
+            'angle': list(self.angle),
+            'rule': list(self.rule),
+            'flag': list(self.flag),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get('version') != PLAN_VERSION:
+            raise ValueError(
+                "Неподдерживаемая версия плана: {0}".format(
+                    data.get('version')))
+        plan = cls()
+        plan.rule_names = list(data['rule_names'])
+        plan._rule_index = dict(
+            (name, code) for code, name in enumerate(plan.rule_names)
+        )
+        for name in ('room_id', 'wall_id', 'level_id', 'x', 'y', 'z',
+                     'angle', 'rule', 'flag'):
+            getattr(plan, name).extend(data[name])
+        return plan
+
+    def save(self, path=None):
+        """Сохраняет план в JSON. :return: путь к файлу"""
+        path = path or default_plan_path()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, separators=(',', ':'))
+        return path
+
+    @classmethod
+    def load(cls, path=None):
+        with open(path or default_plan_path(), encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+Этап планирования расстановки розеток.
+Работает только с данными RoomGeometry, правилами и индексом препятствий,
+не открывает транзакций и не обращается к Revit API (кроме необязательной
+проверки неопределённых точек через fallback).
+check_moved_points проверяет теми же правилами точки, сдвинутые вдоль
+стен уже после планирования (рекомендации ai/personalizer.py).
+
+plan_rooms_parallel распределяет планирование помещений по пулу процессов
+(или потоков, если процессы недоступны — например, внутри Revit).
+"""
+import os
+import sys
+from array import array
+
+from core.collisions import DOOR, WINDOW, clearance_distances
+from core.geometry import batch_points_at
+from core.intervals import (DEFAULT_MAX_OFFSET, free_intervals,
+                            in_intervals, plan_segment_distances)
+from core.plan import FLAG_OK, FLAG_UNCERTAIN, PlacementPlan
+from core.polygon import INSIDE, UNCERTAIN, classify_batch
+
+# Высота установки розетки по умолчанию (в единицах Revit)
+DEFAULT_HEIGHT = 0.25
+
+# Число помещений в одной задаче пула
+DEFAULT_CHUNK_SIZE = 32
+
+
+def room_openings(index, geometry, rules):
+    """
+    Двери и окна у границ помещения с отступами из правил.
+    :param index: ClearanceIndex уровня помещения
+    :param geometry: RoomGeometry
+    :param rules: правила помещения
+    :return: список (min_x, min_y, max_x, max_y, отступ)
+    """
+    polygon = geometry.polygon
+    margins = {
+        DOOR: rules.get('min_distance_from_door', 0.0),
+        WINDOW: rules.get('min_distance_from_window', 0.0),
+    }
+    boxes = index.boxes(
+        polygon.min_x - DEFAULT_MAX_OFFSET, polygon.min_y - DEFAULT_MAX_OFFSET,
+        polygon.max_x + DEFAULT_MAX_OFFSET, polygon.max_y + DEFAULT_MAX_OFFSET,
+        DOOR | WINDOW,
+    )
+    return [box[1:] + (margins[box[0]],) for box in boxes]
+
+
+def plan_room(geometry, rules, rule_name, index=None, fallback=None,
+              plan=None):
+    """
+    Планирует розетки одного помещения.
+    :param geometry: RoomGeometry
+    :param rules: правила помещения (с ключом 'step')
+    :param rule_name: имя применённого правила (тип помещения)
+    :param index: ClearanceIndex уровня или None
+    :param fallback: fallback(x, y) -> bool для точек у границы; без него
+        такие точки попадают в план с флагом FLAG_UNCERTAIN
+    :param plan: PlacementPlan для дополнения (по умолчанию новый)
+    :return: PlacementPlan
+    """
+    if plan is None:
+        plan = PlacementPlan()
+    if not geometry.wall_segments or 'step' not in rules:
+        return plan
+    height = rules.get('height', DEFAULT_HEIGHT)
+    segments = geometry.segments
+    # Точки генерируются только в свободных интервалах стен:
+    # проёмы и зоны у углов вычитаются до генерации
+    openings = room_openings(index, geometry, rules) if index else ()
+    seg_indices, distances = plan_segment_distances(
+        segments, geometry.wall_segments, rules['step'], openings,
+        corner_margin=rules.get('min_distance_from_corner', 0.0),
+    )
+    batch = batch_points_at(segments, seg_indices, distances)
+    tags = segments.tags
+    for i, flag in filter_points(geometry, rules, batch, index, fallback):
+        wall_id = tags[batch.segment[i]]
+        plan.append(
+            geometry.room_id, wall_id,
+            geometry.wall_levels.get(wall_id, geometry.level_id),
+            batch.x[i], batch.y[i], height, batch.angle[i], rule_name, flag,
+        )
+    return plan
+
+
+def filter_points(geometry, rules, batch, index=None, fallback=None):
+    """
+    Отбор точек на стенах: принадлежность помещению и расстояния
+    до препятствий из правил.
+    :param batch: PointBatch точек на сегментах geometry
+    :param fallback: fallback(x, y) -> bool для точек у границы; без него
+        такие точки получают флаг FLAG_UNCERTAIN
+    :return: список пар (номер точки в batch, флаг)
+    """
+    # Revit проверяет только точки, которые многоугольник не решил
+    codes, probe_x, probe_y = classify_batch(geometry.polygon, batch)
+    kept = []
+    flags = []
+    for i, code in enumerate(codes):
+        if code == INSIDE:
+            kept.append(i)
+            flags.append(FLAG_OK)
+        elif code == UNCERTAIN:
+            if fallback is None:
+                kept.append(i)
+                flags.append(FLAG_UNCERTAIN)
+            elif fallback(probe_x[i], probe_y[i]):
+                kept.append(i)
+                flags.append(FLAG_OK)
+    # Расстояния до дверей, углов, моек и ТВ проверяются пакетно
+    clearances = clearance_distances(rules)
+    if kept and clearances and index is not None:
+        violations = index.check(
+            [batch.x[i] for i in kept], [batch.y[i] for i in kept],
+            clearances,
+        )
+        return [(i, flag) for i, flag, code in zip(kept, flags, violations)
+                if not code]
+    return list(zip(kept, flags))
+
+
+def check_moved_points(geometry, rules, seg_indices, distances, index=None,
+                       fallback=None):
+    """
+    Проверяет точки, сдвинутые вдоль стен после планирования, теми же
+    правилами, что plan_room: точка должна остаться в свободном интервале
+    своего сегмента (не в проёме, не у угла, не за концом стены), в
+    помещении и дальше заданных расстояний от препятствий. Точки у
+    границы без fallback отклоняются: план после resolve_uncertain уже
+    не проверяется.
+    :param seg_indices: индексы сегментов точек
+    :param distances: расстояния вдоль сегментов
+    :return: кортеж (PointBatch всех точек, список флагов; None —
+        точка отклонена)
+    """
+    segments = geometry.segments
+    batch = batch_points_at(segments, seg_indices, distances)
+    result = [None] * len(batch)
+    openings = room_openings(index, geometry, rules) if index else ()
+    corner_margin = rules.get('min_distance_from_corner', 0.0)
+    free = {}
+    inside = []
+    for i, (seg, distance) in enumerate(zip(seg_indices, distances)):
+        intervals = free.get(seg)
+        if intervals is None:
+            intervals = free[seg] = free_intervals(
+                segments, seg, openings, corner_margin)
+        if in_intervals(intervals, distance):
+            inside.append(i)
+    if not inside:
+        return batch, result
+    candidates = batch_points_at(
+        segments, array('l', [seg_indices[i] for i in inside]),
+        array('d', [distances[i] for i in inside]))
+    for k, flag in filter_points(geometry, rules, candidates, index,
+                                 fallback):
+        if flag == FLAG_OK:
+            result[inside[k]] = flag
+    return batch, result
+
+
+def plan_rooms(geometries, engine, indexes=None, fallbacks=None):
+    """
+    Планирует розетки для списка помещений последовательно.
+    :param geometries: список RoomGeometry
+    :param engine: RuleEngine
+    :param indexes: {Id уровня: ClearanceIndex}
+    :param fallbacks: {Id помещения: fallback(x, y)}
+    :return: PlacementPlan
+    """
+    plan = PlacementPlan()
+    indexes = indexes or {}
+    fallbacks = fallbacks or {}
+    for geometry in geometries:
+        rule_name = engine.resolve_room_type(geometry.name)
+        plan_room(
+            geometry, engine.get_room_rules(rule_name), rule_name,
+            indexes.get(geometry.level_id),
+            fallbacks.get(geometry.room_id), plan,
+        )
+    return plan
+
+
+def _plan_chunk(task):
+    """
+    Задача пула: планирует группу помещений без обращения к Revit.
+    Неопределённые точки остаются в плане с флагом FLAG_UNCERTAIN.
+    :param task: кортеж (список (geometry, rules, rule_name), индексы)
+    :return: PlacementPlan
+    """
+    items, indexes = task
+    plan = PlacementPlan()
+    for geometry, rules, rule_name in items:
+        plan_room(
+            geometry, rules, rule_name, indexes.get(geometry.level_id),
+            None, plan,
+        )
+    return plan
+
+
+def _can_spawn_processes():
+    """
+    Процессы порождаются только из обычного интерпретатора Python:
+    в IronPython multiprocessing не работает, а во встроенном CPython
+    sys.executable указывает на Revit.exe.
+    """
+    if sys.platform == 'cli':
+        return False
+    name = os.path.basename(sys.executable or '').lower()
+    return name.startswith('python')
+
+
+def _make_executor(max_workers, use_processes):
+    from concurrent import futures
+    if use_processes and _can_spawn_processes():
+        try:
+            return futures.ProcessPoolExecutor(max_workers=max_workers)
+        except (ImportError, NotImplementedError, OSError):
+            pass
+    return futures.ThreadPoolExecutor(max_workers=max_workers)
+
+
+def plan_rooms_parallel(geometries, engine, indexes=None, max_workers=None,
+                        chunk_size=DEFAULT_CHUNK_SIZE, use_processes=True):
+    """
+    Планирует помещения параллельно. Помещения делятся на группы подряд
+    идущих элементов; результаты собираются в исходном порядке, поэтому
+    план детерминирован и совпадает с последовательным plan_rooms
+    (кроме флагов неопределённых точек, см. PlacementPlan.resolve_uncertain).
+    :param geometries: список RoomGeometry
+    :param engine: RuleEngine
+    :param indexes: {Id уровня: ClearanceIndex}
+    :param max_workers: число исполнителей (по умолчанию число ядер)
+    :param chunk_size: число помещений в задаче
+    :param use_processes: пробовать пул процессов
+    :return: PlacementPlan
+    """
+    indexes = indexes or {}
+    tasks = []
+    for start in range(0, len(geometries), chunk_size):
+        chunk = geometries[start:start + chunk_size]
+        items = []
+        for geometry in chunk:
+            rule_name = engine.resolve_room_type(geometry.name)
+            items.append(
+                (geometry, engine.get_room_rules(rule_name), rule_name))
+        levels = set(geometry.level_id for geometry in chunk)
+        tasks.append((items, dict(
+            (level, indexes[level]) for level in levels if level in indexes
+        )))
+    plan = PlacementPlan()
+    if not tasks:
+        return plan
+    max_workers = max_workers or os.cpu_count() or 1
+    if len(tasks) == 1 or max_workers == 1:
+        for task in tasks:
+            plan.extend(_plan_chunk(task))
+        return plan
+    executor = _make_executor(min(max_workers, len(tasks)), use_processes)
+    try:
+        # map сохраняет порядок задач
+        for chunk_plan in executor.map(_plan_chunk, tasks):
+            plan.extend(chunk_plan)
+    finally:
+        executor.shutdown(wait=True)
+    return plan
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Модуль для проверки принадлежности точек помещению без обращения к Revit.
+Контуры границ помещения (включая отверстия) один раз переводятся
+в многоугольник, после чего все точки-кандидаты проверяются пакетно
+правилом чёт-нечет. Точки в полосе допуска у границы считаются
+неопределёнными и проверяются через room.IsPointInRoom.
+"""
+from array import array
+from math import acos, ceil
+
+from core.geometry import ARC
+
+# Результаты classify
+OUTSIDE = 0
+INSIDE = 1
+UNCERTAIN = -1
+
+# Полоса допуска у границы (в единицах Revit, футы)
+DEFAULT_TOLERANCE = 0.01
+# Смещение проверочной точки от грани стены внутрь помещения
+PROBE_OFFSET = 0.05
+
+
+class RoomPolygon(object):
+    """
+    Многоугольник помещения: рёбра всех контуров в параллельных массивах.
+    Отверстия не требуют отдельной обработки — правило чёт-нечет
+    учитывает их автоматически.
+    """
+    __slots__ = ('ax', 'ay', 'bx', 'by', 'min_x', 'min_y', 'max_x', 'max_y')
+
+    def __init__(self, loops):
+        """
+        :param loops: список контуров, каждый — список вершин (x, y)
+        """
+        self.ax = array('d')
+        self.ay = array('d')
+        self.bx = array('d')
+        self.by = array('d')
+        xs = []
+        ys = []
+        for loop in loops:
+            if len(loop) < 3:
+                continue
+            for (x0, y0), (x1, y1) in zip(loop, loop[1:] + loop[:1]):
+                if x0 == x1 and y0 == y1:
+                    continue
+                self.ax.append(x0)
+                self.ay.append(y0)
+                self.bx.append(x1)
+                self.by.append(y1)
+                xs.append(x0)
+                ys.append(y0)
+        if xs:
+            self.min_x, self.max_x = min(xs), max(xs)
+            self.min_y, self.max_y = min(ys), max(ys)
+        else:
+            self.min_x = self.min_y = self.max_x = self.max_y = 0.0
+
+    def __len__(self):
+        return len(self.ax)
+
+    @classmethod
+    def from_segments(cls, segments, loop_starts,
+                      tolerance=DEFAULT_TOLERANCE):
+        """
+        Строит многоугольник из SegmentArrays.
+        Дуги заменяются хордами с прогибом не больше половины допуска,
+        чтобы погрешность аппроксимации оставалась внутри полосы допуска.
+        :param segments: SegmentArrays, сегменты идут по контурам подряд
+        :param loop_starts: индексы первых сегментов каждого контура
+        """
+        bounds = list(loop_starts) + [len(segments)]
+        loops = []
+        for start, stop in zip(bounds, bounds[1:]):
+            loop = []
+            for index in range(start, stop):
+                loop.append((segments.x0[index], segments.y0[index]))
+                if segments.kind[index] == ARC:
+                    loop.extend(
+                        _arc_vertices(segments, index, tolerance * 0.5)
+                    )
+            loops.append(loop)
+        return cls(loops)
+
+    def classify(self, xs, ys, tolerance=DEFAULT_TOLERANCE):
+        """
+        Пакетная проверка точек.
+        :param xs: координаты X
+        :param ys: координаты Y
+        :param tolerance: ширина полосы неопределённости у границы
+        :return: array('b') со значениями INSIDE, OUTSIDE, UNCERTAIN
+        """
+        result = array('b')
+        edges = list(zip(self.ax, self.ay, self.bx, self.by))
+        tol2 = tolerance * tolerance
+        min_x = self.min_x - tolerance
+        min_y = self.min_y - tolerance
+        max_x = self.max_x + tolerance
+        max_y = self.max_y + tolerance
+        for px, py in zip(xs, ys):
+            if px < min_x or px > max_x or py < min_y or py > max_y:
+                result.append(OUTSIDE)
+                continue
+            inside = False
+            near = False
+            for ax, ay, bx, by in edges:
+                # Пересечение горизонтального луча вправо с ребром
+                if (ay > py) != (by > py):
+                    cross_x = ax + (py - ay) * (bx - ax) / (by - ay)
+                    if px < cross_x:
+                        inside = not inside
+                if not near:
+                    near = _segment_dist2(px, py, ax, ay, bx, by) <= tol2
+            if near:
+                result.append(UNCERTAIN)
+            else:
+                result.append(INSIDE if inside else OUTSIDE)
+        return result
+
+
+def _arc_vertices(segments, index, sagitta):
+    """Промежуточные вершины дуги (без концов) для хорд с прогибом sagitta."""
+    radius = segments.radius[index]
+    sweep = segments.sweep[index]
+    if sagitta >= radius:
+        count = 2
+    else:
+        max_angle = 2 * acos(1.0 - sagitta / radius)
+        count = max(2, int(ceil(abs(sweep) / max_angle)))
+    count = min(count, 256)
+    length = segments.length[index]
+    vertices = []
+    for i in range(1, count):
+        x, y, _, _ = segments.point_at(index, length * i / count)
+        vertices.append((x, y))
+    return vertices
+
+
+def _segment_dist2(px, py, ax, ay, bx, by):
+    """Квадрат расстояния от точки до отрезка."""
+    dx = bx - ax
+    dy = by - ay
+    len2 = dx * dx + dy * dy
+    t = ((px - ax) * dx + (py - ay) * dy) / len2 if len2 else 0.0
+    if t < 0.0:
+        t = 0.0
+    elif t > 1.0:
+        t = 1.0
+    ex = ax + t * dx - px
+    ey = ay + t * dy - py
+    return ex * ex + ey * ey
+
+
+def classify_batch(polygon, batch, tolerance=DEFAULT_TOLERANCE,
+                   probe_offset=PROBE_OFFSET):
+    """
+    Классифицирует точки PointBatch: каждая точка смещается по нормали
+    внутрь на probe_offset, после чего все проверочные точки проверяются
+    одним вызовом classify.
+    :return: кортеж (коды, X проверочных точек, Y проверочных точек)
+    """
+    probe_x = [x + nx * probe_offset for x, nx in zip(batch.x, batch.nx)]
+    probe_y = [y + ny * probe_offset for y, ny in zip(batch.y, batch.ny)]
+    return polygon.classify(probe_x, probe_y, tolerance), probe_x, probe_y
+
+
+def filter_batch(polygon, batch, fallback=None,
+                 tolerance=DEFAULT_TOLERANCE, probe_offset=PROBE_OFFSET):
+    """
+    Отбирает точки PointBatch, лежащие в помещении (см. classify_batch).
+    Неопределённые точки передаются в fallback(x, y) — обычно это обёртка
+    над room.IsPointInRoom; без fallback они отбрасываются.
+    :return: список индексов точек пакета, лежащих в помещении
+    """
+    codes, probe_x, probe_y = classify_batch(
+        polygon, batch, tolerance, probe_offset)
+    kept = []
+    for i, code in enumerate(codes):
+        if code == INSIDE:
+            kept.append(i)
+        elif code == UNCERTAIN and fallback is not None:
+            if fallback(probe_x[i], probe_y[i]):
+                kept.append(i)
+    return kept
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+Кэш геометрии помещений для Socket AI+.
+Границы помещения извлекаются через GetBoundarySegments один раз и
+хранятся в виде массивов (SegmentArrays) вместе с Id стен, их ориентацией
+и многоугольником помещения. Кэш живёт всю сессию Revit и сбрасывается
+для помещения, если изменилось состояние документа или его геометрия
+либо одна из его стен удалена или изменена (например, заменена стеной
+того же положения: отпечаток при этом не меняется). Удалённые и
+изменённые элементы отмечает хук pyRevit hooks/doc-changed.py по
+событию DocumentChanged, поэтому при попадании в кэш стены через API
+не проверяются.
+"""
+from core.geometry import SegmentArrays, add_curve
+from core.polygon import RoomPolygon
+from core.session import get_session_store
+
+# Имя хранилища сессии для геометрии помещений
+STORE_NAME = 'room_geometry'
+# Хранилище сессии изменённых элементов: {'sequence': номер последнего
+# события, 'documents': {ключ документа: {Id элемента: номер события}}};
+# заполняется хуком hooks/doc-changed.py расширения
+CHANGES_STORE_NAME = 'room_changes'
+
+# Точность округления отпечатка помещения
+FINGERPRINT_DIGITS = 6
+
+
+def id_value(element_id):
+    """
+    Целочисленное значение ElementId (Value в Revit 2024+,
+    IntegerValue в более ранних версиях).
+    """
+    value = getattr(element_id, 'Value', None)
+    if value is None:
+        value = element_id.IntegerValue
+    return int(value)
+
+
+class RoomGeometry(object):
+    """
+    Геометрия помещения без ссылок на объекты Revit.
+    segments — все сегменты всех контуров подряд (теги — Id стен или -1),
+    loop_starts — индексы первых сегментов контуров,
+    wall_segments — индексы сегментов внешнего контура, лежащих на стенах,
+    wall_ids — Id стен всех контуров в порядке обхода (каждая стена
+    один раз),
+    wall_orientation — {Id стены: (ox, oy)} по Wall.Orientation,
+    wall_midpoints — {Id стены: (x, y)} середины осей стен,
+    wall_levels — {Id стены: Id уровня},
+    stamp — номер последнего события DocumentChanged перед извлечением.
+    """
+    __slots__ = (
+        'room_id', 'name', 'level_id', 'base_z', 'segments', 'loop_starts',
+        'wall_segments', 'wall_ids', 'wall_orientation', 'wall_midpoints',
+        'wall_levels', 'polygon', 'fingerprint', 'stamp',
+    )
+
+    def __init__(self, room_id, name=None, level_id=-1):
+        self.room_id = room_id
+        self.name = name
+        self.level_id = level_id
+        self.base_z = 0.0
+        self.segments = SegmentArrays()
+        self.loop_starts = []
+        self.wall_segments = []
+        self.wall_ids = []
+        self.wall_orientation = {}
+        self.wall_midpoints = {}
+        self.wall_levels = {}
+        self.polygon = None
+        self.fingerprint = None
+        self.stamp = 0
+
+    @property
+    def has_boundaries(self):
+        return bool(self.loop_starts)
+
+    def finalize(self):
+        """Строит многоугольник после заполнения сегментов."""
+        self.polygon = RoomPolygon.from_segments(
+            self.segments, self.loop_starts
+        )
+        return self
+
+
+def document_key(doc):
+    """Ключ документа: путь к файлу или имя несохранённого проекта."""
+    return doc.PathName or doc.Title
+
+
+def document_state(doc):
+    """
+    Состояние документа: GUID версии (меняется при сохранении) или None,
+    если API версий недоступно (Revit до 2021).
+    """
+    from Autodesk.Revit.DB import Document
+    get_version = getattr(Document, 'GetDocumentVersion', None)
+    if get_version is None:
+        return None
+    try:
+        version = get_version(doc)
+    except Exception:
+        return None
+    if version is None:
+        return None
+    return str(version.VersionGUID)
+
+
+def room_fingerprint(room, state=None):
+    """
+    Дешёвый отпечаток геометрии помещения: состояние документа, площадь,
+    периметр и габариты. Изменение стен меняет хотя бы одно из значений.
+    """
+    values = [room.Area, room.Perimeter]
+    bbox = room.get_BoundingBox(None)
+    if bbox is not None:
+        values.extend((bbox.Min.X, bbox.Min.Y, bbox.Max.X, bbox.Max.Y))
+    return (state,) + tuple(round(v, FINGERPRINT_DIGITS) for v in values)
+
+
+def extract_room_geometry(room):
+    """
+    Извлекает геометрию помещения за один вызов GetBoundarySegments.
+    Каждый элемент границы разрешается через doc.GetElement один раз.
+    :param room: объект Room
+    :return: RoomGeometry
+    """
+    from Autodesk.Revit.DB import SpatialElementBoundaryOptions, Wall
+    doc = room.Document
+    geometry = RoomGeometry(
+        id_value(room.Id), getattr(room, 'Name', None), id_value(room.LevelId)
+    )
+    boundaries = room.GetBoundarySegments(SpatialElementBoundaryOptions())
+    if not boundaries:
+        return geometry.finalize()
+    segments = geometry.segments
+    resolved = {}
+    base_z = None
+    for loop_index, loop in enumerate(boundaries):
+        geometry.loop_starts.append(len(segments))
+        for segment in loop:
+            element_id = segment.ElementId
+            key = id_value(element_id)
+            if key not in resolved:
+                element = doc.GetElement(element_id)
+                resolved[key] = isinstance(element, Wall)
+                if resolved[key]:
+                    _add_wall(geometry, key, element)
+            tag = key if resolved[key] else -1
+            curve = segment.GetCurve()
+            if base_z is None:
+                base_z = curve.GetEndPoint(0).Z
+            first = len(segments)
+            added = add_curve(segments, curve, tag)
+            if loop_index == 0 and tag >= 0:
+                geometry.wall_segments.extend(range(first, first + added))
+    geometry.base_z = base_z or 0.0
+    return geometry.finalize()
+
+
+def _add_wall(geometry, wall_id, wall):
+    """Запоминает ориентацию, середину оси и уровень стены."""
+    geometry.wall_ids.append(wall_id)
+    orientation = wall.Orientation
+    geometry.wall_orientation[wall_id] = (orientation.X, orientation.Y)
+    geometry.wall_levels[wall_id] = id_value(wall.LevelId)
+    location = getattr(wall, 'Location', None)
+    curve = getattr(location, 'Curve', None)
+    if curve is not None:
+        mid = curve.Evaluate(0.5, True)
+        geometry.wall_midpoints[wall_id] = (mid.X, mid.Y)
+
+
+class RoomGeometryCache(object):
+    """
+    Кэш RoomGeometry по ключу (документ, Id помещения).
+    Записи хранятся в хранилище сессии и переиспользуются повторными
+    запусками; объекты Revit (стены, уровни) кэшируются только на время
+    одного запуска в self._elements.
+    """
+
+    def __init__(self, store=None, changes=None):
+        if store is None:
+            store = get_session_store(STORE_NAME)
+        if changes is None:
+            changes = get_session_store(CHANGES_STORE_NAME)
+        changes.setdefault('sequence', 0)
+        changes.setdefault('documents', {})
+        self._entries = store
+        self._changes = changes
+        self._elements = {}
+        self._states = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, room):
+        """
+        Возвращает RoomGeometry помещения, извлекая её только
+        при отсутствии в кэше, изменении отпечатка или если стены
+        из кэша удалены или изменены после извлечения.
+        """
+        doc = room.Document
+        doc_key = document_key(doc)
+        if doc_key not in self._states:
+            self._states[doc_key] = document_state(doc)
+        fingerprint = room_fingerprint(room, self._states[doc_key])
+        key = (doc_key, id_value(room.Id))
+        geometry = self._entries.get(key)
+        if (geometry is not None and geometry.fingerprint == fingerprint and
+                not self._walls_changed(doc_key, geometry)):
+            self.hits += 1
+            return geometry
+        self.misses += 1
+        stamp = self._changes['sequence']
+        geometry = extract_room_geometry(room)
+        geometry.fingerprint = fingerprint
+        geometry.stamp = stamp
+        self._entries[key] = geometry
+        return geometry
+
+    def _walls_changed(self, doc_key, geometry):
+        """
+        Стена из кэшированной геометрии удалена или изменена после
+        извлечения. Проверка идёт по отметкам хука DocumentChanged,
+        без обращений к API.
+        """
+        changed = self._changes['documents'].get(doc_key)
+        if not changed:
+            return False
+        stamp = geometry.stamp
+        return any(changed.get(wall_id, 0) > stamp
+                   for wall_id in geometry.wall_ids)
+
+    def get_element(self, doc, element_id):
+        """
+        Разрешает элемент по целочисленному Id один раз за запуск.
+        """
+        element = self._elements.get(element_id)
+        if element is None:
+            from Autodesk.Revit.DB import ElementId
+            element = doc.GetElement(ElementId(element_id))
+            self._elements[element_id] = element
+        return element
+
+    def clear(self):
+        self._entries.clear()
+        self._elements.clear()
+        self._states.clear()
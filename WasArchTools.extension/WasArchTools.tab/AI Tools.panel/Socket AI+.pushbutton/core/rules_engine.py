@@ -1,18 +1,136 @@
 # -*- coding: utf-8 -*-
 """
 Модуль для парсинга нормативов и получения правил для различных типов помещений.
+
+rules.json компилируется один раз: правила каждого типа заранее
+объединяются с default, а имена помещений сопоставляются с типами одним
+регулярным выражением из подстрок раздела _aliases (подстроки
+экранируются: скобки, точки и «+» в них ищутся буквально). Приоритет
+подстроки — её порядок в _aliases, а не положение в имени помещения.
+Скомпилированная таблица кэшируется на уровне модуля и перечитывается
+только при изменении файла.
 """
 import os
 import json
+import re
+
+# Служебный раздел rules.json: {тип помещения: [подстроки имён]}
+ALIASES_KEY = "_aliases"
+DEFAULT_KEY = "default"
+
+# Скомпилированные таблицы: {путь: (mtime, CompiledRules)}
+_COMPILED = {}
+
+
+def default_rules_path():
+    # Абсолютный путь к assets/rules.json относительно этого файла
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base_dir, "assets", "rules.json")
+
+
+def _normalize(name):
+    return u" ".join(name.lower().split())
+
+
+class CompiledRules(object):
+    """
+    Таблица правил: типы, объединённые с default, и сопоставитель имён.
+    Результаты сопоставления запоминаются для каждого имени помещения.
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+        default = raw.get(DEFAULT_KEY, {})
+        self.default = dict(default)
+        self.types = {}
+        for room_type, rules in raw.items():
+            if room_type.startswith("_") or room_type == DEFAULT_KEY:
+                continue
+            merged = dict(default)
+            merged.update(rules)
+            self.types[room_type] = merged
+        self.types[DEFAULT_KEY] = self.default
+        self._exact = dict(
+            (_normalize(room_type), room_type) for room_type in self.types
+        )
+        # Группа g<N> — подстрока с приоритетом N (0 — наивысший)
+        self._group_types = []
+        patterns = []
+        for room_type, aliases in raw.get(ALIASES_KEY, {}).items():
+            if room_type not in self.types:
+                continue
+            for alias in aliases:
+                patterns.append(u"(?P<g{0}>{1})".format(
+                    len(self._group_types), re.escape(_normalize(alias))))
+                self._group_types.append(room_type)
+        # Опережающая проверка нулевой длины находит подстроки в каждой
+        # позиции имени, в том числе перекрывающиеся; в одной позиции
+        # побеждает первая по приоритету альтернатива
+        self._matcher = (
+            re.compile(u"(?=(?:{0}))".format(u"|".join(patterns)),
+                       re.IGNORECASE | re.UNICODE)
+            if patterns else None
+        )
+        self._memo = {}
+
+    def resolve(self, room_name):
+        """
+        Тип помещения по имени: точное совпадение с ключом rules.json,
+        затем найденная в имени подстрока из _aliases, стоящая в _aliases
+        раньше остальных найденных, иначе default.
+        """
+        if room_name is None:
+            return DEFAULT_KEY
+        room_type = self._memo.get(room_name)
+        if room_type is not None:
+            return room_type
+        normalized = _normalize(room_name)
+        room_type = self._exact.get(normalized)
+        if room_type is None and self._matcher is not None:
+            best = None
+            for match in self._matcher.finditer(normalized):
+                group = int(match.lastgroup[1:])
+                if best is None or group < best:
+                    best = group
+                    if best == 0:
+                        break
+            if best is not None:
+                room_type = self._group_types[best]
+        if room_type is None:
+            room_type = DEFAULT_KEY
+        self._memo[room_name] = room_type
+        return room_type
+
+
+def load_compiled_rules(rules_path=None):
+    """
+    Скомпилированные правила из кэша модуля; файл перечитывается,
+    только если изменилось его время модификации.
+    """
+    if rules_path is None:
+        rules_path = default_rules_path()
+    mtime = os.path.getmtime(rules_path)
+    cached = _COMPILED.get(rules_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(rules_path, encoding='utf-8') as f:
+        compiled = CompiledRules(json.load(f))
+    _COMPILED[rules_path] = (mtime, compiled)
+    return compiled
+
 
 class RuleEngine:
     def __init__(self, rules_path=None):
-        if rules_path is None:
-            # Абсолютный путь к assets/rules.json относительно этого файла
-            base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            rules_path = os.path.join(base_dir, "assets", "rules.json")
-        with open(rules_path, encoding='utf-8') as f:
-            self.rules = json.load(f)
-    
+        self.compiled = load_compiled_rules(rules_path)
+        self.rules = self.compiled.raw
+
+    def resolve_room_type(self, room_name):
+        return self.compiled.resolve(room_name)
+
     def get_room_rules(self, room_type):
-        return self.rules.get(room_type, self.rules["default"]) 
\ No newline at end of file
+        """
+        Правила для типа или имени помещения, объединённые с default.
+        Возвращается общий словарь таблицы — его нельзя изменять.
+        """
+        compiled = self.compiled
+        return compiled.types[compiled.resolve(room_type)]
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Журнал одного запуска Socket AI+.
+Окно вывода pyRevit отрисовывает каждую строку print, поэтому сообщения
+копятся в памяти и выводятся одним блоком в конце запуска вместе
+со сводкой счётчиков. Форматирование откладывается до flush, а вызов
+debug при выключенной отладке сводится к одному сравнению.
+По запросу отладочные записи сохраняются в файл JSON Lines. Если файл
+превышает dump_max_bytes, он переименовывается в файл с суффиксом .1
+(старые копии сдвигаются, хранится не больше dump_backups).
+"""
+import io
+import json
+import os
+import time
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {DEBUG: u'DEBUG', INFO: u'INFO', WARNING: u'WARNING',
+               ERROR: u'ERROR'}
+LEVEL_PREFIXES = {DEBUG: u'  ', INFO: u'', WARNING: u'[!] ', ERROR: u'[!!] '}
+
+# Для sampled: выводится каждое N-е сообщение с одним ключом
+DEFAULT_SAMPLE_EVERY = 50
+# Предел буфера; дальше сообщения только считаются
+DEFAULT_MAX_RECORDS = 5000
+# Ротация дампа: размер файла и число хранимых копий
+DEFAULT_DUMP_MAX_BYTES = 1024 * 1024
+DEFAULT_DUMP_BACKUPS = 3
+
+# Счётчики сводки для предупреждений и ошибок
+WARNINGS_KEY = u'Предупреждений'
+ERRORS_KEY = u'Ошибок'
+
+
+class RunLog(object):
+    """
+    Буферизованный журнал с уровнями и сводкой.
+    Сообщения — шаблоны str.format с аргументами; строки собираются
+    только при flush.
+    """
+
+    def __init__(self, title=u'Socket AI+', level=INFO, sink=None,
+                 dump_path=None, sample_every=DEFAULT_SAMPLE_EVERY,
+                 max_records=DEFAULT_MAX_RECORDS,
+                 dump_max_bytes=DEFAULT_DUMP_MAX_BYTES,
+                 dump_backups=DEFAULT_DUMP_BACKUPS):
+        self.title = title
+        self.level = level
+        self.debug_enabled = level <= DEBUG
+        self.sink = sink or print
+        self.dump_path = dump_path
+        self.dump_max_bytes = dump_max_bytes
+        self.dump_backups = dump_backups
+        self.sample_every = max(1, sample_every)
+        self.max_records = max_records
+        self.records = []
+        self.dropped = 0
+        self.counters = {}
+        self._samples = {}
+        self._started = time.time()
+
+    def _add(self, level, message, args):
+        if level < self.level:
+            return
+        if len(self.records) >= self.max_records and level < WARNING:
+            self.dropped += 1
+            return
+        self.records.append((level, time.time(), message, args))
+
+    def debug(self, message, *args):
+        if self.debug_enabled:
+            self._add(DEBUG, message, args)
+
+    def info(self, message, *args):
+        self._add(INFO, message, args)
+
+    def warning(self, message, *args):
+        self.count(WARNINGS_KEY)
+        self._add(WARNING, message, args)
+
+    def error(self, message, *args):
+        self.count(ERRORS_KEY)
+        self._add(ERROR, message, args)
+
+    def sampled(self, key, message, *args):
+        """
+        Отладочное сообщение, выводимое для каждого sample_every-го
+        вызова с ключом key (остальные только считаются).
+        """
+        if not self.debug_enabled:
+            return
+        seen = self._samples.get(key, 0)
+        self._samples[key] = seen + 1
+        if seen % self.sample_every == 0:
+            self._add(DEBUG, message + u" (#{0})".format(seen + 1), args)
+
+    def count(self, key, amount=1):
+        """Увеличивает счётчик сводки."""
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    @staticmethod
+    def _format(message, args):
+        if not args:
+            return message
+        try:
+            return message.format(*args)
+        except (IndexError, KeyError, ValueError):
+            return u"{0} {1}".format(message, args)
+
+    def summary_lines(self):
+        lines = [u"=== {0}: {1:.2f} c ===".format(
+            self.title, time.time() - self._started)]
+        for key in sorted(self.counters):
+            lines.append(u"{0}: {1}".format(key, self.counters[key]))
+        if self.dropped:
+            lines.append(u"Сообщений не показано: {0}".format(self.dropped))
+        return lines
+
+    def flush(self):
+        """
+        Выводит все накопленные сообщения и сводку одним вызовом sink,
+        при необходимости пишет отладочный дамп и очищает буфер.
+        Ошибка записи дампа не прерывает запуск (flush вызывается
+        из finally) и добавляется в вывод.
+        """
+        lines = [LEVEL_PREFIXES[level] + self._format(message, args)
+                 for level, _, message, args in self.records]
+        lines.extend(self.summary_lines())
+        if self.dump_path:
+            try:
+                self.dump(self.dump_path)
+            except (IOError, OSError) as e:
+                lines.append(LEVEL_PREFIXES[WARNING] + u"Не удалось "
+                             u"сохранить журнал {0}: {1}".format(
+                                 self.dump_path, e))
+        self.sink(u"\n".join(lines))
+        del self.records[:]
+        self.dropped = 0
+
+    def _backup_path(self, path, number):
+        root, ext = os.path.splitext(path)
+        return u"{0}.{1}{2}".format(root, number, ext)
+
+    def _rotate(self, path):
+        if (not os.path.exists(path) or
+                os.path.getsize(path) < self.dump_max_bytes):
+            return
+        if self.dump_backups < 1:
+            os.remove(path)
+            return
+        oldest = self._backup_path(path, self.dump_backups)
+        if os.path.exists(oldest):
+            os.remove(oldest)
+        for number in range(self.dump_backups - 1, 0, -1):
+            source = self._backup_path(path, number)
+            if os.path.exists(source):
+                os.rename(source, self._backup_path(path, number + 1))
+        os.rename(path, self._backup_path(path, 1))
+
+    def dump(self, path):
+        """
+        Дописывает буфер в JSON Lines: одна запись на строку. Перед
+        записью файл ротируется по dump_max_bytes.
+        """
+        self._rotate(path)
+        with io.open(path, 'a', encoding='utf-8') as f:
+            for level, stamp, message, args in self.records:
+                f.write(json.dumps({
+                    'time': stamp,
+                    'level': LEVEL_NAMES[level],
+                    'message': self._format(message, args),
+                }, ensure_ascii=False))
+                f.write(u"\n")
+            f.write(json.dumps({
+                'time': time.time(), 'level': u'SUMMARY',
+                'counters': self.counters,
+            }, ensure_ascii=False))
+            f.write(u"\n")
+
+
+# Журнал текущего запуска, общий для модулей Socket AI+
+_current = None
+
+
+def start_run(title=u'Socket AI+', level=INFO, dump_path=None, sink=None):
+    """Начинает новый запуск и делает его журнал текущим."""
+    global _current
+    _current = RunLog(title, level, sink, dump_path)
+    return _current
+
+
+def get_run_log():
+    """Журнал текущего запуска (создаётся при первом обращении)."""
+    global _current
+    if _current is None:
+        _current = RunLog()
+    return _current
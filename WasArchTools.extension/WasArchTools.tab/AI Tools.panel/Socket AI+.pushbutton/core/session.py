@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+Хранилища, живущие всю сессию Revit.
+pyRevit заново выполняет script.py при каждом нажатии кнопки, поэтому
+кэши модульного уровня теряются. Здесь они размещаются в переменных
+окружения pyRevit (данные AppDomain) и переживают повторные запуски.
+Вне Revit используется обычный словарь модуля.
+"""
+
+# Префикс имён переменных pyRevit для кэшей Socket AI+
+ENVVAR_PREFIX = 'SOCKETAI_'
+
+_LOCAL_STORES = {}
+
+
+def get_session_store(name):
+    """
+    Возвращает словарь, общий для всех запусков в текущей сессии.
+    В хранилище стоит класть только встроенные типы (dict, list, tuple,
+    числа, строки) или объекты со слотами без ссылок на элементы Revit.
+    :param name: имя хранилища
+    :return: dict
+    """
+    envvar = ENVVAR_PREFIX + name.upper()
+    try:
+        from pyrevit import script
+    except ImportError:
+        return _LOCAL_STORES.setdefault(envvar, {})
+    store = script.get_envvar(envvar)
+    if store is None:
+        store = {}
+        script.set_envvar(envvar, store)
+    return store
+
+
+def clear_session_store(name):
+    """Очищает хранилище name."""
+    get_session_store(name).clear()
@@ -3,61 +3,94 @@
 Скрипт для автоматической расстановки розеток в выбранных помещениях.
 Использует правила из assets/rules.json.
 """
-from pyrevit import revit, DB, forms
+import json
+import os
+import tempfile
+import zlib
+
+from pyrevit import revit, DB, forms, EXEC_PARAMS
 # from core.geometry import generate_wall_points  # больше не используется
-from core.geometry import generate_curve_points
+from core.collisions import add_room_corners, collect_level_obstacles
+from core.placement import create_instances
+from core.plan import PlacementPlan
+from core.planner import plan_room, plan_rooms_parallel
+from core.polygon import PROBE_OFFSET
+from core.room_cache import RoomGeometryCache, id_value
 from core.rules_engine import RuleEngine
+from core.run_log import DEBUG, INFO, get_run_log, start_run
+from ai.classifier import classify_rooms, load_model as load_classifier
+from ai.data_logger import DataLogger
+from ai.feature_store import get_feature_store, room_key, split_by_room
+from ai.personalizer import (get_personalizer, observe_corrections,
+                             personalize_plan, plan_corrections)
+from ai.service_client import (InferenceClient, ServiceError,
+                               ServiceUnavailable)
 import ui
 
-print('Отладочный вывод')
+# Дамп журнала запуска в режиме отладки (во временной папке)
+RUN_LOG_NAME = 'socketai_run_log.jsonl'
+# Размещённые розетки последнего запуска (во временной папке): при
+# следующем запуске их сдвиги записываются как правки пользователя
+PLACED_NAME = 'socketai_placed.json'
+
+# Кэш геометрии помещений; записи переживают повторные запуски в сессии
+_room_cache = None
+
+def get_room_cache():
+    global _room_cache
+    if _room_cache is None:
+        _room_cache = RoomGeometryCache()
+    return _room_cache
 
 def get_selected_rooms():
     selection = revit.get_selection()
-    print("Выделено элементов:", len(selection))
+    log = get_run_log()
+    log.info("Выделено элементов: {0}", len(selection))
     rooms = []
     for el in selection:
         cat_name = getattr(el.Category, 'Name', None)
-        print("Тип:", type(el), "Категория:", cat_name)
+        log.debug("Тип: {0} Категория: {1}", type(el), cat_name)
         # Корректная фильтрация помещений
         if isinstance(el, DB.SpatialElement) and cat_name in ["Помещения", "Rooms"]:
             rooms.append(el)
-    print(f"Найдено помещений: {len(rooms)}")
+    log.info("Найдено помещений: {0}", len(rooms))
     return rooms
 
-def get_room_walls(room):
-    doc = room.Document
-    boundaries = room.GetBoundarySegments(DB.SpatialElementBoundaryOptions())
-    if not boundaries:
-        print(f"[!] Нет границ для помещения: {getattr(room, 'Name', None)}")
+def get_room_walls(room, cache=None):
+    cache = cache or get_room_cache()
+    geometry = cache.get(room)
+    if not geometry.has_boundaries:
+        get_run_log().warning(
+            "Нет границ для помещения: {0}", getattr(room, 'Name', None))
         return []
-    walls = []
-    for segment in boundaries[0]:
-        wall = doc.GetElement(segment.ElementId)
-        if isinstance(wall, DB.Wall):
-            walls.append(wall)
+    walls = [cache.get_element(room.Document, wall_id)
+             for wall_id in geometry.wall_ids]
     if not walls:
-        print(f"[!] Нет стен для помещения: {getattr(room, 'Name', None)}")
+        get_run_log().warning(
+            "Нет стен для помещения: {0}", getattr(room, 'Name', None))
     return walls
 
-def get_bottom_wall(room, walls):
+def get_bottom_wall(room, walls, cache=None):
     """
     Определяет нижнюю стену помещения по минимальной Y-координате центра стены.
+    Центры стен берутся из кэша геометрии помещения.
     :param room: объект Room
     :param walls: список стен
+    :param cache: RoomGeometryCache (по умолчанию кэш сессии)
     :return: стена с минимальным Y центра
     """
-    # Получаем bounding box помещения
-    bbox = room.get_BoundingBox(None)
-    if not bbox:
+    geometry = (cache or get_room_cache()).get(room)
+    if not geometry.has_boundaries:
         return None
-    min_y = bbox.Min.Y
+    min_y = geometry.polygon.min_y
     # Найдём стену, у которой центр ближе всего к min_y
     min_wall = None
     min_dist = None
     for wall in walls:
-        curve = wall.Location.Curve
-        mid = curve.Evaluate(0.5, True)
-        dist = abs(mid.Y - min_y)
+        mid = geometry.wall_midpoints.get(id_value(wall.Id))
+        if mid is None:
+            continue
+        dist = abs(mid[1] - min_y)
         if min_dist is None or dist < min_dist:
             min_dist = dist
             min_wall = wall
@@ -70,110 +103,455 @@ def get_socket_types(doc):
         .ToElements()
     return symbols
 
-def get_room_wall_segments(room):
-    doc = room.Document
-    boundaries = room.GetBoundarySegments(DB.SpatialElementBoundaryOptions())
-    if not boundaries:
-        print(f"[!] Нет границ для помещения: {getattr(room, 'Name', None)}")
-        return []
-    segments = []
-    for segment in boundaries[0]:
-        wall = doc.GetElement(segment.ElementId)
-        if isinstance(wall, DB.Wall):
-            segments.append((wall, segment.GetCurve()))
-    if not segments:
-        print(f"[!] Нет стен для помещения: {getattr(room, 'Name', None)}")
-    return segments
+def get_room_wall_segments(room, cache=None):
+    """
+    Сегменты внешнего контура помещения, лежащие на стенах.
+    :param room: объект Room
+    :param cache: RoomGeometryCache (по умолчанию кэш сессии)
+    :return: кортеж (RoomGeometry, список индексов сегментов)
+    """
+    geometry = (cache or get_room_cache()).get(room)
+    if not geometry.has_boundaries:
+        get_run_log().warning(
+            "Нет границ для помещения: {0}", getattr(room, 'Name', None))
+        return geometry, []
+    if not geometry.wall_segments:
+        get_run_log().warning(
+            "Нет стен для помещения: {0}", getattr(room, 'Name', None))
+    return geometry, geometry.wall_segments
 
-def place_sockets(selected_rooms, socket_symbol):
+def build_clearance_indexes(doc, geometries):
     """
-    Расставляет розетки в выбранных помещениях по правилам из rules.json.
+    Строит по одному индексу препятствий на уровень: двери, мойки,
+    телевизоры уровня и углы всех выбранных помещений.
+    :param geometries: список RoomGeometry
+    :return: {Id уровня: ClearanceIndex}
+    """
+    indexes = {}
+    for geometry in geometries:
+        index = indexes.get(geometry.level_id)
+        if index is None:
+            index = collect_level_obstacles(
+                doc, DB.ElementId(geometry.level_id))
+            indexes[geometry.level_id] = index
+        add_room_corners(index, geometry.segments, geometry.loop_starts)
+    return indexes
+
+# Начиная с этого числа помещений планирование идёт параллельно;
+# None — только по явному build_plan(parallel=True). Замеры
+# bench/run_bench.py (plan_serial / plan_parallel) выигрыша не показали
+# ни на одном размере этажа, поэтому по умолчанию выключено. Включать
+# после замера на целевой машине.
+PARALLEL_MIN_ROOMS = None
+
+# Сдвигать точки плана по прошлым правкам пользователя (ai/personalizer.py)
+PERSONALIZE_PLAN = True
+# Брать рекомендации у локального сервиса моделей (ai/service.py);
+# если сервис не запущен, они считаются персонализатором этой сессии
+USE_MODEL_SERVICE = False
+# Записывать сдвиги размещённых розеток в журнал правок (ai/data_logger.py)
+LOG_CORRECTIONS = True
+
+def room_store_key(geometry, engine, indexes):
+    """Ключ помещения в хранилище признаков."""
+    rule_name = engine.resolve_room_type(geometry.name)
+    return room_key(geometry, rule_name, engine.get_room_rules(rule_name),
+                    indexes.get(geometry.level_id))
+
+def build_plan_parallel(selected_rooms, geometries, engine, indexes,
+                        store, complexity):
+    """
+    Параллельное планирование: геометрия уже извлечена в массивы,
+    помещения распределяются по пулу исполнителей, затем точки у границ
+    проверяются через room.IsPointInRoom в потоке Revit. Помещения,
+    план которых есть в хранилище признаков, не пересчитываются.
+    :return: PlacementPlan
+    """
+    rooms = dict(
+        (geometry.room_id, (room, geometry.base_z))
+        for room, geometry in zip(selected_rooms, geometries)
+    )
+
+    def is_in_room(room_id, px, py):
+        room, base_z = rooms[room_id]
+        return room.IsPointInRoom(DB.XYZ(px, py, base_z))
+
+    keys = [room_store_key(geometry, engine, indexes)
+            for geometry in geometries]
+    cached = [store.get_plan(key) for key in keys]
+    missing = [geometry for geometry, room_plan in zip(geometries, cached)
+               if room_plan is None]
+    fresh = plan_rooms_parallel(missing, engine, indexes)
+    fresh = split_by_room(fresh.resolve_uncertain(is_in_room, PROBE_OFFSET))
+    plan = PlacementPlan()
+    for i, geometry in enumerate(geometries):
+        room_plan = cached[i]
+        if room_plan is None:
+            room_plan = fresh.get(geometry.room_id) or PlacementPlan()
+            store.put(keys[i], geometry,
+                      engine.resolve_room_type(geometry.name),
+                      complexity.values(i), room_plan)
+        plan.extend(room_plan)
+    log = get_run_log()
+    log.info("Помещений: {0}, точек: {1}", len(geometries), len(plan))
+    log.count("Точек в плане", len(plan))
+    return plan
+
+def build_plan(selected_rooms, engine=None, cache=None, parallel=None):
+    """
+    Этап планирования: вычисляет точки и углы всех розеток без открытой
+    транзакции. Модель на это время не блокируется.
     :param selected_rooms: список объектов Room
+    :param parallel: параллельное планирование; по умолчанию включается
+        для PARALLEL_MIN_ROOMS и более помещений (если порог задан)
+    :return: PlacementPlan
+    """
+    engine = engine or RuleEngine()
+    cache = cache or get_room_cache()
+    doc = revit.doc
+    log = get_run_log()
+    geometries = [cache.get(room) for room in selected_rooms]
+    weights, threshold = load_classifier()
+    complexity = classify_rooms(geometries, threshold, weights)
+    log.count("Сложных помещений", len(complexity.complex_ids()))
+    indexes = build_clearance_indexes(doc, geometries)
+    if parallel is None:
+        parallel = (PARALLEL_MIN_ROOMS is not None and
+                    len(selected_rooms) >= PARALLEL_MIN_ROOMS)
+    store = get_feature_store()
+    if parallel:
+        plan = build_plan_parallel(
+            selected_rooms, geometries, engine, indexes, store, complexity)
+        save_feature_store(store)
+        return personalize(plan, selected_rooms, geometries, engine, indexes)
+    plan = PlacementPlan()
+    for i, (room, geometry) in enumerate(zip(selected_rooms, geometries)):
+        room_name = getattr(room, 'Name', None)
+        try:
+            rule_name = engine.resolve_room_type(room_name)
+            rules = engine.get_room_rules(rule_name)
+            log.sampled("rules", "Правила для '{0}': {1}", room_name, rules)
+            if not rules or 'step' not in rules:
+                log.warning(
+                    "Нет параметра 'step' в правилах для помещения '{0}'",
+                    room_name)
+                continue
+        except Exception as e:
+            log.error(
+                "Ошибка при получении правил для '{0}': {1}", room_name, e)
+            continue
+        geometry, wall_segments = get_room_wall_segments(room, cache)
+        if not wall_segments:
+            continue
+        base_z = geometry.base_z
+        index = indexes.get(geometry.level_id)
+        key = room_key(geometry, rule_name, rules, index)
+        room_plan = store.get_plan(key)
+        if room_plan is None:
+            room_plan = plan_room(
+                geometry, rules, rule_name, index,
+                lambda px, py: room.IsPointInRoom(DB.XYZ(px, py, base_z)),
+            )
+            store.put(key, geometry, rule_name, complexity.values(i),
+                      room_plan)
+        plan.extend(room_plan)
+        log.debug(
+            "Room: {0}, Walls: {1}, Points: {2}",
+            room_name, len(geometry.wall_ids), len(room_plan))
+    log.count("Точек в плане", len(plan))
+    save_feature_store(store)
+    return personalize(plan, selected_rooms, geometries, engine, indexes)
+
+def room_fallbacks(selected_rooms, geometries):
+    """{Id помещения: fallback(x, y)} через room.IsPointInRoom."""
+    def fallback(room, base_z):
+        return lambda px, py: room.IsPointInRoom(DB.XYZ(px, py, base_z))
+    return dict(
+        (geometry.room_id, fallback(room, geometry.base_z))
+        for room, geometry in zip(selected_rooms, geometries))
+
+def personalize(plan, selected_rooms, geometries, engine, indexes):
+    """
+    Сдвигает точки плана по прошлым правкам пользователя; сдвинутые
+    точки проверяются заново, не прошедшие проверку остаются на месте.
+    Хранилище признаков хранит планы без сдвига, поэтому новые правки
+    учитываются и для помещений из хранилища.
+    :return: тот же PlacementPlan
+    """
+    if not PERSONALIZE_PLAN or not len(plan):
+        return plan
+    log = get_run_log()
+    fallbacks = room_fallbacks(selected_rooms, geometries)
+    if USE_MODEL_SERVICE:
+        try:
+            with InferenceClient() as client:
+                moved = personalize_plan(
+                    plan, geometries, client.suggest_many, engine, indexes,
+                    fallbacks)
+            log.count("Точек сдвинуто по правкам (сервис)", moved)
+            return plan
+        except (ServiceUnavailable, ServiceError) as e:
+            log.info("Сервис моделей недоступен, рекомендации считаются "
+                     "локально: {0}", e)
+    try:
+        personalizer = get_personalizer()
+    except (IOError, OSError, ValueError, zlib.error) as e:
+        log.warning("Не удалось загрузить персонализатор: {0}", e)
+        return plan
+    if not len(personalizer):
+        return plan
+    moved = personalize_plan(plan, geometries, personalizer.suggest_many,
+                             engine, indexes, fallbacks)
+    log.count("Точек сдвинуто по правкам", moved)
+    return plan
+
+def document_key(doc):
+    """Ключ документа для файла размещённых розеток."""
+    return doc.PathName or doc.Title
+
+def remember_placed(doc, plan, rows, element_ids):
+    """
+    Сохраняет строки плана созданных розеток вместе с их Id, чтобы при
+    следующем запуске найти розетки, сдвинутые пользователем.
+    :param rows: строки плана созданных розеток
+    :param element_ids: ElementId розеток в порядке rows
+    """
+    if not LOG_CORRECTIONS:
+        return
+    data = plan.select(rows).to_dict()
+    data['document'] = document_key(doc)
+    data['element_ids'] = [id_value(element_id)
+                           for element_id in element_ids]
+    path = os.path.join(tempfile.gettempdir(), PLACED_NAME)
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+    except (IOError, OSError) as e:
+        get_run_log().warning(
+            "Не удалось сохранить размещённые розетки: {0}", e)
+
+def load_placed(doc):
+    """
+    Размещённые розетки прошлого запуска в этом документе.
+    Файл удаляется: каждая правка записывается один раз.
+    :return: кортеж (PlacementPlan, список Id) или None
+    """
+    path = os.path.join(tempfile.gettempdir(), PLACED_NAME)
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('document') != document_key(doc):
+            return None
+        placed = PlacementPlan.from_dict(data), data['element_ids']
+        os.remove(path)
+    except (IOError, OSError, ValueError, KeyError) as e:
+        get_run_log().warning(
+            "Не удалось прочитать размещённые розетки: {0}", e)
+        return None
+    return placed
+
+def log_user_corrections(doc, cache=None):
+    """
+    Находит розетки прошлого запуска, сдвинутые пользователем, и
+    записывает сдвиги в журнал правок (ai/data_logger.py). Правки сразу
+    учитываются персонализатором сессии и, если включён
+    USE_MODEL_SERVICE, сервисом моделей.
+    :return: число правок
+    """
+    if not LOG_CORRECTIONS:
+        return 0
+    placed = load_placed(doc)
+    if placed is None:
+        return 0
+    plan, element_ids = placed
+    cache = cache or get_room_cache()
+    positions = {}
+    for row, element_id in enumerate(element_ids):
+        element = doc.GetElement(DB.ElementId(element_id))
+        point = getattr(getattr(element, 'Location', None), 'Point', None)
+        if point is not None:
+            positions[row] = (point.X, point.Y, point.Z)
+    geometries = []
+    for room_id in set(plan.room_id):
+        room = cache.get_element(doc, room_id)
+        if room is not None:
+            geometries.append(cache.get(room))
+    corrections = plan_corrections(plan, geometries, positions)
+    log = get_run_log()
+    if not corrections:
+        return 0
+    with DataLogger() as logger:
+        for c in corrections:
+            logger.log_correction(c.room_type, c.original, c.corrected,
+                                  c.features, c.room_id, c.wall_id)
+    log.info(logger.summary())
+    log.count("Правок пользователя", len(corrections))
+    observe_corrections(corrections)
+    if USE_MODEL_SERVICE:
+        try:
+            with InferenceClient() as client:
+                for c in corrections:
+                    client.observe(c.room_type, c.original, c.corrected,
+                                   c.features)
+        except (ServiceUnavailable, ServiceError) as e:
+            log.info("Правки не переданы сервису моделей: {0}", e)
+    return len(corrections)
+
+def save_feature_store(store):
+    """
+    Сохраняет хранилище признаков и закрывает его файлы; ошибка записи
+    не прерывает запуск.
+    """
+    log = get_run_log()
+    log.count("Помещений из хранилища", store.hits)
+    try:
+        store.save()
+    except (IOError, OSError) as e:
+        log.warning("Не удалось сохранить хранилище признаков: {0}", e)
+    finally:
+        store.close()
+
+def commit_plan_bulk(plan, socket_symbol, cache=None):
+    """
+    Этап применения в пакетном режиме: экземпляры создаются пачками
+    через NewFamilyInstances2 с заранее заданным поворотом.
+    :param plan: PlacementPlan
+    :param socket_symbol: выбранный FamilySymbol розетки
+    :return: кортеж (успешно, не удалось)
+    """
+    doc = revit.doc
+    cache = cache or get_room_cache()
+    with revit.Transaction("Разместить розетки"):
+        result = create_instances(
+            doc, plan, socket_symbol,
+            lambda element_id: cache.get_element(doc, element_id),
+        )
+    log = get_run_log()
+    for row in result.failed_rows:
+        log.warning(
+            "Не удалось разместить розетку в точке ({0:.2f}, {1:.2f}, "
+            "{2:.2f}): {3}",
+            plan.x[row], plan.y[row], plan.z[row],
+            result.errors.get(row, u''))
+    log.count("Размещено розеток", result.created_count)
+    log.count("Не удалось разместить", result.failed_count)
+    log.count("Пачек", result.batches)
+    remember_placed(doc, plan, result.created_rows, result.created_ids)
+    return result.created_count, result.failed_count
+
+def commit_plan(plan, socket_symbol, cache=None, bulk=True):
+    """
+    Этап применения: создаёт розетки по плану в одной транзакции.
+    :param plan: PlacementPlan
     :param socket_symbol: выбранный FamilySymbol розетки
+    :param bulk: пакетное создание (см. commit_plan_bulk); False —
+        по одному экземпляру с поворотом через Location.Rotate
+    :return: кортеж (успешно, не удалось)
     """
-    engine = RuleEngine()
+    if bulk:
+        return commit_plan_bulk(plan, socket_symbol, cache)
     doc = revit.doc
+    cache = cache or get_room_cache()
+    log = get_run_log()
     success_count = 0
     fail_count = 0
+    created_rows = []
+    created_ids = []
+    up = DB.XYZ(0, 0, 1)
     with revit.Transaction("Разместить розетки"):
-        for room in selected_rooms:
-            room_name = getattr(room, 'Name', None)
+        for i in range(len(plan)):
+            wall_id = plan.wall_id[i]
+            pt_with_height = DB.XYZ(plan.x[i], plan.y[i], plan.z[i])
             try:
-                rules = engine.get_room_rules(room_name)
-                print(f"Правила для '{room_name}': {rules}")
-                if not rules or 'step' not in rules:
-                    print(f"[!] Нет параметра 'step' в правилах для помещения '{room_name}'")
-                    continue
+                wall = cache.get_element(doc, wall_id)
+                level_obj = cache.get_element(doc, plan.level_id[i])
+                # Создаём FamilyInstance
+                inst = doc.Create.NewFamilyInstance(pt_with_height, socket_symbol, wall, level_obj, DB.Structure.StructuralType.NonStructural)
+                # Угол поворота уже посчитан на этапе планирования
+                angle = plan.angle[i]
+                # Поворачиваем FamilyInstance вокруг Z
+                loc = inst.Location
+                if hasattr(loc, 'Rotate'):
+                    axis = DB.Line.CreateUnbound(pt_with_height, up)
+                    loc.Rotate(axis, angle)
+                    log.sampled(
+                        "rotate", "Повернули розетку на {0:.2f} рад "
+                        "(стена {1})", angle, wall_id)
+                else:
+                    log.warning("Невозможно повернуть розетку: Location "
+                                "не поддерживает Rotate")
+                created_rows.append(i)
+                created_ids.append(inst.Id)
+                success_count += 1
             except Exception as e:
-                print(f"[!] Ошибка при получении правил для '{room_name}': {e}")
-                continue
-            segments = get_room_wall_segments(room)
-            if not segments:
-                continue
-            # Получаем высоту из правил или по умолчанию 0.25 м
-            height = rules.get("height", 0.25)
-            for wall, curve in segments:
-                try:
-                    points_normals = generate_curve_points(curve, rules["step"])
-                    print(
-                        f"Room: {room_name}, Wall: {wall.Id}, Points: {points_normals}"
-                    )
-                    for pt, normal in points_normals:
-                        if not room.IsPointInRoom(pt):
-                            continue
-                        pt_with_height = DB.XYZ(pt.X, pt.Y, height)
-                        level = wall.LevelId if hasattr(wall, 'LevelId') else room.LevelId
-                        level_obj = doc.GetElement(level)
-                        try:
-                            # Создаём FamilyInstance
-                            inst = doc.Create.NewFamilyInstance(pt_with_height, socket_symbol, wall, level_obj, DB.Structure.StructuralType.NonStructural)
-                            # Вычисляем угол между нормалью и осью X
-                            from math import atan2, pi
-                            angle = atan2(normal.Y, normal.X) + pi/2  # дополнительный поворот на 90 градусов
-                            # Поворачиваем FamilyInstance вокруг Z
-                            loc = inst.Location
-                            if hasattr(loc, 'Rotate'):
-                                axis = DB.Line.CreateUnbound(pt_with_height, DB.XYZ(0,0,1))
-                                loc.Rotate(axis, angle)
-                                print(
-                                    f"Повернули розетку на {angle:.2f} рад (стена {wall.Id})"
-                                )
-                            else:
-                                print(f"[!] Невозможно повернуть розетку: Location не поддерживает Rotate")
-                            success_count += 1
-                        except Exception as e:
-                            print(
-                                f"[!] Не удалось разместить розетку в точке ({pt_with_height.X:.2f}, {pt_with_height.Y:.2f}, {pt_with_height.Z:.2f}): {e}"
-                            )
-                            fail_count += 1
-                except Exception as e:
-                    print(f"[!] Ошибка при генерации/размещении для стены {wall.Id}: {e}")
-    print(f"Успешно размещено розеток: {success_count}")
-    if fail_count > 0:
-        print(f"Не удалось разместить: {fail_count} розеток (см. сообщения выше)")
+                log.warning(
+                    "Не удалось разместить розетку в точке ({0:.2f}, "
+                    "{1:.2f}, {2:.2f}): {3}", pt_with_height.X,
+                    pt_with_height.Y, pt_with_height.Z, e)
+                fail_count += 1
+    log.count("Размещено розеток", success_count)
+    log.count("Не удалось разместить", fail_count)
+    remember_placed(doc, plan, created_rows, created_ids)
     return success_count, fail_count
 
+def place_sockets(selected_rooms, socket_symbol, plan_path=None):
+    """
+    Расставляет розетки в выбранных помещениях по правилам из rules.json.
+    Сначала сдвиги розеток прошлого запуска записываются как правки
+    пользователя, затем строится план (без транзакции), он сохраняется
+    в JSON для анализа и применяется в одной короткой транзакции.
+    :param selected_rooms: список объектов Room
+    :param socket_symbol: выбранный FamilySymbol розетки
+    :param plan_path: путь для сохранения плана (по умолчанию временная папка)
+    """
+    log = get_run_log()
+    log_user_corrections(revit.doc)
+    plan = build_plan(selected_rooms)
+    try:
+        log.info("План сохранён: {0}", plan.save(plan_path))
+    except (IOError, OSError) as e:
+        log.warning("Не удалось сохранить план: {0}", e)
+    return commit_plan(plan, socket_symbol)
+
+def start_script_log():
+    """
+    Начинает журнал запуска. В режиме отладки pyRevit (Shift+клик)
+    выводятся отладочные сообщения и пишется дамп в JSON Lines.
+    """
+    debug = getattr(EXEC_PARAMS, 'debug_mode', False)
+    dump_path = None
+    if debug:
+        dump_path = os.path.join(tempfile.gettempdir(), RUN_LOG_NAME)
+    return start_run(u'Socket AI+', DEBUG if debug else INFO, dump_path)
+
 if __name__ == "__main__":
     doc = revit.doc
-    selected_rooms = get_selected_rooms()
-    if not selected_rooms:
-        print("[!] Выделите хотя бы одно помещение.")
-    else:
-        socket_types = get_socket_types(doc)
-        if not socket_types:
-            forms.alert("В проекте нет ни одного типа семейства розеток!", exitscript=True)
-        socket_names = ["{} : {}".format(s.FamilyName, s.Name) for s in socket_types]
-        selected_name = ui.select_socket_type(socket_names)
-        if not selected_name:
-            forms.alert("Тип розетки не выбран.", exitscript=True)
-        selected_index = socket_names.index(selected_name)
-        selected_symbol = socket_types[selected_index]
-        # Активируем тип, если не активен
-        if not selected_symbol.IsActive:
-            with revit.Transaction("Активировать тип розетки"):
-                selected_symbol.Activate()
-        success_count, fail_count = place_sockets(selected_rooms, selected_symbol)
-        msg = f"Розетки размещены! Успешно: {success_count}"
-        if fail_count > 0:
-            msg += f"\nНе удалось разместить: {fail_count} (см. консоль)"
-        forms.alert(msg)
+    log = start_script_log()
+    try:
+        selected_rooms = get_selected_rooms()
+        if not selected_rooms:
+            log.warning("Выделите хотя бы одно помещение.")
+        else:
+            socket_types = get_socket_types(doc)
+            if not socket_types:
+                forms.alert("В проекте нет ни одного типа семейства розеток!", exitscript=True)
+            socket_names = ["{} : {}".format(s.FamilyName, s.Name) for s in socket_types]
+            selected_name = ui.select_socket_type(socket_names)
+            if not selected_name:
+                forms.alert("Тип розетки не выбран.", exitscript=True)
+            selected_index = socket_names.index(selected_name)
+            selected_symbol = socket_types[selected_index]
+            # Активируем тип, если не активен
+            if not selected_symbol.IsActive:
+                with revit.Transaction("Активировать тип розетки"):
+                    selected_symbol.Activate()
+            success_count, fail_count = place_sockets(selected_rooms, selected_symbol)
+            msg = "Розетки размещены! Успешно: {0}".format(success_count)
+            if fail_count > 0:
+                msg += "\nНе удалось разместить: {0} (см. консоль)".format(
+                    fail_count)
+            forms.alert(msg)
+    finally:
+        log.flush()
@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+"""Анализаторы категорий Model Cleanup для ModelScanner
+
+visit извлекает из элементов только целые Id, имена и ссылки; finish
+строит кандидатов по этим данным без обращения к API Revit.
+"""
+import re
+
+from pyrevit import DB
+
+from scanner import Analyzer
+
+
+def _id(element_id):
+    return element_id.IntegerValue
+
+
+def _name(element):
+    """Имя элемента (у типов свойство Name в IronPython недоступно)"""
+    try:
+        return DB.Element.Name.GetValue(element)
+    except Exception:
+        return getattr(element, 'Name', u'')
+
+
+def _element_id_refs(element):
+    """Id, на которые ссылаются параметры элемента (тип ElementId)"""
+    for param in element.Parameters:
+        if param.StorageType == DB.StorageType.ElementId:
+            value = param.AsElementId()
+            if value is not None:
+                yield _id(value)
+
+
+class Candidate(object):
+    """
+    Кандидат на удаление: Id элемента (int), имя и пояснение. Объекты API
+    не хранятся — элемент получается по Id только при удалении.
+    """
+    __slots__ = ('Id', 'Name', 'note')
+
+    def __init__(self, element_id, name=u'', note=u''):
+        self.Id = element_id
+        self.Name = name
+        self.note = note
+
+    @property
+    def detail(self):
+        return self.note
+
+# Новый тип: LineStyleCandidate
+class LineStyleCandidate(Candidate):
+    __slots__ = ('used_count',)
+
+    def __init__(self, style_id, name, used_count):
+        Candidate.__init__(self, style_id, name)
+        self.used_count = used_count
+
+    @property
+    def detail(self):
+        if self.used_count:
+            return u"используется в {0} элементах".format(self.used_count)
+        return u"не используется"
+
+# Новый тип: ViewFilterCandidate
+class ViewFilterCandidate(Candidate):
+    __slots__ = ('view_count',)
+
+    def __init__(self, filter_id, name, view_count):
+        Candidate.__init__(self, filter_id, name)
+        self.view_count = view_count  # число видов и шаблонов с фильтром
+
+    @property
+    def detail(self):
+        if self.view_count:
+            return u"применяется в {0} видах".format(self.view_count)
+        return u"не применяется"
+
+
+class EmptyAnnotationsAnalyzer(Analyzer):
+    """Текстовые примечания без текста"""
+    key = 'annotations'
+    classes = (DB.TextNote,)
+
+    def __init__(self, doc=None):
+        Analyzer.__init__(self, doc)
+        self.empty_notes = []
+
+    def visit(self, note):
+        if note.IsValidObject:
+            text = getattr(note, 'Text', u'')
+            # Удаляем все пробельные символы (включая невидимые)
+            if re.sub(u'\\s+', u'', text) == u'':
+                self.empty_notes.append(_id(note.Id))
+
+    def finish(self):
+        return [Candidate(note_id, note=u"пустая аннотация")
+                for note_id in self.empty_notes]
+
+
+class LineStyleAnalyzer(Analyzer):
+    """
+    Стили линий и число элементов, которые на них ссылаются.
+    CurveElement покрывает модельные и детальные линии, линии эскизов
+    (в том числе границы заливок) и линии помещений/зон; у заливок,
+    типовых аннотаций и элементов узлов стиль читается из параметра
+    "Стиль линий". Типовые аннотации (экземпляры семейств) собираются
+    по категории: класс AnnotationSymbol фильтр коллектора не принимает.
+    """
+    key = 'line_styles'
+    classes = (DB.GraphicsStyle, DB.CurveElement, DB.FilledRegion)
+    categories = (DB.BuiltInCategory.OST_DetailComponents,
+                  DB.BuiltInCategory.OST_GenericAnnotation)
+
+    def __init__(self, doc=None):
+        Analyzer.__init__(self, doc)
+        self.styles = []  # пары (Id, имя)
+        self.usage = {}  # {Id стиля: число элементов}
+
+    def visit(self, element):
+        if isinstance(element, DB.GraphicsStyle):
+            self._add_style(element)
+            return
+        if isinstance(element, DB.CurveElement):
+            line_style = element.LineStyle
+            style_id = line_style.Id if line_style else None
+        else:
+            param = element.get_Parameter(
+                DB.BuiltInParameter.BUILDING_CURVE_GSTYLE)
+            style_id = (param.AsElementId()
+                        if param and param.HasValue else None)
+        if style_id is not None:
+            key = _id(style_id)
+            self.usage[key] = self.usage.get(key, 0) + 1
+
+    def _add_style(self, style):
+        cat = style.GraphicsStyleCategory
+        if not cat:
+            return
+        if hasattr(cat, 'IsSystem') and cat.IsSystem:
+            return
+        if cat.Name.startswith(u'<'):
+            return
+        self.styles.append((_id(style.Id), getattr(style, 'Name', u'')))
+
+    def finish(self):
+        return [LineStyleCandidate(style_id, name,
+                                   self.usage.get(style_id, 0))
+                for style_id, name in self.styles]
+
+
+# Типы видов, к которым нельзя применить фильтры
+NO_FILTER_VIEW_TYPES = set([
+    'DrawingSheet', 'Schedule', 'ColumnSchedule', 'PanelSchedule',
+    'ProjectBrowser', 'SystemBrowser', 'Report', 'CostReport',
+    'LoadsReport', 'Internal', 'Undefined',
+])
+
+
+class ViewFilterAnalyzer(Analyzer):
+    """
+    Фильтры видов и виды (включая шаблоны), где они применены:
+    GetFilters() вызывается один раз на вид.
+    """
+    key = 'view_filters'
+    classes = (DB.ParameterFilterElement, DB.View)
+
+    def __init__(self, doc=None):
+        Analyzer.__init__(self, doc)
+        self.filters = []  # пары (Id, имя)
+        self.view_counts = {}  # {Id фильтра: число видов}
+
+    def visit(self, element):
+        if isinstance(element, DB.ParameterFilterElement):
+            self.filters.append((_id(element.Id), element.Name))
+            return
+        if str(element.ViewType) in NO_FILTER_VIEW_TYPES:
+            return
+        if not element.AreGraphicsOverridesAllowed():
+            return
+        for filter_id in element.GetFilters():
+            key = _id(filter_id)
+            self.view_counts[key] = self.view_counts.get(key, 0) + 1
+
+    def finish(self):
+        return [ViewFilterCandidate(filter_id, name,
+                                    self.view_counts.get(filter_id, 0))
+                for filter_id, name in self.filters]
+
+
+class ViewTemplateAnalyzer(Analyzer):
+    """
+    Шаблоны видов, которые не назначены ни одному виду и не являются
+    шаблоном по умолчанию для типа вида.
+    """
+    key = 'view_templates'
+    classes = (DB.View, DB.ViewFamilyType)
+
+    def __init__(self, doc=None):
+        Analyzer.__init__(self, doc)
+        self.templates = []  # пары (Id, имя)
+        self.used = set()
+
+    def visit(self, element):
+        if isinstance(element, DB.ViewFamilyType):
+            template_id = getattr(element, 'DefaultTemplateId', None)
+            if template_id is not None:
+                self.used.add(_id(template_id))
+            return
+        if element.IsTemplate:
+            self.templates.append((_id(element.Id), element.Name))
+        else:
+            self.used.add(_id(element.ViewTemplateId))
+
+    def finish(self):
+        return [Candidate(template_id, name, u"не назначен видам")
+                for template_id, name in self.templates
+                if template_id not in self.used]
+
+
+# Типы видов, которые размещаются на листах
+PLACEABLE_VIEW_TYPES = set([
+    'FloorPlan', 'CeilingPlan', 'Elevation', 'Section', 'ThreeD',
+    'DraftingView', 'Detail', 'Legend', 'AreaPlan', 'EngineeringPlan',
+    'Schedule', 'Walkthrough', 'Rendering',
+])
+
+
+class UnplacedViewAnalyzer(Analyzer):
+    """
+    Виды и спецификации, не размещённые ни на одном листе. Основной вид
+    считается размещённым, если размещён любой из его зависимых видов;
+    активный вид не предлагается.
+    """
+    key = 'unplaced_views'
+    classes = (DB.View, DB.Viewport, DB.ScheduleSheetInstance)
+
+    def __init__(self, doc=None):
+        Analyzer.__init__(self, doc)
+        active_view = doc.ActiveView if doc is not None else None
+        self.active_id = _id(active_view.Id) if active_view else None
+        self.views = []  # тройки (Id, имя, Id основного вида)
+        self.placed = set()
+
+    def visit(self, element):
+        if isinstance(element, DB.Viewport):
+            self.placed.add(_id(element.ViewId))
+            return
+        if isinstance(element, DB.ScheduleSheetInstance):
+            self.placed.add(_id(element.ScheduleId))
+            return
+        if element.IsTemplate:
+            return
+        if str(element.ViewType) not in PLACEABLE_VIEW_TYPES:
+            return
+        if isinstance(element, DB.ViewSchedule) and (
+                element.IsTitleblockRevisionSchedule or
+                getattr(element, 'IsInternalKeynoteSchedule', False)):
+            return
+        self.views.append((_id(element.Id), element.Name,
+                           _id(element.GetPrimaryViewId())))
+
+    def finish(self):
+        used = set(self.placed)
+        used.add(self.active_id)
+        for view_id, _, primary_id in self.views:
+            if view_id in self.placed:
+                used.add(primary_id)
+        return [Candidate(view_id, name, u"не размещён на листах")
+                for view_id, name, _ in self.views
+                if view_id not in used]
+
+
+# Категории типоразмеров, на которые ссылаются типы, а не экземпляры
+TYPE_ONLY_CATEGORIES = (
+    DB.BuiltInCategory.OST_ProfileFamilies,
+    DB.BuiltInCategory.OST_StairsRailingBaluster,
+    DB.BuiltInCategory.OST_RailingSupport,
+    DB.BuiltInCategory.OST_RailingTermination,
+    DB.BuiltInCategory.OST_DetailComponents,
+)
+
+
+class FamilyTypeAnalyzer(Analyzer):
+    """
+    Типоразмеры загружаемых семейств, на которые нет ссылок: ни один
+    элемент модели не имеет такого типа и ни один тип не ссылается на него
+    параметром (панели и двери витражей, вложенные типы, профили).
+    У семейства остаётся хотя бы один тип: если не используется ни один,
+    первый не предлагается к удалению.
+    """
+    key = 'family_types'
+    all_elements = True
+    cost_per_element = 0.1
+    excluded_categories = set(int(category)
+                              for category in TYPE_ONLY_CATEGORIES)
+
+    def __init__(self, doc=None):
+        Analyzer.__init__(self, doc)
+        self.symbols = []  # тройки (Id, Id семейства, имя)
+        self.used = set()
+
+    def visit(self, element):
+        if not isinstance(element, DB.ElementType):
+            self.used.add(_id(element.GetTypeId()))
+            return
+        own_id = _id(element.Id)
+        self.used.update(ref for ref in _element_id_refs(element)
+                         if ref != own_id)
+        if isinstance(element, DB.FamilySymbol):
+            category = element.Category
+            if (category is None or
+                    _id(category.Id) in self.excluded_categories):
+                return
+            self.symbols.append((
+                own_id, _id(element.Family.Id),
+                u"{0}: {1}".format(element.FamilyName, _name(element))))
+
+    def finish(self):
+        families = {}
+        for symbol_id, family_id, name in self.symbols:
+            families.setdefault(family_id, []).append((symbol_id, name))
+        candidates = []
+        for symbols in families.values():
+            unused = [(symbol_id, name) for symbol_id, name in symbols
+                      if symbol_id not in self.used]
+            if len(unused) == len(symbols):
+                unused = unused[1:]
+            candidates.extend(Candidate(symbol_id, name, u"нет ссылок")
+                              for symbol_id, name in unused)
+        return candidates
+
+
+class MaterialAnalyzer(Analyzer):
+    """
+    Материалы, на которые нет ссылок. Просматриваются все элементы и типы
+    модели: материалы геометрии и окраски (GetMaterialIds), слои составных
+    конструкций, параметры-ссылки (лестницы, ограждения, топография,
+    DirectShape, части и т.д.) и материалы категорий.
+    """
+    key = 'materials'
+    all_elements = True
+    cost_per_element = 0.1
+
+    def __init__(self, doc=None):
+        Analyzer.__init__(self, doc)
+        self.materials = []  # пары (Id, имя)
+        self.used = set()
+        if doc is not None:
+            self._add_category_materials(doc)
+
+    def _add_category_materials(self, doc):
+        for category in doc.Settings.Categories:
+            for cat in [category] + list(category.SubCategories):
+                material = cat.Material
+                if material is not None:
+                    self.used.add(_id(material.Id))
+
+    def visit(self, element):
+        if isinstance(element, DB.Material):
+            self.materials.append((_id(element.Id), element.Name))
+            return
+        self.used.update(_element_id_refs(element))
+        if isinstance(element, DB.HostObjAttributes):
+            structure = element.GetCompoundStructure()
+            if structure is not None:
+                for layer in structure.GetLayers():
+                    self.used.add(_id(layer.MaterialId))
+        if isinstance(element, DB.ElementType):
+            return
+        category = element.Category
+        if category is None or category.CategoryType != \
+                DB.CategoryType.Model:
+            return
+        for painted in (False, True):
+            for material_id in element.GetMaterialIds(painted):
+                self.used.add(_id(material_id))
+
+    def finish(self):
+        return [Candidate(material_id, name, u"не используется")
+                for material_id, name in self.materials
+                if material_id not in self.used]
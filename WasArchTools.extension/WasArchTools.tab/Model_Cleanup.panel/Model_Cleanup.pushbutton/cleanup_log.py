@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Буферизованный журнал Model Cleanup с ротацией по размеру
+
+Сообщения копятся в памяти и записываются в файл блоками: когда
+набралось buffer_lines строк, при flush/close и при ошибке скрипта.
+Если файл журнала превышает max_bytes, он переименовывается в
+log.1.txt (старые копии сдвигаются, хранится не больше backups).
+"""
+import codecs
+import datetime
+import os
+import tempfile
+
+DEFAULT_MAX_BYTES = 1024 * 1024
+DEFAULT_BACKUPS = 3
+DEFAULT_BUFFER_LINES = 1000
+
+
+def default_log_path():
+    """Файл журнала в профиле пользователя"""
+    base = os.environ.get('APPDATA') or tempfile.gettempdir()
+    return os.path.join(base, 'WasArchTools', 'ModelCleanup', 'log.txt')
+
+
+class BufferedLog(object):
+    """Журнал с записью блоками и ротацией"""
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES,
+                 backups=DEFAULT_BACKUPS, buffer_lines=DEFAULT_BUFFER_LINES,
+                 enabled=True):
+        self.path = path or default_log_path()
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.buffer_lines = buffer_lines
+        self.enabled = enabled
+        self.writes = 0
+        self._lines = []
+
+    def write(self, message):
+        """Добавляет строку с отметкой времени"""
+        if not self.enabled:
+            return
+        self._lines.append(u"[{0}] {1}\n".format(
+            datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'), message))
+        if len(self._lines) >= self.buffer_lines:
+            self.flush()
+
+    def flush(self):
+        """Записывает накопленные строки одним блоком"""
+        if not self._lines:
+            return
+        data = u''.join(self._lines)
+        self._lines = []
+        try:
+            folder = os.path.dirname(self.path)
+            if folder and not os.path.isdir(folder):
+                os.makedirs(folder)
+            self._rotate()
+            with codecs.open(self.path, 'a', encoding='utf-8') as f:
+                f.write(data)
+            self.writes += 1
+        except (IOError, OSError):
+            # Журнал не должен прерывать очистку модели
+            pass
+
+    def close(self):
+        self.flush()
+
+    def _backup_path(self, number):
+        root, ext = os.path.splitext(self.path)
+        return u"{0}.{1}{2}".format(root, number, ext)
+
+    def _rotate(self):
+        if (not os.path.exists(self.path) or
+                os.path.getsize(self.path) < self.max_bytes):
+            return
+        if self.backups < 1:
+            os.remove(self.path)
+            return
+        oldest = self._backup_path(self.backups)
+        if os.path.exists(oldest):
+            os.remove(oldest)
+        for number in range(self.backups - 1, 0, -1):
+            source = self._backup_path(number)
+            if os.path.exists(source):
+                os.rename(source, self._backup_path(number + 1))
+        os.rename(self.path, self._backup_path(1))
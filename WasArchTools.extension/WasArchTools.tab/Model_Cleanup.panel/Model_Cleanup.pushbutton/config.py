@@ -24,6 +24,30 @@ CLEANUP_CATEGORIES = {
         description='Удаление неиспользуемых фильтров',
         enabled=True,
         api_category='ParameterFilterElement'
+    ),
+    'view_templates': CleanupCategory(
+        name='Шаблоны видов',
+        description='Удаление шаблонов, не назначенных ни одному виду',
+        enabled=False,
+        api_category='View'
+    ),
+    'unplaced_views': CleanupCategory(
+        name='Неразмещённые виды',
+        description='Удаление видов и спецификаций, которых нет на листах',
+        enabled=False,
+        api_category='View'
+    ),
+    'family_types': CleanupCategory(
+        name='Типоразмеры семейств',
+        description='Удаление типоразмеров без экземпляров',
+        enabled=False,
+        api_category='FamilySymbol'
+    ),
+    'materials': CleanupCategory(
+        name='Материалы',
+        description='Удаление материалов, на которые нет ссылок',
+        enabled=False,
+        api_category='Material'
     )
 }
 
@@ -32,7 +56,7 @@ UI_SETTINGS = {
     'window': {
         'title': 'Model Cleanup',
         'width': 400,
-        'height': 300,
+        'height': 420,
         'icon': 'icon.png'
     },
     'validation': {
@@ -45,33 +69,15 @@ UI_SETTINGS = {
 LOG_SETTINGS = {
     'file_output': True,  # Записывать ли лог в файл
     'console_output': True,  # Показывать ли лог в консоли
-    'level': 'DEBUG'  # Уровень логирования (DEBUG, INFO, WARNING, ERROR)
+    'level': 'DEBUG',  # Уровень логирования (DEBUG, INFO, WARNING, ERROR)
+    'path': None,  # Файл журнала (None — %APPDATA%/WasArchTools/ModelCleanup)
+    'max_bytes': 1024 * 1024,  # Размер файла, после которого он ротируется
+    'backups': 3,  # Сколько старых файлов журнала хранить
+    'buffer_lines': 1000  # Строк в памяти до записи блоком
 }
 
-# Структуры для хранения результатов
-class CleanupResult:
-    """Класс для хранения результатов очистки"""
-    def __init__(self, category):
-        self.category = category
-        self.deleted_count = 0
-        self.failed_count = 0
-        self.error_messages = []
-        self.deleted_elements = []  # Список удаленных элементов
-        
-    def add_deleted(self, element_id, element_name=None):
-        """Добавить информацию об удаленном элементе"""
-        self.deleted_count += 1
-        self.deleted_elements.append({
-            'id': element_id,
-            'name': element_name or str(element_id)
-        })
-    
-    def add_error(self, message):
-        """Добавить сообщение об ошибке"""
-        self.failed_count += 1
-        self.error_messages.append(message)
-    
-    @property
-    def total_processed(self):
-        """Общее количество обработанных элементов"""
-        return self.deleted_count + self.failed_count 
\ No newline at end of file
+# Настройки отчёта об удалении
+REPORT_SETTINGS = {
+    'export': 'csv',  # Формат отчёта: 'csv', 'json' или None (не сохранять)
+    'folder': None  # Каталог отчётов (None — рядом с журналом)
+}
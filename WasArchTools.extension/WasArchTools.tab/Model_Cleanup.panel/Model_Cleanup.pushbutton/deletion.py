@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""Пакетное удаление элементов для Model Cleanup
+
+Элементы удаляются крупными транзакциями. Размер пакета растёт после
+успешной транзакции и уменьшается после неудачной. Неудачный пакет
+делится пополам, пока не останутся отдельные элементы, на которых
+удаление падает, — их Id попадают в отчёт.
+"""
+from array import array
+
+from pyrevit import revit, DB
+from System.Collections.Generic import List
+
+# Размеры пакета: начальный, минимальный и максимальный
+INITIAL_BATCH_SIZE = 500
+MIN_BATCH_SIZE = 50
+MAX_BATCH_SIZE = 5000
+
+
+class DeleteReport(object):
+    """Итог удаления одной категории: Id хранятся в массивах целых"""
+    __slots__ = ('category', 'deleted', 'failed_ids', 'failed_messages',
+                 'missing', 'transactions')
+
+    def __init__(self, category):
+        self.category = category
+        self.deleted = array('q')  # Id удалённых элементов
+        self.failed_ids = array('q')
+        self.failed_messages = []  # сообщения об ошибках по failed_ids
+        self.missing = array('q')  # Id элементов, которых уже нет в модели
+        self.transactions = 0
+
+    @property
+    def deleted_count(self):
+        return len(self.deleted)
+
+    @property
+    def failed_count(self):
+        return len(self.failed_ids)
+
+    @property
+    def failed(self):
+        """Пары (Id, сообщение об ошибке)"""
+        return list(zip(self.failed_ids, self.failed_messages))
+
+    def add_failed(self, element_id, message):
+        self.failed_ids.append(element_id)
+        self.failed_messages.append(message)
+
+    def rows(self):
+        """Строки отчёта: (категория, Id, состояние, сообщение)"""
+        for element_id in self.deleted:
+            yield self.category, element_id, u'deleted', u''
+        for element_id, message in self.failed:
+            yield self.category, element_id, u'failed', message
+        for element_id in self.missing:
+            yield self.category, element_id, u'missing', u''
+
+
+class BatchDeleter(object):
+    """Удаление списков Id с адаптивным размером пакета и делением
+    неудачных пакетов пополам"""
+    def __init__(self, doc, batch_size=INITIAL_BATCH_SIZE,
+                 min_batch_size=MIN_BATCH_SIZE,
+                 max_batch_size=MAX_BATCH_SIZE, log=None):
+        self.doc = doc
+        self.batch_size = batch_size
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.log = log
+
+    def _log(self, message):
+        if self.log is not None:
+            self.log(message)
+
+    def delete(self, element_ids, category, title=None):
+        """
+        Удаляет элементы.
+        :param element_ids: ElementId или целые Id
+        :param category: ключ категории (для отчёта и имён транзакций)
+        :param title: подпись транзакций
+        :return: DeleteReport
+        """
+        report = DeleteReport(category)
+        title = title or category
+        ids = []
+        for element_id in element_ids:
+            if not isinstance(element_id, DB.ElementId):
+                element_id = DB.ElementId(element_id)
+            if (element_id.IntegerValue == -1 or
+                    self.doc.GetElement(element_id) is None):
+                report.missing.append(element_id.IntegerValue)
+                continue
+            ids.append(element_id)
+        size = self.batch_size
+        position = 0
+        while position < len(ids):
+            batch = ids[position:position + size]
+            position += len(batch)
+            errors = []
+            if self._try_delete(batch, title, report, errors):
+                size = min(self.max_batch_size, size * 2)
+                continue
+            size = max(self.min_batch_size, size // 2)
+            self._bisect(batch, title, report, errors[0] if errors else u'')
+        self._log(u"Удаление {0}: удалено {1}, ошибок {2}, транзакций {3}"
+                  .format(category, report.deleted_count,
+                          report.failed_count, report.transactions))
+        for element_id, message in report.failed:
+            self._log(u"Ошибка при удалении {0} {1}: {2}".format(
+                category, element_id, message))
+        return report
+
+    def _try_delete(self, batch, title, report, errors=None):
+        """
+        Одна транзакция на пакет. :return: True при успехе
+        Отсутствующие элементы попадают в отчёт только при успехе: пакет,
+        откатанный с ошибкой, проверяется заново при делении пополам.
+        """
+        alive = []
+        gone = []
+        for element_id in batch:
+            # Элемент мог удалиться вместе с предыдущим пакетом
+            if self.doc.GetElement(element_id) is None:
+                gone.append(element_id.IntegerValue)
+            else:
+                alive.append(element_id)
+        if not alive:
+            report.missing.extend(gone)
+            return True
+        report.transactions += 1
+        try:
+            with revit.Transaction(u"Model Cleanup: {0} ({1})".format(
+                    title, len(alive))):
+                self.doc.Delete(List[DB.ElementId](alive))
+        except Exception as e:
+            if errors is not None:
+                errors.append(str(e))
+            return False
+        report.deleted.extend(
+            [element_id.IntegerValue for element_id in alive])
+        report.missing.extend(gone)
+        return True
+
+    def _bisect(self, batch, title, report, message):
+        """Делит неудачный пакет пополам до отдельных элементов"""
+        pending = [(batch, message)]
+        while pending:
+            part, message = pending.pop()
+            if len(part) == 1:
+                report.add_failed(part[0].IntegerValue, message)
+                continue
+            middle = len(part) // 2
+            for half in (part[:middle], part[middle:]):
+                errors = []
+                if not self._try_delete(half, title, report, errors):
+                    pending.append((half, errors[0] if errors else message))
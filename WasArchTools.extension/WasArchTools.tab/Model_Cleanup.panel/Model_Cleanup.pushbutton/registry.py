@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""Реестр категорий Model Cleanup
+
+Категория описывает анализатор (поиск кандидатов), отбор кандидатов для
+удаления, удаление и категории, которые нужно удалять раньше неё.
+Название, описание и включение по умолчанию берутся из
+config.CLEANUP_CATEGORIES. Новая категория добавляется вызовом register.
+"""
+from collections import OrderedDict
+
+import config
+from analyzers import (EmptyAnnotationsAnalyzer, FamilyTypeAnalyzer,
+                       LineStyleAnalyzer, MaterialAnalyzer,
+                       UnplacedViewAnalyzer, ViewFilterAnalyzer,
+                       ViewTemplateAnalyzer)
+from deletion import BatchDeleter
+
+
+class CategoryEntry(object):
+    """Категория очистки в реестре"""
+    def __init__(self, key, analyzer, select=None, after=(), deleter=None):
+        """
+        :param analyzer: класс Analyzer
+        :param select: отбор кандидатов для удаления (по умолчанию все)
+        :param after: ключи категорий, удаляемых раньше этой
+        :param deleter: функция (doc, element_ids, entry, log) -> DeleteReport
+            (по умолчанию BatchDeleter)
+        """
+        self.key = key
+        self.analyzer = analyzer
+        self.select = select
+        self.after = tuple(after)
+        self.deleter = deleter
+
+    @property
+    def settings(self):
+        return config.CLEANUP_CATEGORIES[self.key]
+
+    @property
+    def name(self):
+        return self.settings.name
+
+    @property
+    def description(self):
+        return self.settings.description
+
+    @property
+    def enabled(self):
+        return self.settings.enabled
+
+    def create_analyzer(self, doc):
+        return self.analyzer(doc)
+
+    def estimate_cost(self, analyzer):
+        """Оценка стоимости анализа после обхода модели"""
+        return analyzer.estimate_cost()
+
+    def candidates(self, found):
+        """Кандидаты, предлагаемые к удалению"""
+        if self.select is None:
+            return list(found)
+        return [candidate for candidate in found if self.select(candidate)]
+
+    def delete(self, doc, element_ids, log=None):
+        """:return: DeleteReport"""
+        if self.deleter is not None:
+            return self.deleter(doc, element_ids, self, log)
+        return BatchDeleter(doc, log=log).delete(
+            element_ids, self.key, self.name)
+
+
+_registry = OrderedDict()
+
+
+def register(entry):
+    """Добавляет (или заменяет) категорию"""
+    _registry[entry.key] = entry
+    return entry
+
+
+def get_category(key):
+    return _registry[key]
+
+
+def get_categories():
+    """Категории в порядке регистрации"""
+    return list(_registry.values())
+
+
+def deletion_order(keys):
+    """
+    Порядок удаления выбранных категорий: зависимости (after) раньше,
+    в остальном — порядок регистрации.
+    """
+    keys = [key for key in _registry if key in keys]
+    ordered = []
+    done = set()
+    while keys:
+        for key in keys:
+            pending = [dependency for dependency in _registry[key].after
+                       if dependency in keys and dependency not in done]
+            if not pending:
+                break
+        else:
+            # Цикл зависимостей: оставшиеся удаляются по порядку
+            key = keys[0]
+        keys.remove(key)
+        ordered.append(key)
+        done.add(key)
+    return ordered
+
+
+register(CategoryEntry('annotations', EmptyAnnotationsAnalyzer))
+register(CategoryEntry(
+    'line_styles', LineStyleAnalyzer,
+    select=lambda candidate: candidate.used_count == 0,
+    after=('annotations', 'family_types')))
+register(CategoryEntry(
+    'view_filters', ViewFilterAnalyzer,
+    select=lambda candidate: candidate.view_count == 0,
+    after=('unplaced_views', 'view_templates')))
+register(CategoryEntry(
+    'view_templates', ViewTemplateAnalyzer, after=('unplaced_views',)))
+register(CategoryEntry('unplaced_views', UnplacedViewAnalyzer))
+register(CategoryEntry('family_types', FamilyTypeAnalyzer))
+register(CategoryEntry(
+    'materials', MaterialAnalyzer, after=('family_types',)))
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""Экспорт отчёта Model Cleanup в CSV или JSON
+
+Строки отчёта: категория, Id элемента, состояние (deleted, failed,
+missing) и сообщение об ошибке. Строки берутся из DeleteReport.rows()
+по одной, поэтому отчёт не собирается в памяти целиком.
+"""
+import csv
+import datetime
+import io
+import json
+import os
+
+from cleanup_log import default_log_path
+
+FIELDS = ('category', 'element_id', 'status', 'message')
+FORMATS = ('csv', 'json')
+
+
+def default_report_path(export_format, folder=None):
+    """Файл отчёта с отметкой времени в каталоге журнала"""
+    folder = folder or os.path.dirname(default_log_path())
+    stamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    return os.path.join(folder, u"cleanup_{0}.{1}".format(
+        stamp, export_format))
+
+
+def _rows(reports):
+    for report in reports:
+        for row in report.rows():
+            yield row
+
+
+def write_csv(reports, path):
+    with io.open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        for row in _rows(reports):
+            writer.writerow(row)
+
+
+def write_json(reports, path):
+    """JSON-массив объектов; записывается построчно"""
+    with io.open(path, 'w', encoding='utf-8') as f:
+        f.write(u'[')
+        separator = u'\n'
+        for row in _rows(reports):
+            f.write(separator)
+            f.write(json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False))
+            separator = u',\n'
+        f.write(u'\n]\n')
+
+
+def export_reports(reports, export_format='csv', path=None, folder=None):
+    """
+    Сохраняет отчёт об удалении.
+    :param reports: DeleteReport по категориям
+    :param export_format: 'csv' или 'json'
+    :return: путь к файлу
+    """
+    if export_format not in FORMATS:
+        raise ValueError(u"Неизвестный формат отчёта: {0}".format(
+            export_format))
+    path = path or default_report_path(export_format, folder)
+    target = os.path.dirname(path)
+    if target and not os.path.isdir(target):
+        os.makedirs(target)
+    if export_format == 'csv':
+        write_csv(reports, path)
+    else:
+        write_json(reports, path)
+    return path
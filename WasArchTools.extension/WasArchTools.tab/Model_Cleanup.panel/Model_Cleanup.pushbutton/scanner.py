@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""Однопроходный обход модели для Model Cleanup
+
+Каждая категория очистки описывает анализатор: какие классы API и
+какие категории элементов ему нужны, что делать с каждым элементом
+(visit) и что вернуть в конце (finish). ModelScanner объединяет запросы
+всех выбранных анализаторов в один фильтр, проходит модель один раз и
+раздаёт элементы анализаторам, поэтому стоимость обхода не растёт с
+числом категорий.
+"""
+from collections import OrderedDict
+
+import clr
+from pyrevit import DB
+from System import ArgumentException, Type
+from System.Collections.Generic import List
+
+
+class Analyzer(object):
+    """
+    Базовый анализатор категории очистки. visit вызывается в потоке
+    Revit и только извлекает из элементов Id, имена и ссылки; finish
+    работает с извлечёнными данными без обращения к API, поэтому
+    планировщик может выполнять finish разных категорий параллельно.
+    """
+    key = None
+    classes = ()  # классы API (элементы и их подклассы)
+    categories = ()  # BuiltInCategory экземпляров (не типов)
+    all_elements = False  # нужны все элементы и типы модели
+    cost_per_element = 1.0  # относительная стоимость finish на элемент
+
+    def __init__(self, doc=None):
+        self.doc = doc
+        self.visited = 0
+
+    def visit(self, element):
+        """Обработка одного элемента модели"""
+        pass
+
+    def finish(self):
+        """:return: кандидаты на удаление"""
+        return []
+
+    def estimate_cost(self):
+        """Оценка стоимости finish по числу полученных элементов"""
+        return self.visited * self.cost_per_element
+
+
+class ModelScanner(object):
+    """Один обход модели для набора анализаторов"""
+    def __init__(self, doc, log=None):
+        self.doc = doc
+        self.log = log
+        self.scanned = 0
+        self.errors = 0
+        # {ключ анализатора: первая ошибка visit}. Анализатор со сбоем
+        # мог не увидеть ссылку на элемент, его результат неполон
+        self.failed = OrderedDict()
+
+    def _supported(self, classes):
+        """
+        Классы, которые принимает фильтр коллектора. Подклассы вроде
+        DetailLine или AnnotationSymbol вызывают ArgumentException —
+        такие классы пропускаются с записью в журнал.
+        """
+        supported = []
+        for cls in classes:
+            try:
+                DB.ElementClassFilter(clr.GetClrType(cls))
+            except ArgumentException as e:
+                if self.log is not None:
+                    self.log(u"Класс {0} не поддерживается фильтром: {1}"
+                             .format(cls.__name__, str(e)))
+                continue
+            supported.append(cls)
+        return supported
+
+    def _filter(self, analyzers):
+        if any(analyzer.all_elements for analyzer in analyzers):
+            # Пропускает и экземпляры, и типы
+            return DB.LogicalOrFilter(DB.ElementIsElementTypeFilter(False),
+                                      DB.ElementIsElementTypeFilter(True))
+        classes = []
+        categories = []
+        for analyzer in analyzers:
+            for cls in analyzer.classes:
+                if cls not in classes:
+                    classes.append(cls)
+            for category in analyzer.categories:
+                if category not in categories:
+                    categories.append(category)
+        classes = self._supported(classes)
+        filters = []
+        if classes:
+            filters.append(DB.ElementMulticlassFilter(
+                List[Type]([clr.GetClrType(cls) for cls in classes])))
+        if categories:
+            filters.append(DB.LogicalAndFilter(
+                DB.ElementMulticategoryFilter(
+                    List[DB.BuiltInCategory](categories)),
+                DB.ElementIsElementTypeFilter(True)))
+        if not filters:
+            return None
+        if len(filters) == 1:
+            return filters[0]
+        return DB.LogicalOrFilter(filters[0], filters[1])
+
+    def _route(self, element, routes, analyzers):
+        """Анализаторы элемента; кэшируются по классу и категории"""
+        category = element.Category
+        category_id = category.Id.IntegerValue if category else None
+        key = (type(element), category_id)
+        targets = routes.get(key)
+        if targets is None:
+            is_type = isinstance(element, DB.ElementType)
+            targets = [
+                analyzer for analyzer in analyzers
+                if analyzer.all_elements
+                or any(isinstance(element, cls) for cls in analyzer.classes)
+                or (not is_type and category_id in
+                    [int(c) for c in analyzer.categories])]
+            routes[key] = targets
+        return targets
+
+    def scan(self, analyzers, finish=True):
+        """
+        Обходит модель и передаёт элементы анализаторам.
+        :param finish: вызвать finish() анализаторов после обхода
+        :return: OrderedDict {ключ анализатора: результат finish()}
+            без анализаторов из self.failed или None, если finish=False
+        """
+        element_filter = self._filter(analyzers)
+        if element_filter is not None:
+            routes = {}
+            collector = DB.FilteredElementCollector(self.doc)\
+                .WherePasses(element_filter)
+            for element in collector:
+                self.scanned += 1
+                for analyzer in self._route(element, routes, analyzers):
+                    analyzer.visited += 1
+                    try:
+                        analyzer.visit(element)
+                    except Exception as e:
+                        self.errors += 1
+                        message = u"{0}: {1}".format(element.Id, str(e))
+                        self.failed.setdefault(analyzer.key, message)
+                        if self.log is not None:
+                            self.log(u"Ошибка анализа {0} {1}".format(
+                                analyzer.key, message))
+        if self.log is not None:
+            self.log(u"Обход модели: {0} элементов, анализаторов {1}".format(
+                self.scanned, len(analyzers)))
+        if not finish:
+            return None
+        return OrderedDict((analyzer.key, analyzer.finish())
+                           for analyzer in analyzers
+                           if analyzer.key not in self.failed)
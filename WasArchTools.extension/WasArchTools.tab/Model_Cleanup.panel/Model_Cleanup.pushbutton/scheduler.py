@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Планировщик анализа Model Cleanup
+
+Данные для всех выбранных категорий извлекаются одним обходом модели в
+потоке Revit (ModelScanner). Затем finish анализаторов, которые работают
+только с извлечёнными данными, выполняются параллельно в нескольких
+потоках: самые дорогие по оценке категории запускаются первыми.
+В IronPython нет GIL, поэтому потоки действительно работают одновременно.
+"""
+import threading
+from collections import OrderedDict
+
+from scanner import ModelScanner
+
+DEFAULT_WORKERS = 4
+
+# Ошибки finish в данных анализатора (обращений к API там нет)
+ANALYSIS_ERRORS = (KeyError, IndexError, TypeError, ValueError,
+                   AttributeError)
+
+
+class AnalysisScheduler(object):
+    """Обход модели и параллельный анализ выбранных категорий"""
+    def __init__(self, doc, workers=DEFAULT_WORKERS, log=None):
+        self.doc = doc
+        self.workers = workers
+        self.log = log
+        self.errors = OrderedDict()  # {ключ категории: сообщение}
+
+    def _log(self, message):
+        if self.log is not None:
+            self.log(message)
+
+    def analyze(self, entries):
+        """
+        :param entries: CategoryEntry выбранных категорий
+        :return: OrderedDict {ключ категории: кандидаты на удаление};
+            категории с ошибкой анализа (в обходе или в finish) не входят,
+            ошибки — в self.errors
+        """
+        analyzers = [entry.create_analyzer(self.doc) for entry in entries]
+        scanner = ModelScanner(self.doc, log=self.log)
+        scanner.scan(analyzers, finish=False)
+        for entry, analyzer in zip(entries, analyzers):
+            # Пропущенный элемент мог ссылаться на «неиспользуемый» тип,
+            # поэтому кандидаты такой категории не предлагаются
+            if analyzer.key in scanner.failed:
+                self.errors[entry.key] = scanner.failed[analyzer.key]
+        jobs = sorted(
+            [job for job in zip(entries, analyzers)
+             if job[0].key not in self.errors],
+            key=lambda job: job[0].estimate_cost(job[1]), reverse=True)
+        found = {}
+        lock = threading.Lock()
+
+        def worker():
+            while True:
+                with lock:
+                    if not jobs:
+                        return
+                    entry, analyzer = jobs.pop(0)
+                try:
+                    candidates = entry.candidates(analyzer.finish())
+                except ANALYSIS_ERRORS as e:
+                    with lock:
+                        self.errors[entry.key] = str(e)
+                    continue
+                with lock:
+                    found[entry.key] = candidates
+
+        threads = [threading.Thread(target=worker)
+                   for _ in range(min(self.workers, len(jobs)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for key, message in self.errors.items():
+            self._log(u"Ошибка анализа {0}: {1}".format(key, message))
+        lost = [entry.key for entry in entries
+                if entry.key not in found and entry.key not in self.errors]
+        if lost:
+            # Поток упал на непредвиденной ошибке (трассировка уже в stderr)
+            raise RuntimeError(u"Анализ прерван: {0}".format(
+                u", ".join(lost)))
+        return OrderedDict((entry.key, found[entry.key])
+                           for entry in entries if entry.key in found)
@@ -1,25 +1,30 @@
 # -*- coding: utf-8 -*-
 """UI для Model Cleanup"""
 from pyrevit import forms
-from System.Windows import Window
+from System.Windows import Thickness, TextWrapping, Window
+from System.Windows.Controls import (CheckBox, ListBox, SelectionMode,
+                                     StackPanel, TabItem, TextBlock)
+from System.Windows.Media import Brushes
 import wpf
-#from System.Windows.Controls import CheckBox  # not needed
-#import EventHandler  # not needed
 import os
 
-from config import CLEANUP_CATEGORIES, UI_SETTINGS
+from config import UI_SETTINGS
 
 
 class ModelCleanupWindow(Window):
     """Главное окно скрипта Model Cleanup"""
     
-    def __init__(self):
-        """Инициализация окна"""
+    def __init__(self, categories):
+        """
+        Инициализация окна
+        :param categories: CategoryEntry из реестра
+        """
         xaml_path = os.path.join(os.path.dirname(__file__), 'ui.xaml')
         wpf.LoadComponent(self, xaml_path)
         
         # Настройка окна
         self.Title = UI_SETTINGS['window']['title']
+        self.Height = UI_SETTINGS['window']['height']
         
         # Привязка обработчиков событий (без EventHandler)
         self.CancelButton.Click += self.on_cancel_click
@@ -28,25 +33,31 @@ class ModelCleanupWindow(Window):
         # Инициализация выбранных категорий
         self.selected_categories = []
         
-        # Привязка чекбоксов к категориям
-        self._bind_checkboxes()
+        # Чекбоксы категорий
+        self._create_checkboxes(categories)
     
-    def _bind_checkboxes(self):
-        """Привязка чекбоксов к категориям"""
-        self.checkbox_mapping = {
-            'annotations': self.AnnotationsCheck,
-            'line_styles': self.LineStylesCheck,
-            'view_filters': self.ViewFiltersCheck
-        }
-        
-        # Установка начальных значений
-        for key, checkbox in self.checkbox_mapping.items():
-            checkbox.IsChecked = CLEANUP_CATEGORIES[key].enabled
+    def _create_checkboxes(self, categories):
+        """Чекбокс и описание для каждой категории реестра"""
+        self.checkbox_mapping = []
+        for entry in categories:
+            checkbox = CheckBox()
+            checkbox.Content = entry.name
+            checkbox.ToolTip = entry.description
+            checkbox.Margin = Thickness(0, 5, 0, 5)
+            checkbox.IsChecked = entry.enabled
+            hint = TextBlock()
+            hint.Text = entry.description
+            hint.Margin = Thickness(20, 0, 0, 10)
+            hint.TextWrapping = TextWrapping.Wrap
+            hint.Foreground = Brushes.Gray
+            self.CategoryChecks.Children.Add(checkbox)
+            self.CategoryChecks.Children.Add(hint)
+            self.checkbox_mapping.append((entry.key, checkbox))
     
     def get_selected_categories(self):
         """Получить список выбранных категорий"""
         selected = []
-        for key, checkbox in self.checkbox_mapping.items():
+        for key, checkbox in self.checkbox_mapping:
             if checkbox.IsChecked:
                 selected.append(key)
         return selected
@@ -89,87 +100,76 @@ class ModelCleanupWindow(Window):
             return self.selected_categories
         return None
 
+def candidate_label(candidate):
+    """Строка кандидата в списке предпросмотра"""
+    if candidate.Name:
+        return u"ID: {0} | {1} [{2}]".format(
+            candidate.Id, candidate.Name, candidate.detail)
+    return u"ID: {0} | [{1}]".format(candidate.Id, candidate.detail)
+
 class PreviewDeleteWindow(Window):
     """Окно предварительного просмотра удаления элементов"""
-    def __init__(self, candidates_dict):
+    def __init__(self, candidates_dict, categories, errors=None):
+        """
+        :param candidates_dict: {ключ категории: кандидаты}
+        :param categories: CategoryEntry из реестра
+        :param errors: {ключ категории: сообщение об ошибке анализа}
+        """
         xaml_path = os.path.join(os.path.dirname(__file__), 'preview_delete.xaml')
         wpf.LoadComponent(self, xaml_path)
         self.Title = u'Подтверждение удаления'
         self.candidates_dict = candidates_dict
         self.selected = {k: set() for k in candidates_dict.keys()}
-        self._populate_lists()
+        self.errors = errors or {}
+        self.lists = []  # тройки (ключ, ListBox, TextBlock счётчика)
+        self._create_tabs(categories)
         self.OkButton.Click += self.on_ok
         self.CancelButton.Click += self.on_cancel
-        # Добавляем обработчики для обновления счетчиков
-        self.AnnotationsList.SelectionChanged += self.update_counts
-        self.LineStylesList.SelectionChanged += self.update_counts
-        self.ViewFiltersList.SelectionChanged += self.update_counts
         self.update_counts(None, None)
-    def _populate_lists(self):
-        # Аннотации
-        self.AnnotationsList.Items.Clear()
-        for el_id in self.candidates_dict.get('annotations', []):
-            # el_id теперь это ElementId, а не элемент
-            name = u"ID: {0} | [пустая аннотация]".format(el_id)
-            self.AnnotationsList.Items.Add(name)
-        self.AnnotationsList.SelectAll()
-        # Типы линий
-        self.LineStylesList.Items.Clear()
-        for cand in self.candidates_dict.get('line_styles', []):
-            if hasattr(cand, 'used_count'):
-                if cand.used_count == 0:
-                    name = u"ID: {0} | {1} [не используется]".format(cand.Id, cand.Name)
-                    self.LineStylesList.Items.Add(name)
-                else:
-                    name = u"ID: {0} | {1} [используется в {2} элементах]".format(cand.Id, cand.Name, cand.used_count)
-                    self.LineStylesList.Items.Add(name)
-            else:
-                self.LineStylesList.Items.Add(unicode(cand))
-        # Выделяем только неиспользуемые
-        for idx, cand in enumerate(self.candidates_dict.get('line_styles', [])):
-            if hasattr(cand, 'used_count') and cand.used_count == 0:
-                self.LineStylesList.SelectedItems.Add(self.LineStylesList.Items[idx])
-        # Фильтры
-        self.ViewFiltersList.Items.Clear()
-        for cand in self.candidates_dict.get('view_filters', []):
-            if hasattr(cand, 'used_in_views'):
-                if not cand.used_in_views:
-                    name = u"ID: {0} | {1} [не применяется]".format(cand.Id, cand.Name)
-                    self.ViewFiltersList.Items.Add(name)
-                else:
-                    name = u"ID: {0} | {1} [используется в: {2}]".format(cand.Id, cand.Name, u', '.join(cand.used_in_views))
-                    self.ViewFiltersList.Items.Add(name)
-            else:
-                self.ViewFiltersList.Items.Add(unicode(cand))
-        # Выделяем только неиспользуемые
-        for idx, cand in enumerate(self.candidates_dict.get('view_filters', [])):
-            if hasattr(cand, 'used_in_views') and not cand.used_in_views:
-                self.ViewFiltersList.SelectedItems.Add(self.ViewFiltersList.Items[idx])
+    def _create_tabs(self, categories):
+        """Вкладка со списком кандидатов для каждой выбранной категории"""
+        for entry in categories:
+            if entry.key in self.errors:
+                self._add_error_tab(entry, self.errors[entry.key])
+                continue
+            if entry.key not in self.candidates_dict:
+                continue
+            count_text = TextBlock()
+            count_text.Margin = Thickness(0, 0, 0, 5)
+            count_text.Foreground = Brushes.Gray
+            items = ListBox()
+            items.SelectionMode = SelectionMode.Extended
+            for candidate in self.candidates_dict[entry.key]:
+                items.Items.Add(candidate_label(candidate))
+            # Все кандидаты уже отобраны как неиспользуемые
+            items.SelectAll()
+            items.SelectionChanged += self.update_counts
+            panel = StackPanel()
+            panel.Children.Add(count_text)
+            panel.Children.Add(items)
+            tab = TabItem()
+            tab.Header = entry.name
+            tab.Content = panel
+            self.CategoriesTab.Items.Add(tab)
+            self.lists.append((entry.key, items, count_text))
+    def _add_error_tab(self, entry, message):
+        """Вкладка категории, анализ которой завершился ошибкой"""
+        error_text = TextBlock()
+        error_text.Foreground = Brushes.Red
+        error_text.TextWrapping = TextWrapping.Wrap
+        error_text.Text = (u"Ошибка анализа, категория не будет очищена: "
+                           u"{0}".format(message))
+        tab = TabItem()
+        tab.Header = entry.name
+        tab.Content = error_text
+        self.CategoriesTab.Items.Add(tab)
     def on_ok(self, sender, args):
         self.selected = {}
-        # Аннотации
-        ann_selected = set()
-        for idx in range(self.AnnotationsList.Items.Count):
-            if self.AnnotationsList.SelectedItems.Contains(self.AnnotationsList.Items[idx]):
-                el_id = self.candidates_dict.get('annotations', [])[idx]
-                ann_selected.add(el_id)  # el_id уже является ElementId
-        self.selected['annotations'] = ann_selected
-        # Типы линий (только неиспользуемые)
-        ls_selected = set()
-        for idx in range(self.LineStylesList.Items.Count):
-            cand = self.candidates_dict.get('line_styles', [])[idx]
-            if hasattr(cand, 'used_count') and cand.used_count == 0:
-                if self.LineStylesList.SelectedItems.Contains(self.LineStylesList.Items[idx]):
-                    ls_selected.add(cand.Id)
-        self.selected['line_styles'] = ls_selected
-        # Фильтры (только неиспользуемые)
-        vf_selected = set()
-        for idx in range(self.ViewFiltersList.Items.Count):
-            cand = self.candidates_dict.get('view_filters', [])[idx]
-            if hasattr(cand, 'used_in_views') and not cand.used_in_views:
-                if self.ViewFiltersList.SelectedItems.Contains(self.ViewFiltersList.Items[idx]):
-                    vf_selected.add(cand.Id)
-        self.selected['view_filters'] = vf_selected
+        for key, items, _ in self.lists:
+            candidates = self.candidates_dict[key]
+            self.selected[key] = set(
+                candidates[idx].Id for idx in range(items.Items.Count)
+                if items.SelectedItems.Contains(items.Items[idx]))
         self.DialogResult = True
         self.Close()
     def on_cancel(self, sender, args):
@@ -179,9 +179,6 @@ class PreviewDeleteWindow(Window):
         return self.selected 
 
     def update_counts(self, sender, args):
-        self.AnnotationsCountText.Text = u"Выбрано: {0} из {1}".format(
-            self.AnnotationsList.SelectedItems.Count, self.AnnotationsList.Items.Count)
-        self.LineStylesCountText.Text = u"Выбрано: {0} из {1}".format(
-            self.LineStylesList.SelectedItems.Count, self.LineStylesList.Items.Count)
-        self.ViewFiltersCountText.Text = u"Выбрано: {0} из {1}".format(
-            self.ViewFiltersList.SelectedItems.Count, self.ViewFiltersList.Items.Count) 
\ No newline at end of file
+        for _, items, count_text in self.lists:
+            count_text.Text = u"Выбрано: {0} из {1}".format(
+                items.SelectedItems.Count, items.Items.Count)
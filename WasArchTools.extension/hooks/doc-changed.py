@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Хук pyRevit на событие DocumentChanged.
+Отмечает удалённые и изменённые элементы для кэша геометрии помещений
+Socket AI+ (core/room_cache.py): при попадании в кэш стены помещения
+проверяются по этим отметкам, а не через doc.GetElement. Пока Socket AI+
+не запускался в сессии, хранилище отметок не создано и хук ничего
+не делает.
+"""
+from pyrevit import EXEC_PARAMS, script
+
+# Хранилище сессии CHANGES_STORE_NAME из core/room_cache.py
+# (с префиксом переменных из core/session.py)
+CHANGES_ENVVAR = 'SOCKETAI_ROOM_CHANGES'
+
+
+def id_value(element_id):
+    """Целочисленное значение ElementId (как в core/room_cache.py)."""
+    value = getattr(element_id, 'Value', None)
+    if value is None:
+        value = element_id.IntegerValue
+    return int(value)
+
+
+def record_changes(args):
+    changes = script.get_envvar(CHANGES_ENVVAR)
+    if changes is None:
+        return
+    doc = args.GetDocument()
+    sequence = changes.get('sequence', 0) + 1
+    changes['sequence'] = sequence
+    # Ключ документа — как core.room_cache.document_key
+    changed = changes.setdefault('documents', {}).setdefault(
+        doc.PathName or doc.Title, {})
+    for element_id in args.GetDeletedElementIds():
+        changed[id_value(element_id)] = sequence
+    for element_id in args.GetModifiedElementIds():
+        changed[id_value(element_id)] = sequence
+
+
+record_changes(EXEC_PARAMS.event_args)